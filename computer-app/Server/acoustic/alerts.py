@@ -0,0 +1,323 @@
+"""
+Alert evaluation for decoded diver readings.
+
+Rules (models/alert_rule.py) are compiled into one DiverLimits object per
+diver whenever they are loaded, so evaluating a reading is a dictionary
+lookup and a few comparisons, however many rules and divers there are.
+
+A reading is classified by:
+    - BPM limits, with hysteresis: the status rises as soon as a limit is
+      crossed but only falls once the BPM is hysteresis_bpm below it.
+    - Rate of change: BPM changing faster than max_bpm_rate per second
+      since the previous reading raises a warning.
+    - Depth: a diver deeper than max_depth is at least in warning.
+Without a rule, the BPM limits are the fixed WARNING_BPM/CRITICAL_BPM,
+lowered for older divers (age-predicted maximum heart rate, 220 - age).
+
+A diver that was heard once and then stays silent for lost_after seconds
+is reported lost (critical). Silence deadlines are kept in a heap, so
+finding lost divers never scans all divers.
+
+Every status change is put on the `alerts` queue as an Alert, for other
+components (notifications, the API) to consume.
+
+The engine also keeps the slot -> diver ID map of protocol v2
+(acoustic/protocol_v2.py), loaded together with the diver details.
+"""
+import heapq
+import queue
+import time
+
+from sqlalchemy import select
+
+from database import SessionLocal
+from log import get_logger
+from metrics import Counter
+from acoustic.telemetry import WARNING_BPM, CRITICAL_BPM
+from models.alert_rule import AlertRule
+from models.diver import Diver as DiverModel
+from models.group import Group  # Registers the Diver.group relationship target
+
+logger = get_logger("acoustic.alerts")
+ALERTS_RAISED = Counter("aquasafe_alerts", "Alerts raised, by kind and new status", ["kind", "status"])
+
+# Built-in rule values, used when no rule sets them
+HYSTERESIS_BPM = 5
+MAX_BPM_RATE = 6.0  # BPM per second
+LOST_AFTER = 60.0  # Seconds
+MAX_DEPTH = None  # No depth limit
+
+# Age-adjusted BPM limits, as fractions of the age-predicted maximum heart rate.
+# They only ever lower WARNING_BPM/CRITICAL_BPM, for older divers
+WARNING_HEART_RATE_RESERVE = 0.70
+CRITICAL_HEART_RATE_RESERVE = 0.85
+
+STATUSES = ("normal", "warning", "critical")  # Index is the severity
+RULE_FIELDS = ("warning_bpm", "critical_bpm", "hysteresis_bpm", "max_bpm_rate", "lost_after", "max_depth")
+
+ALERT_QUEUE_SIZE = 1000  # Alerts kept for slow consumers; the oldest are dropped beyond this
+RULES_REFRESH_INTERVAL = 60.0  # Seconds between reloads of rules and diver details
+MIN_REFRESH_INTERVAL = 5.0  # Earliest reload after an unknown diver is heard
+
+
+class DiverLimits:
+    """Thresholds of one diver, resolved from every rule that applies to them."""
+    __slots__ = ("group_id", "warning_bpm", "critical_bpm", "hysteresis_bpm", "max_bpm_rate", "lost_after",
+                 "depth_severity", "depth_reason")
+
+    def __init__(self, group_id=None, warning_bpm=WARNING_BPM, critical_bpm=CRITICAL_BPM,
+                 hysteresis_bpm=HYSTERESIS_BPM, max_bpm_rate=MAX_BPM_RATE, lost_after=LOST_AFTER,
+                 depth_severity=0, depth_reason=None):
+        self.group_id = group_id
+        self.warning_bpm = warning_bpm
+        self.critical_bpm = critical_bpm
+        self.hysteresis_bpm = hysteresis_bpm
+        self.max_bpm_rate = max_bpm_rate
+        self.lost_after = lost_after
+        self.depth_severity = depth_severity  # Depth does not change between readings: decided once
+        self.depth_reason = depth_reason
+
+
+def compile_limits(diver, rules):
+    """
+    Resolves the limits of one diver.
+
+    Args:
+        diver: Row with id, group_id, age and current_depth.
+        rules (list): The AlertRules that apply, most specific first (diver, group, default).
+
+    Returns:
+        DiverLimits
+    """
+    values = {}
+    for field in RULE_FIELDS:
+        values[field] = next((getattr(rule, field) for rule in rules if getattr(rule, field) is not None), None)
+
+    warning_bpm, critical_bpm = WARNING_BPM, CRITICAL_BPM
+    if diver.age:
+        max_heart_rate = 220 - diver.age
+        warning_bpm = min(warning_bpm, int(WARNING_HEART_RATE_RESERVE * max_heart_rate))
+        critical_bpm = min(critical_bpm, int(CRITICAL_HEART_RATE_RESERVE * max_heart_rate))
+
+    max_depth = values["max_depth"] if values["max_depth"] is not None else MAX_DEPTH
+    deep = max_depth is not None and diver.current_depth is not None and diver.current_depth > max_depth
+    return DiverLimits(
+        group_id=diver.group_id,
+        warning_bpm=values["warning_bpm"] if values["warning_bpm"] is not None else warning_bpm,
+        critical_bpm=values["critical_bpm"] if values["critical_bpm"] is not None else critical_bpm,
+        hysteresis_bpm=values["hysteresis_bpm"] if values["hysteresis_bpm"] is not None else HYSTERESIS_BPM,
+        max_bpm_rate=values["max_bpm_rate"] if values["max_bpm_rate"] is not None else MAX_BPM_RATE,
+        lost_after=values["lost_after"] if values["lost_after"] is not None else LOST_AFTER,
+        depth_severity=1 if deep else 0,
+        depth_reason=f"depth {diver.current_depth:g} m > {max_depth:g} m" if deep else None,
+    )
+
+
+class Alert:
+    """A change of a diver's status. kind is "status", "lost" or "found"."""
+    __slots__ = ("diver_id", "group_id", "kind", "status", "previous_status", "bpm", "reasons", "timestamp")
+
+    def __init__(self, diver_id, group_id, kind, status, previous_status, bpm, reasons, timestamp):
+        self.diver_id = diver_id
+        self.group_id = group_id
+        self.kind = kind
+        self.status = status
+        self.previous_status = previous_status
+        self.bpm = bpm
+        self.reasons = reasons
+        self.timestamp = timestamp  # Unix time
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __str__(self):
+        reasons = f" ({', '.join(self.reasons)})" if self.reasons else ""
+        return f"Diver {self.diver_id} {self.kind}: {self.previous_status} -> {self.status}{reasons}"
+
+
+class _DiverState:
+    __slots__ = ("severity", "bpm_severity", "bpm", "heard_at", "deadline", "scheduled", "lost")
+
+    def __init__(self):
+        self.severity = 0  # Reported status
+        self.bpm_severity = 0  # BPM part of the status, which has hysteresis
+        self.bpm = None
+        self.heard_at = None
+        self.deadline = None  # When the diver counts as lost
+        self.scheduled = False  # Whether the diver has an entry in the deadline heap
+        self.lost = False
+
+
+class AlertEngine:
+    """
+    Evaluates readings against compiled per-diver limits and reports status
+    changes. Not thread-safe: it is meant to be used from the persistence
+    worker only.
+    """
+
+    def __init__(self, session_factory=SessionLocal, max_queued=ALERT_QUEUE_SIZE,
+                 refresh_interval=RULES_REFRESH_INTERVAL, clock=time.monotonic):
+        self.session_factory = session_factory
+        self.refresh_interval = refresh_interval
+        self.clock = clock
+        self.alerts = queue.Queue(max_queued)
+        self._limits = {}  # diver_id -> DiverLimits
+        self._slots = {}  # Protocol v2 slot -> diver_id
+        self._default_limits = DiverLimits()
+        self._states = {}  # diver_id -> _DiverState
+        self._deadlines = []  # Heap of (deadline, diver_id); at most one entry per diver
+        self._next_refresh = 0.0
+        self._refreshed_at = None
+
+        # Counters
+        self.evaluated = 0
+        self.raised = 0
+        self.dropped = 0
+
+    def refresh(self):
+        """Reloads the rules and the details of every diver, and recompiles their limits."""
+        self._refreshed_at = self.clock()
+        self._next_refresh = self._refreshed_at + self.refresh_interval
+        session = self.session_factory()
+        try:
+            rules = session.scalars(select(AlertRule)).all()
+            divers = session.execute(
+                select(DiverModel.id, DiverModel.group_id, DiverModel.age, DiverModel.current_depth,
+                       DiverModel.slot)).all()
+        except Exception as e:
+            logger.error("❌ ERROR loading alert rules: %s", e)
+            return
+        finally:
+            session.close()
+
+        by_diver = {rule.diver_id: rule for rule in rules if rule.diver_id is not None}
+        by_group = {rule.group_id: rule for rule in rules if rule.group_id is not None}
+        defaults = [rule for rule in rules if rule.diver_id is None and rule.group_id is None][:1]
+        self._limits = {
+            diver.id: compile_limits(diver, [rule for rule in (by_diver.get(diver.id), by_group.get(diver.group_id))
+                                             if rule is not None] + defaults)
+            for diver in divers
+        }
+        self._slots = {diver.slot: diver.id for diver in divers if diver.slot is not None}
+
+    def diver_for_slot(self, slot, now=None):
+        """
+        Resolves a protocol v2 slot to a diver ID. An unknown slot reloads
+        the divers at once, unless they were loaded less than
+        MIN_REFRESH_INTERVAL ago (so noise on an unused slot cannot hammer
+        the database).
+
+        Returns:
+            str: The diver's ID, or None if no diver has the slot.
+        """
+        now = self.clock() if now is None else now
+        if now >= self._next_refresh:
+            self.refresh()
+        diver_id = self._slots.get(slot)
+        if diver_id is None and (self._refreshed_at is None or now - self._refreshed_at >= MIN_REFRESH_INTERVAL):
+            self.refresh()
+            diver_id = self._slots.get(slot)
+        return diver_id
+
+    def evaluate(self, diver_id, bpm, now=None):
+        """
+        Evaluates one reading and raises an alert if the diver's status changed.
+
+        Args:
+            diver_id (str): Diver the reading belongs to.
+            bpm (int): Heart rate.
+            now (float): Reading time on the engine's clock. Defaults to now.
+
+        Returns:
+            str: The diver's status.
+        """
+        now = self.clock() if now is None else now
+        if now >= self._next_refresh:
+            self.refresh()
+        limits = self._limits.get(diver_id)
+        if limits is None:
+            # A diver added since the last refresh: use the defaults until it is loaded
+            limits = self._default_limits
+            self._next_refresh = min(self._next_refresh, now + MIN_REFRESH_INTERVAL)
+        state = self._states.get(diver_id)
+        if state is None:
+            state = self._states[diver_id] = _DiverState()
+        self.evaluated += 1
+
+        # BPM status rises at a limit but only falls hysteresis_bpm below it
+        rising = 2 if bpm > limits.critical_bpm else 1 if bpm > limits.warning_bpm else 0
+        if rising >= state.bpm_severity:
+            state.bpm_severity = rising
+        else:
+            margin = limits.hysteresis_bpm
+            falling = 2 if bpm > limits.critical_bpm - margin else 1 if bpm > limits.warning_bpm - margin else 0
+            state.bpm_severity = min(state.bpm_severity, falling)
+        severity = max(state.bpm_severity, limits.depth_severity)
+        reasons = []
+        if state.bpm_severity:
+            reasons.append(f"bpm {bpm}")
+        if limits.depth_reason:
+            reasons.append(limits.depth_reason)
+
+        # Rate of change since the previous reading (not across a silence long enough to be lost)
+        if state.heard_at is not None and 0 < now - state.heard_at < limits.lost_after:
+            rate = (bpm - state.bpm) / (now - state.heard_at)
+            if abs(rate) > limits.max_bpm_rate:
+                severity = max(severity, 1)
+                reasons.append(f"bpm changing {rate:+.1f}/s")
+
+        previous = STATUSES[state.severity]
+        kind = "found" if state.lost else "status"
+        state.severity, state.bpm, state.heard_at, state.lost = severity, bpm, now, False
+        if kind == "found" or STATUSES[severity] != previous:
+            self._raise(Alert(diver_id, limits.group_id, kind, STATUSES[severity],
+                              "critical" if kind == "found" else previous, bpm, reasons, time.time()))
+
+        state.deadline = now + limits.lost_after
+        if not state.scheduled:
+            state.scheduled = True
+            heapq.heappush(self._deadlines, (state.deadline, diver_id))
+        return STATUSES[severity]
+
+    def tick(self, now=None):
+        """
+        Reports every diver whose silence deadline has passed as lost. Costs
+        one heap peek when nobody is overdue.
+
+        Returns:
+            list: The "lost" Alerts raised.
+        """
+        now = self.clock() if now is None else now
+        if now >= self._next_refresh:
+            self.refresh()
+        lost = []
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, diver_id = heapq.heappop(self._deadlines)
+            state = self._states[diver_id]
+            if state.deadline > now:
+                # Heard again since this entry was pushed: move it to the new deadline
+                heapq.heappush(self._deadlines, (state.deadline, diver_id))
+                continue
+            state.scheduled = False
+            limits = self._limits.get(diver_id, self._default_limits)
+            alert = Alert(diver_id, limits.group_id, "lost", "critical", STATUSES[state.severity], state.bpm,
+                          [f"no signal for {limits.lost_after:g} s"], time.time())
+            state.severity, state.bpm_severity, state.lost = 2, 0, True
+            self._raise(alert)
+            lost.append(alert)
+        return lost
+
+    def _raise(self, alert):
+        logger.warning("⚠️ ALERT: %s", alert)
+        self.raised += 1
+        ALERTS_RAISED.labels(alert.kind, alert.status).inc()
+        try:
+            self.alerts.put_nowait(alert)
+        except queue.Full:
+            # Nobody is keeping up: the newest alerts matter most
+            try:
+                self.alerts.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            self.alerts.put_nowait(alert)
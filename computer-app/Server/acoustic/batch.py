@@ -0,0 +1,87 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from acoustic.decoder import (
+    ChannelDecoder, DETECTOR, PROTOCOL, WINDOW_OVERLAP, SIGNAL_STRENGTH_SENSITIVITY_THRESHOLD,
+)
+from acoustic.noise_gate import GATE_SNR_DB, band_powers
+from acoustic.protocol import RATE
+
+BATCH_WINDOWS = 256  # Windows analyzed per vectorized call; bounds the memory used by the spectra
+
+
+def decode_batch(samples, detector=DETECTOR, overlap=WINDOW_OVERLAP, channel=0, gate_snr_db=GATE_SNR_DB, stats=None,
+                 protocol=PROTOCOL):
+    """
+    Decodes a whole recording of one channel at once, for replay and post-dive analysis.
+
+    Windows are taken on a fixed grid (every hop_size samples) as a strided
+    view of `samples`, and the tone energies of BATCH_WINDOWS windows are
+    computed per vectorized detector call. The decoder's message framer
+    (MessageFramer, or SymbolFramer for v2) then runs over the resulting rows, using each window's
+    end as the stream time. Windows whose peak amplitude is below the signal
+    gate, or whose newest hop of audio does not rise above the noise floor,
+    are treated as silence, like chunks in the streaming decoder.
+
+    Because streaming windows restart after every silent chunk while batch
+    windows stay on the grid, results can differ slightly at tone edges.
+
+    Args:
+        samples (np.array): 1-D int16 samples (a memory-mapped array is fine).
+        detector (str): Tone detector name ("rfft" or "goertzel").
+        overlap (float): Fraction of overlap between consecutive windows.
+        channel (int): Channel number reported in the decoder's output.
+        gate_snr_db (float): Noise gate SNR (see acoustic.noise_gate); 0 disables it.
+        stats (dict): If given, "windows" and "windows_skipped" (analyzed and gated windows) are added to it.
+        protocol (str): "v1" or "v2" (acoustic/protocol_v2.py).
+
+    Returns:
+        list: (message, start signal time, completion time) tuples, times in seconds.
+    """
+    messages = []
+    decoder = ChannelDecoder(lambda ch, message, start, end: messages.append((message, start, end)),
+                             detector, overlap, channel, gate_snr_db, protocol)
+    window_size, hop = decoder.window_size, decoder.audio_buffer.hop_size
+
+    if len(samples) < window_size:
+        decoder.feed(samples)
+        decoder.flush()
+        _add_stats(stats, decoder)
+        return messages
+
+    windows = sliding_window_view(samples, window_size)[::hop]
+
+    for block_start in range(0, len(windows), BATCH_WINDOWS):
+        block = windows[block_start:block_start + BATCH_WINDOWS]
+        # Peak amplitude per window without materializing abs() of the whole block
+        peaks = np.maximum(block.max(axis=1).astype(np.int32), -block.min(axis=1).astype(np.int32))
+        active = peaks > SIGNAL_STRENGTH_SENSITIVITY_THRESHOLD
+        if decoder.noise_gate.enabled and active.any():
+            # Each window adds one hop of new audio; the gate judges that part, in order
+            powers = band_powers(block[active, -hop:])
+            gated = [decoder.noise_gate.update(row, hop / RATE) for row in powers]
+            active[active] = gated
+        detections = decoder.detector.analyze_batch(block[active]) if active.any() else None
+
+        row = 0
+        for i in range(len(block)):
+            decoder.samples_read = (block_start + i) * hop + window_size
+            if active[i]:
+                decoder._process_detection(type(detections)(*(field[row] for field in detections)))
+                row += 1
+            else:
+                decoder._skip(hop)
+                if peaks[i] <= SIGNAL_STRENGTH_SENSITIVITY_THRESHOLD:
+                    decoder.noise_gate.quiet(hop / RATE)
+                decoder.framer.on_silence(decoder._now())
+
+    decoder.samples_read = len(samples)
+    decoder.framer.finish(decoder._now())
+    _add_stats(stats, decoder)
+    return messages
+
+
+def _add_stats(stats, decoder):
+    if stats is not None:
+        stats["windows"] = stats.get("windows", 0) + decoder.windows_processed
+        stats["windows_skipped"] = stats.get("windows_skipped", 0) + decoder.windows_skipped
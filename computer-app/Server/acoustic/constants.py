@@ -0,0 +1,8 @@
+"""
+Settings of the acoustic server that the API server also relies on.
+
+This module imports nothing, so the API can read them without loading
+the acoustic server's database layer.
+"""
+
+FLUSH_INTERVAL = 1.0  # Seconds decoded telemetry may wait before it is written to the database together
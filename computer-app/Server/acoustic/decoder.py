@@ -0,0 +1,168 @@
+import time
+
+import numpy as np
+
+from acoustic import protocol_v2
+from acoustic.protocol import RATE
+from acoustic.detector import DualToneDetector, create_detector
+from acoustic.framing import MessageFramer, SymbolFramer
+from acoustic.noise_gate import GATE_SNR_DB, NoiseGate
+from acoustic.ring_buffer import AudioRingBuffer
+from metrics import Counter, Histogram
+
+
+# Timing parameters
+FFT_WINDOW_SIZE = int(0.25 * RATE)  # v1 analysis window: 0.25 s
+WINDOW_OVERLAP = 0.75  # Fraction of each analysis window shared with the next one (0.5 = 50%, 0.75 = 75%)
+DETECTOR = "rfft"  # Tone detector: "rfft" (one shared FFT) or "goertzel" (protocol tones only)
+PROTOCOL = "v1"  # "v1" (one tone per character) or "v2" (dual-tone frames with diver slots, acoustic/protocol_v2.py)
+PROTOCOLS = ("v1", "v2")
+
+# Signal strength thresholds (tone thresholds and message timing live in acoustic.framing)
+SIGNAL_STRENGTH_SENSITIVITY_THRESHOLD = 100  # Peak amplitude at or below which a chunk counts as silence
+
+WINDOWS_PROCESSED = Counter("aquasafe_windows_processed", "Analysis windows fed to the message framer", ["channel"])
+WINDOWS_SKIPPED = Counter("aquasafe_windows_skipped", "Analysis windows the signal and noise gates saved "
+                          "(gated audio / hop size)", ["channel"])
+DETECTOR_SECONDS = Histogram("aquasafe_detector_seconds", "Tone detector (FFT/Goertzel) time per analysis window",
+                             ["detector"], buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05))
+
+
+class ChannelDecoder:
+    """
+    Decodes the acoustic protocol from the audio of a single channel
+    (one hydrophone): signal and noise gates, windowing, tone detection and
+    message framing.
+
+    A decoder is fed chunks of int16 samples in order and calls
+    on_message(channel, message, start_time, end_time) for every complete
+    message. Times are stream times of this channel in seconds.
+
+    The protocol v2 decoder has its own window size, overlap and detector
+    (acoustic/protocol_v2.py); `detector`, `overlap` and the noise gate
+    only apply to v1.
+    """
+
+    def __init__(self, on_message, detector=DETECTOR, overlap=WINDOW_OVERLAP, channel=0, gate_snr_db=GATE_SNR_DB,
+                 protocol=PROTOCOL):
+        self.on_message = on_message
+        self.channel = channel
+        self.protocol = protocol
+        self.samples_read = 0 # Audio clock: all timing uses stream time, so replay is deterministic
+        if protocol == "v2":
+            self.window_size = protocol_v2.WINDOW_SIZE
+            overlap, detector = protocol_v2.WINDOW_OVERLAP, "dualtone"
+            gate_snr_db = 0 # Each v2 window measures its own background level, for less than the gate's FFT
+            self.framer = SymbolFramer(self._complete_message) # Frame state machine (idle/armed/receiving)
+            self.detector = DualToneDetector(self.window_size)
+        elif protocol == "v1":
+            self.window_size = FFT_WINDOW_SIZE
+            self.framer = MessageFramer(self._complete_message) # Message state machine (idle/armed/receiving/awaiting-end)
+            self.detector = create_detector(detector, self.window_size) # Precomputes tone bins once
+        else:
+            raise ValueError(f"Unknown protocol '{protocol}', expected one of: {', '.join(PROTOCOLS)}")
+        self._detector_seconds = DETECTOR_SECONDS.labels(detector) # Children looked up once, not per window
+        self._windows_metric = WINDOWS_PROCESSED.labels(channel)
+        self._skipped_metric = WINDOWS_SKIPPED.labels(channel)
+        self.audio_buffer = AudioRingBuffer(self.window_size, overlap=overlap) # Preallocated, hands out window views
+        self._padded_window = np.zeros(self.window_size, dtype=np.int16) # Reused when a short buffer must be padded
+        self.noise_gate = NoiseGate(gate_snr_db) # Per-band noise floor; spectral analysis only above it
+
+        # Decoder statistics, reported by the replay benchmark
+        self.windows_processed = 0
+        self.windows_skipped = 0 # Windows the gated audio would have produced
+        self._gated_samples = 0
+
+    def _now(self):
+        """Current stream time in seconds (samples consumed / sample rate)."""
+        return self.samples_read / RATE
+
+    @property
+    def skipped_fraction(self):
+        """Fraction of windows the gates saved from spectral analysis."""
+        total = self.windows_processed + self.windows_skipped
+        return self.windows_skipped / total if total else 0.0
+
+    def _skip(self, num_samples):
+        """Counts the windows that num_samples of gated audio would have produced."""
+        self._gated_samples += num_samples
+        skipped = self._gated_samples // self.audio_buffer.hop_size
+        if skipped > self.windows_skipped:
+            self._skipped_metric.inc(skipped - self.windows_skipped)
+            self.windows_skipped = skipped
+
+    def _complete_message(self, message, start_time, end_time):
+        """Hands a message completed by the framer to the on_message callback."""
+        self.on_message(self.channel, message, start_time, end_time)
+
+    def feed(self, audio_chunk):
+        """
+        Decodes the next chunk of this channel's audio.
+        Detects signals and completes messages as they arrive.
+        """
+        audio_buffer = self.audio_buffer # Ring buffer accumulating audio data for FFT
+        self.samples_read += len(audio_chunk)
+
+        # Get the maximum amplitude in the current chunk to detect significant sound
+        max_amp_in_chunk = np.max(np.abs(audio_chunk))
+
+        # If significant sound is detected in the protocol's bands, add it to the audio buffer.
+        # The peak check is the cheapest, so the noise gate's FFT only runs on loud chunks
+        if max_amp_in_chunk > SIGNAL_STRENGTH_SENSITIVITY_THRESHOLD and self.noise_gate.is_signal(audio_chunk):
+            audio_buffer.write(audio_chunk)
+
+            # Analyze every complete window; the ring advances by the configured hop
+            for window in audio_buffer.windows():
+                self._process_audio_buffer(window)
+
+        else: # If silence (or only background noise) is detected in the current chunk
+            self._skip(len(audio_chunk))
+            if max_amp_in_chunk <= SIGNAL_STRENGTH_SENSITIVITY_THRESHOLD:
+                self.noise_gate.quiet(len(audio_chunk) / RATE)
+            if len(audio_buffer) > 0: # If there was accumulated sound but now it's silent
+                # Process any remaining substantial audio in the buffer
+                if len(audio_buffer) >= self.window_size // 2:
+                    self._process_audio_buffer(audio_buffer.pending())
+                audio_buffer.clear() # Reset buffer
+
+            # Closes the current character run; times out a message if silence persists for too long
+            self.framer.on_silence(self._now())
+
+    def flush(self):
+        """Processes whatever is left when the source ends, as if silence followed."""
+        if len(self.audio_buffer) >= self.window_size // 2:
+            self._process_audio_buffer(self.audio_buffer.pending())
+        self.audio_buffer.clear()
+        self.framer.finish(self._now())
+
+    def _process_audio_buffer(self, buffer_data):
+        """
+        Runs the tone detector on one analysis window (zero-padded if it is
+        shorter) and hands the detection to the framer.
+        """
+        if len(buffer_data) == 0:
+            return
+
+        # Use the configured FFT window size that matches the watch's chunk duration
+        if len(buffer_data) < self.window_size:
+            audio_for_fft = self._padded_window
+            audio_for_fft[:len(buffer_data)] = buffer_data
+            audio_for_fft[len(buffer_data):] = 0
+        else:
+            audio_for_fft = buffer_data[-self.window_size:]  # Use the most recent part of the buffer
+
+        # Measure start, end and character tones in a single pass
+        started = time.perf_counter()
+        detection = self.detector.analyze(audio_for_fft)
+        self._detector_seconds.observe(time.perf_counter() - started)
+        self._process_detection(detection)
+
+    def _process_detection(self, detection):
+        """
+        Feeds the tone measurements of one window to the message framer.
+        Timing uses the current stream time, so callers decoding pre-computed
+        windows set samples_read to the end of each window first.
+        """
+        self.windows_processed += 1
+        self._windows_metric.inc()
+        self.framer.on_window(detection, self._now())
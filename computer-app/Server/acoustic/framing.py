@@ -0,0 +1,330 @@
+"""
+Message framing for the acoustic protocol, as an explicit state machine
+driven by window timestamps (stream time), never by the wall clock:
+
+    IDLE --start tone--> ARMED --first character--> RECEIVING
+    RECEIVING --message looks complete--> AWAITING_END
+    AWAITING_END --more characters--> RECEIVING
+    RECEIVING / AWAITING_END --end tone--> IDLE (message emitted if valid)
+    any state but IDLE --MAX_SILENT_TIME without characters--> IDLE
+
+Each window is classified by its strongest tone (start, end or character),
+so energy leaking from a loud start/end tone into the character band is
+never mistaken for a character. Consecutive character windows form a run
+that yields one character, recorded when the run ends (at the next silence,
+start/end tone or quiet window): the strongest tone of the run wins, so
+windows that hold only a sliver of a tone, whose energy is smeared over
+neighbouring bins, cannot add characters. This relies on the gap the watch
+leaves after every tone, which is longer than an analysis window.
+
+SymbolFramer does the same for protocol v2 frames (acoustic/protocol_v2.py).
+"""
+from acoustic.protocol_v2 import FRAME_SYMBOLS, GUARD_DURATION, SYMBOL_DURATION, decode_frame, format_message
+from log import get_logger
+from metrics import Counter
+
+logger = get_logger("acoustic.framing")
+MESSAGES_FRAMED = Counter("aquasafe_messages_framed", "Messages framed after a start tone, by result "
+                          "(valid, invalid, too_long, corrupt)", ["result"])
+
+MAX_SILENT_TIME = 15.0  # Give up on a message after this long without characters
+DIGIT_WAIT_TIME = 0  # Time to wait for additional digits after receiving a valid but potentially incomplete BPM
+
+# Signal strength thresholds
+CHAR_THRESHOLD = 5e2  # Reduced threshold for better sensitivity
+START_END_THRESHOLD = 1.5e3  # Reduced threshold
+SYMBOL_THRESHOLD = 2e3  # Protocol v2: weaker tone of a pair, over a (much shorter) v2 window
+TONE_CONTRAST = 4.0  # Protocol v2: a tone pair must be this many times the window's background level
+RUN_DROP = 0.25  # Protocol v2: a symbol run ends below this fraction of its strongest window
+MAX_SYMBOL_GAP = 0.5  # Protocol v2: give up on a frame after this long without a symbol
+MIN_SYMBOL_SPACING = (SYMBOL_DURATION + GUARD_DURATION) / 2  # Protocol v2: closer runs of one symbol are one tone
+
+# Message validation
+MIN_MESSAGE_LENGTH = 4  # Minimum length for a valid message (e.g., "a,99")
+MAX_MESSAGE_LENGTH = 10  # Maximum length for a valid message (e.g., "abcdef,123")
+MIN_BPM = 40
+MAX_BPM = 200
+
+IDLE = "idle"
+ARMED = "armed"
+RECEIVING = "receiving"
+AWAITING_END = "awaiting-end"
+
+# Window classes
+START = "start"
+END = "end"
+CHAR = "char"
+SYNC = "sync"
+SYMBOL = "symbol"
+
+
+def parse_message(message):
+    """
+    Splits a message into (diver_id, bpm).
+
+    Returns:
+        tuple: (diver_id, bpm), or None if the message is not "<id>,<digits>"
+               with a BPM between MIN_BPM and MAX_BPM.
+    """
+    if message.count(',') != 1 or not MIN_MESSAGE_LENGTH <= len(message) <= MAX_MESSAGE_LENGTH:
+        return None
+    diver_id, bpm = message.split(',')
+    if not diver_id or not bpm.isdigit() or not MIN_BPM <= int(bpm) <= MAX_BPM:
+        return None
+    return diver_id, int(bpm)
+
+
+def classify(detection):
+    """Returns START, END, CHAR or None for the strongest tone above its threshold in a window."""
+    candidates = []
+    if detection.start_freq is not None and detection.start_amp > START_END_THRESHOLD:
+        candidates.append((detection.start_amp, START))
+    if detection.end_freq is not None and detection.end_amp > START_END_THRESHOLD:
+        candidates.append((detection.end_amp, END))
+    if detection.char is not None and detection.char_amp > CHAR_THRESHOLD:
+        candidates.append((detection.char_amp, CHAR))
+    return max(candidates)[1] if candidates else None
+
+
+class MessageFramer:
+    """
+    Assembles characters into messages. Feed it one ToneDetection per
+    analysis window with on_window(), and on_silence() for stretches the
+    signal gate skipped. Complete messages are passed to
+    on_message(message, start_time, end_time).
+    """
+
+    def __init__(self, on_message, max_silent_time=MAX_SILENT_TIME, digit_wait_time=DIGIT_WAIT_TIME):
+        self.on_message = on_message
+        self.max_silent_time = max_silent_time
+        self.digit_wait_time = digit_wait_time
+        self._reset()
+
+    def _reset(self):
+        self.state = IDLE
+        self.message = ""
+        self.start_time = None # When the start tone was heard
+        self.last_char_time = None # When the last character (or the start tone) was heard
+        self.complete_since = None # When the message first looked complete
+        self._run_char = None # Strongest character tone of the current run of windows
+        self._run_amp = 0.0
+        self._run_time = None # When the strongest window of the run ended
+
+    def on_window(self, detection, now):
+        """Advances the state machine by one analyzed window ending at `now`."""
+        kind = classify(detection)
+
+        if kind == CHAR:
+            if self.state != IDLE and detection.char_amp > self._run_amp:
+                self._run_char, self._run_amp, self._run_time = detection.char, detection.char_amp, now
+            self._check_timers(now)
+            return
+
+        self._end_run()
+
+        if kind == START:
+            if self.state in (RECEIVING, AWAITING_END):
+                # The end tone of the previous message was missed
+                self._finish(now, "New start tone before end tone.")
+            if self.state == IDLE:
+                logger.debug("Start sequence detected. Start Amp: %.0f. Recording message...", detection.start_amp)
+                self.state = ARMED
+                self.start_time = self.last_char_time = now
+            return
+
+        if kind == END:
+            if self.state in (RECEIVING, AWAITING_END):
+                self._finish(now, "End tone received.")
+            elif self.state == ARMED:
+                logger.debug("End tone received without characters.")
+                self._reset()
+            return
+
+        self._check_timers(now)
+
+    def on_silence(self, now):
+        """Called when the signal gate skipped audio up to `now`."""
+        self._end_run()
+        self._check_timers(now)
+
+    def finish(self, now):
+        """Ends any message in progress (e.g., at the end of a recording)."""
+        self._end_run()
+        if self.state != IDLE:
+            self._finish(now, "Recording ended.")
+
+    def _end_run(self):
+        """Records the character of the run that just ended, if any."""
+        if self._run_char is not None:
+            char, now = self._run_char, self._run_time
+            self._run_char, self._run_amp, self._run_time = None, 0.0, None
+            if self.state != IDLE:
+                self._append(char, now)
+
+    def _append(self, char, now):
+        # Auto-insert comma when transitioning from letters to numbers if no comma exists
+        if char.isdigit() and ',' not in self.message and self.message and self.message[-1].isalpha():
+            self.message += ','
+            logger.debug("Auto-inserted comma before number")
+        self.message += char
+        self.last_char_time = now
+        logger.debug("Current buffer: '%s'", self.message)
+
+        if len(self.message) > MAX_MESSAGE_LENGTH:
+            logger.info("Message too long, discarding: '%s'", self.message)
+            MESSAGES_FRAMED.labels("too_long").inc()
+            self._reset()
+            return
+
+        if parse_message(self.message) is not None:
+            if self.state != AWAITING_END:
+                self.complete_since = now
+            self.state = AWAITING_END
+        else:
+            self.state = RECEIVING
+        self._check_timers(now)
+
+    def _check_timers(self, now):
+        if self.state == AWAITING_END and now - self.complete_since >= self.digit_wait_time:
+            # No more digits can follow a complete BPM; no need to wait for the end tone
+            self._finish(now, "Valid message format detected.")
+        elif self.state != IDLE and now - self.last_char_time > self.max_silent_time:
+            self._finish(now, "Timeout during recording.")
+
+    def _finish(self, now, reason):
+        """Emits the current message if it is valid and returns to IDLE."""
+        message, start_time = self.message, self.start_time
+        self._reset()
+        if parse_message(message) is None:
+            logger.info("%s No valid message received ('%s').", reason, message)
+            MESSAGES_FRAMED.labels("invalid").inc()
+            return
+        logger.info("%s Message complete: '%s'", reason, message)
+        MESSAGES_FRAMED.labels("valid").inc()
+        self.on_message(message, start_time, now)
+
+
+def classify_symbol(detection):
+    """
+    Returns SYNC, SYMBOL or None for the stronger tone pair of a v2 window,
+    if it is above SYMBOL_THRESHOLD and stands out from the background.
+    """
+    threshold = max(SYMBOL_THRESHOLD, TONE_CONTRAST * detection.noise_amp)
+    if detection.sync_amp > threshold and detection.sync_amp >= detection.symbol_amp:
+        return SYNC
+    if detection.symbol_amp > threshold:
+        return SYMBOL
+    return None
+
+
+class SymbolFramer:
+    """
+    Assembles protocol v2 frames: a sync, then FRAME_SYMBOLS dual-tone
+    symbols. Same interface as MessageFramer, fed SymbolDetections.
+
+    As with characters, a run of windows yields one symbol, its strongest.
+    A run also ends when the level drops below RUN_DROP of its peak, so the
+    guard interval splits symbols even when background noise keeps the
+    signal gate open, and runs far weaker than the sync (noise in a guard
+    interval) are ignored. A tone that fades for a moment (multipath) splits
+    into two runs of the same symbol closer than MIN_SYMBOL_SPACING; they
+    count once. A complete frame is passed on as "#<slot>,<bpm>"
+    only if its CRC matches and the BPM is plausible.
+    """
+
+    def __init__(self, on_message, max_symbol_gap=MAX_SYMBOL_GAP):
+        self.on_message = on_message
+        self.max_symbol_gap = max_symbol_gap
+        self._reset()
+
+    def _reset(self):
+        self.state = IDLE
+        self.symbols = []
+        self.start_time = None # When the sync was heard
+        self.last_symbol_time = None # When the last symbol (or the sync) was heard
+        self.level = 0.0 # Strength of the sync, the reference for symbol runs
+        self._run_symbol = None # Strongest symbol of the current run of windows
+        self._run_amp = 0.0
+
+    def on_window(self, detection, now):
+        """Advances the state machine by one analyzed window ending at `now`."""
+        kind = classify_symbol(detection)
+
+        if kind == SYMBOL:
+            if self.state != IDLE:
+                if detection.symbol_amp < RUN_DROP * self._run_amp:
+                    self._end_run(now) # Guard interval, under noise
+                if detection.symbol_amp > self._run_amp:
+                    self._run_symbol, self._run_amp = int(detection.symbol), detection.symbol_amp
+            self._check_timer(now)
+            return
+
+        self._end_run(now)
+
+        if kind == SYNC:
+            if self.state == RECEIVING:
+                self._fail("New sync before the frame was complete.")
+            if self.state == IDLE:
+                logger.debug("Sync detected. Sync Amp: %.0f. Receiving frame...", detection.sync_amp)
+                self.state = ARMED
+                self.start_time = now
+            self.level = max(self.level, detection.sync_amp)
+            self.last_symbol_time = now
+            return
+
+        self._check_timer(now)
+
+    def on_silence(self, now):
+        """Called when the signal gate skipped audio up to `now`."""
+        self._end_run(now)
+        self._check_timer(now)
+
+    def finish(self, now):
+        """Ends any frame in progress (e.g., at the end of a recording)."""
+        self._end_run(now)
+        if self.state != IDLE:
+            self._fail("Recording ended.")
+
+    def _end_run(self, now):
+        """Records the symbol of the run that just ended, if it is strong enough."""
+        if self._run_symbol is None:
+            return
+        symbol, amp = self._run_symbol, self._run_amp
+        self._run_symbol, self._run_amp = None, 0.0
+        if self.state == IDLE or amp < RUN_DROP * self.level:
+            return
+        if self.symbols and symbol == self.symbols[-1] and now - self.last_symbol_time < MIN_SYMBOL_SPACING:
+            return
+        self.symbols.append(symbol)
+        self.state = RECEIVING
+        self.last_symbol_time = now
+        if len(self.symbols) == FRAME_SYMBOLS:
+            self._finish(now)
+
+    def _check_timer(self, now):
+        if self.state != IDLE and now - self.last_symbol_time > self.max_symbol_gap:
+            self._fail("Timeout during frame.")
+
+    def _fail(self, reason):
+        logger.info("%s Incomplete frame (%d of %d symbols).", reason, len(self.symbols), FRAME_SYMBOLS)
+        MESSAGES_FRAMED.labels("invalid").inc()
+        self._reset()
+
+    def _finish(self, now):
+        """Checks a complete frame and emits it if it is valid; returns to IDLE."""
+        symbols, start_time = self.symbols, self.start_time
+        self._reset()
+        decoded = decode_frame(symbols)
+        if decoded is None:
+            logger.info("Frame CRC mismatch, dropped (symbols %s).", symbols)
+            MESSAGES_FRAMED.labels("corrupt").inc()
+            return
+        slot, bpm = decoded
+        if not MIN_BPM <= bpm <= MAX_BPM:
+            logger.info("No valid frame received (slot %d, BPM %d).", slot, bpm)
+            MESSAGES_FRAMED.labels("invalid").inc()
+            return
+        message = format_message(slot, bpm)
+        logger.info("Frame complete: '%s'", message)
+        MESSAGES_FRAMED.labels("valid").inc()
+        self.on_message(message, start_time, now)
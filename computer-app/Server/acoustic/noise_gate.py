@@ -0,0 +1,149 @@
+"""
+Adaptive noise gate in front of the tone detector.
+
+The fixed peak-amplitude gate (decoder.SIGNAL_STRENGTH_SENSITIVITY_THRESHOLD)
+lets almost every chunk through in a noisy harbor, and each of those
+costs a full-window spectral analysis. This gate looks only at the
+protocol's bands (start tone, characters, end tone): one short FFT per
+chunk gives the power of the strongest bin in each band, and a per-band
+noise floor is tracked from those powers. A chunk is analyzed only if some band is at
+least snr_db above its floor; otherwise it is treated like silence.
+
+The floor is an asymmetric exponential average in dB: it falls quickly
+(FLOOR_FALL_TIME) and rises slowly (FLOOR_RISE_TIME), so it follows the
+lower envelope of the noise. Tones, a fraction of a second each with
+gaps between them, barely lift it, while a ship that starts its engine
+raises it within FLOOR_RISE_TIME and stops keeping the gate open.
+"""
+import math
+from functools import lru_cache
+
+import numpy as np
+
+from acoustic.protocol import (
+    CHAR_TO_FREQ, RATE, START_FREQ, END_FREQ,
+    START_FREQ_TOLERANCE, END_FREQ_TOLERANCE, CHAR_FREQ_SPACING,
+)
+
+GATE_SNR_DB = 10.0  # Band power above the noise floor that opens the gate; 0 disables the gate
+FLOOR_FALL_TIME = 0.5  # Seconds for the floor to follow quieter noise
+FLOOR_RISE_TIME = 10.0  # Seconds for the floor to follow louder noise
+MIN_POWER = 1e-3  # Keeps digital silence from pulling the floor to -inf dB
+MIN_POWER_DB = 10 * math.log10(MIN_POWER)
+
+BAND_NAMES = ("start", "char", "end")
+
+
+@lru_cache(maxsize=None)
+def band_bins(frame_size, rate=RATE):
+    """
+    rFFT bin ranges of the start, character and end bands for one frame size.
+
+    Returns:
+        list: One slice per entry of BAND_NAMES.
+    """
+    xf = np.fft.rfftfreq(frame_size, 1 / rate)
+    half_spacing = CHAR_FREQ_SPACING / 2
+    bands = [
+        (START_FREQ - START_FREQ_TOLERANCE, START_FREQ + START_FREQ_TOLERANCE),
+        (min(CHAR_TO_FREQ.values()) - half_spacing, max(CHAR_TO_FREQ.values()) + half_spacing),
+        (END_FREQ - END_FREQ_TOLERANCE, END_FREQ + END_FREQ_TOLERANCE),
+    ]
+    slices = []
+    for low, high in bands:
+        idx = np.nonzero((xf >= low) & (xf <= high))[0]
+        if len(idx) == 0:
+            idx = [int(np.abs(xf - (low + high) / 2).argmin())]  # Frame too short to resolve the band
+        slices.append(slice(int(idx[0]), int(idx[-1]) + 1))
+    return slices
+
+
+@lru_cache(maxsize=None)
+def _band_edges(frame_size, rate):
+    # reduceat() indices: every band and the gaps between them; bands are in frequency order
+    slices = band_bins(frame_size, rate)
+    edges = [index for band in slices for index in (band.start, band.stop)]
+    return slices[-1].stop, np.array(edges[:-1])
+
+
+def band_powers(frames, rate=RATE):
+    """
+    Power of the strongest bin of each protocol band, per frame. The peak
+    rather than the band's mean, since a tone fills one or two bins of a
+    band that is hundreds of bins wide.
+
+    Args:
+        frames (np.array): (num_frames, frame_size) or 1-D samples (one frame).
+
+    Returns:
+        np.array: (num_frames, len(BAND_NAMES)) powers, normalized by the frame size so
+                  that frames of different sizes are comparable for noise.
+    """
+    frames = np.atleast_2d(frames)
+    frame_size = frames.shape[1]
+    top, edges = _band_edges(frame_size, rate)
+    spectrum = np.fft.rfft(frames, axis=1)[:, :top]
+    power = spectrum.real ** 2 + spectrum.imag ** 2
+    return np.maximum.reduceat(power, edges, axis=1)[:, ::2] / frame_size
+
+
+class NoiseGate:
+    """
+    Tracks the noise floor of each protocol band and decides which chunks
+    are worth a spectral analysis. One gate per channel.
+
+    Every band's floor starts at the quietest band of the first chunk (a
+    tone is in one band at a time, so that band holds only noise), or at
+    MIN_POWER if the first audio is quiet. Costs one short FFT and a few float operations per
+    chunk; the floor is kept in plain floats because numpy calls on three
+    values cost more than the arithmetic.
+    """
+
+    def __init__(self, snr_db=GATE_SNR_DB, rate=RATE, fall_time=FLOOR_FALL_TIME, rise_time=FLOOR_RISE_TIME):
+        self.snr_db = snr_db
+        self.rate = rate
+        self.fall_time = fall_time
+        self.rise_time = rise_time
+        self.floor_db = None  # Per band; set by the first chunk
+
+    @property
+    def enabled(self):
+        return self.snr_db > 0
+
+    def is_signal(self, chunk):
+        """Updates the floor with one chunk of samples and returns whether it should be analyzed."""
+        if not self.enabled or len(chunk) == 0:
+            return True
+        return self.update(band_powers(chunk, self.rate)[0], len(chunk) / self.rate)
+
+    def quiet(self, seconds):
+        """
+        Lets the floor fall for audio the peak-amplitude gate already found
+        quiet, without an FFT. Otherwise, in calm water, the floor would
+        only ever be updated with tones.
+        """
+        if self.floor_db is None:
+            self.floor_db = [MIN_POWER_DB] * len(BAND_NAMES)
+        fall = min(seconds / self.fall_time, 1.0)
+        self.floor_db = [floor + fall * (MIN_POWER_DB - floor) for floor in self.floor_db]
+
+    def update(self, powers, seconds):
+        """
+        Updates the floor with the band powers of `seconds` of audio.
+
+        Returns:
+            bool: Whether any band is snr_db or more above its floor (before this update).
+        """
+        levels = [10 * math.log10(max(power, MIN_POWER)) for power in powers.tolist()]
+        if self.floor_db is None:
+            self.floor_db = [min(levels)] * len(levels)
+        rise = min(seconds / self.rise_time, 1.0)
+        fall = min(seconds / self.fall_time, 1.0)
+        signal = False
+        floor_db = self.floor_db
+        for i, level in enumerate(levels):
+            difference = level - floor_db[i]
+            if difference >= self.snr_db:
+                signal = True
+            floor_db[i] += (rise if difference > 0 else fall) * difference
+        return signal
@@ -0,0 +1,210 @@
+"""
+Staged acoustic pipeline:
+
+    capture (PyAudio callback or replay loop)
+        -> bounded chunk queue per channel -> DecoderWorker (DSP + framing)
+        -> MessageDeduplicator (bounded decoded-message queue)
+        -> PersistenceWorker (database updates)
+
+No stage ever waits on a later one during live capture: a full queue
+drops its input and counts it. Every stage keeps a StageStats with its
+queue depth, drop count and latency.
+"""
+import queue
+import threading
+import time
+
+from log import get_logger
+from metrics import Counter, Gauge, Histogram
+
+logger = get_logger("acoustic.pipeline")
+QUEUE_DEPTH = Gauge("aquasafe_pipeline_queue_depth", "Items waiting in a pipeline stage's input queue", ["stage"])
+CHUNKS_DROPPED = Counter("aquasafe_audio_chunks_dropped", "Audio chunks dropped because a decoder fell behind",
+                         ["channel"])
+MESSAGES_DEDUPLICATED = Counter("aquasafe_messages_deduplicated",
+                                "Decoded messages by outcome (accepted, duplicate, dropped)", ["outcome"])
+MESSAGE_LATENCY = Histogram("aquasafe_message_latency_seconds",
+                            "Time from a message being decoded until the database update for it returned")
+
+
+class StageStats:
+    """Counters for one pipeline stage. Each stage is updated by a single thread."""
+
+    def __init__(self, name, items=None):
+        self.name = name
+        self.items = items  # Input queue of the stage, if any
+        if items is not None:
+            QUEUE_DEPTH.labels(name).set_function(items.qsize)
+        self.processed = 0
+        self.dropped = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def record(self, latency):
+        self.processed += 1
+        self.total_latency += latency
+        if latency > self.max_latency:
+            self.max_latency = latency
+
+    def snapshot(self):
+        """Returns the current values as a plain dict (latencies in milliseconds)."""
+        return {
+            "stage": self.name,
+            "queue_depth": self.items.qsize() if self.items is not None else 0,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "avg_latency_ms": 1000 * self.total_latency / self.processed if self.processed else 0.0,
+            "max_latency_ms": 1000 * self.max_latency,
+        }
+
+
+def format_stats(snapshots):
+    """Formats stage snapshots as one line per stage for the console."""
+    return "\n".join(
+        f"  {s['stage']:<12} queue={s['queue_depth']:<4} processed={s['processed']:<7} dropped={s['dropped']:<5} "
+        f"latency avg={s['avg_latency_ms']:.1f} ms max={s['max_latency_ms']:.1f} ms"
+        + (f" skipped={s['skipped']:.0%}" if "skipped" in s else "")
+        for s in snapshots
+    )
+
+
+class DecoderWorker(threading.Thread):
+    """
+    Runs one ChannelDecoder on its own thread, fed through a bounded queue,
+    so the capture loop never waits for DSP.
+
+    When the queue is full, submit() either drops the chunk (live capture,
+    where blocking would overflow the sound card buffer) or waits (replay,
+    where every sample must be decoded). Latency is measured from the
+    moment a chunk is queued until the decoder has processed it.
+    """
+
+    def __init__(self, decoder, max_chunks):
+        super().__init__(name=f"decoder-ch{decoder.channel}", daemon=True)
+        self.decoder = decoder
+        self.chunks = queue.Queue(maxsize=max_chunks)
+        self.stats = StageStats(f"dsp[{decoder.channel}]", self.chunks)
+        self._dropped_metric = CHUNKS_DROPPED.labels(decoder.channel)
+
+    def submit(self, chunk, block=False):
+        """Queues a chunk for decoding. Returns False if it had to be dropped."""
+        try:
+            self.chunks.put((chunk, time.perf_counter()), block=block)
+            return True
+        except queue.Full:
+            self.stats.dropped += 1
+            self._dropped_metric.inc()
+            return False
+
+    def stop(self):
+        """Asks the worker to flush its decoder and exit once the queue is drained."""
+        self.chunks.put(None)
+
+    def run(self):
+        while True:
+            item = self.chunks.get()
+            try:
+                if item is None:
+                    self.decoder.flush()
+                    return
+                chunk, queued_at = item
+                self.decoder.feed(chunk)
+                self.stats.record(time.perf_counter() - queued_at)
+            except Exception as e:
+                logger.exception("An error occurred in decoder for channel %s: %s", self.decoder.channel, e)
+
+
+class MessageDeduplicator:
+    """
+    Merges the messages of every channel into one bounded queue. A message
+    that was already accepted from any channel within `window` seconds
+    (stream time) is treated as the same transmission heard by another
+    hydrophone and dropped.
+    """
+
+    def __init__(self, window, max_messages=1000):
+        self.window = window
+        self.messages = queue.Queue(maxsize=max_messages)
+        self.duplicates = 0
+        self.dropped = 0
+        self._last_seen = {}
+        self._lock = threading.Lock()
+
+    def offer(self, channel, message, start_time, end_time):
+        """Queues (channel, message, start_time, end_time) unless it is a duplicate."""
+        with self._lock:
+            last = self._last_seen.get(message)
+            if last is not None and abs(end_time - last) <= self.window:
+                self.duplicates += 1
+                MESSAGES_DEDUPLICATED.labels("duplicate").inc()
+                return False
+            self._last_seen[message] = end_time
+            if len(self._last_seen) > 1000: # Forget transmissions that can no longer be duplicated
+                self._last_seen = {m: t for m, t in self._last_seen.items() if end_time - t <= self.window}
+        try:
+            # Never block a decoder on persistence
+            self.messages.put_nowait((channel, message, start_time, end_time, time.perf_counter()))
+        except queue.Full:
+            self.dropped += 1
+            MESSAGES_DEDUPLICATED.labels("dropped").inc()
+            return False
+        MESSAGES_DEDUPLICATED.labels("accepted").inc()
+        return True
+
+
+class PersistenceWorker(threading.Thread):
+    """
+    Consumes decoded messages and hands them to `handler` (the database
+    update) together with the stream time at which each was complete. Runs
+    on its own thread, so a slow or locked database never stalls audio
+    capture or decoding. Latency is measured from the moment a
+    message was decoded until the handler returns.
+
+    If on_idle is given, it is called whenever no message arrived for
+    idle_interval seconds, so write-behind buffers get flushed while the
+    water is quiet. If on_start is given, it runs on the worker's thread
+    before the first message, so a slow setup (opening the database) does
+    not delay capture; messages wait in the queue meanwhile.
+    """
+
+    def __init__(self, messages, handler, on_message=None, on_idle=None, idle_interval=1.0, on_start=None):
+        super().__init__(name="persistence", daemon=True)
+        self.messages = messages
+        self.handler = handler
+        self.on_message = on_message  # Optional observer, called before the handler
+        self.on_idle = on_idle
+        self.idle_interval = idle_interval
+        self.on_start = on_start
+        self.stats = StageStats("persistence", messages)
+
+    def stop(self):
+        """Asks the worker to exit once every queued message is handled."""
+        self.messages.put(None)
+
+    def run(self):
+        if self.on_start is not None:
+            try:
+                self.on_start()
+            except Exception as e:
+                logger.exception("An error occurred while starting persistence: %s", e)
+        while True:
+            try:
+                item = self.messages.get(timeout=self.idle_interval if self.on_idle is not None else None)
+            except queue.Empty:
+                try:
+                    self.on_idle()
+                except Exception as e:
+                    logger.exception("An error occurred while flushing persisted messages: %s", e)
+                continue
+            if item is None:
+                return
+            channel, message, start_time, end_time, decoded_at = item
+            try:
+                if self.on_message is not None:
+                    self.on_message(channel, message, start_time, end_time)
+                self.handler(message, end_time)
+            except Exception as e:
+                logger.exception("An error occurred while persisting message '%s': %s", message, e)
+            latency = time.perf_counter() - decoded_at
+            self.stats.record(latency)
+            MESSAGE_LATENCY.observe(latency)
@@ -0,0 +1,26 @@
+# --- Acoustic Communication Protocol Settings ---
+# These values must match the watch app (MainActivity.kt).
+
+CHAR_TO_FREQ = {
+    '0': 3000, '1': 3200, '2': 3400, '3': 3600, '4': 3800,
+    '5': 4000, '6': 4200, '7': 4400, '8': 4600, '9': 4800,
+    'a': 5000, 'b': 5200, 'c': 5400, 'd': 5600, 'e': 5800,
+    'f': 6000, 'g': 6200, 'h': 6400, 'i': 6600, 'j': 6800,
+    'k': 7000, 'l': 7200, 'm': 7400, 'n': 7600, 'o': 7800,
+    'p': 8000, 'q': 8200, 'r': 8400, 's': 8600, 't': 8800,
+    'u': 9000, 'v': 9200, 'w': 9400, 'x': 9600, 'y': 9800,
+    'z': 10000, '-': 2200, ',': 2000
+}
+FREQ_TO_CHAR = {v: k for k, v in CHAR_TO_FREQ.items()}
+
+RATE = 44100
+
+START_FREQ = 1200  # Match watch app's start frequency
+END_FREQ = 11000  # Match watch app's end frequency
+
+START_FREQ_TOLERANCE = 150  # Tolerance for start frequency detection
+END_FREQ_TOLERANCE = 500  # Tolerance for end frequency detection
+CHAR_FREQ_SPACING = 200  # Distance between neighbouring character tones
+
+TONE_DURATION = 0.3  # Length of each tone sent by the watch (chunkDuration)
+GAP_DURATION = 0.5  # Silence after each tone (silentDuration)
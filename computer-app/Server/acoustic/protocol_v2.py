@@ -0,0 +1,136 @@
+"""
+Acoustic protocol v2: short dual-tone symbols, numeric diver slots and a CRC.
+
+A v1 message such as "li,95" is one 0.3 s tone plus a 0.5 s gap per
+character, start and end tone included: about 5.6 s of airtime. A v2
+frame carries the same reading in about 0.75 s:
+
+    SYNC  slot (2 symbols)  bpm (2 symbols)  crc (2 symbols)
+
+Every symbol is two simultaneous tones, one from LOW_FREQS and one from
+HIGH_FREQS (like DTMF), so it carries 4 bits: symbol = 4 * low + high.
+Bytes are sent high nibble first. The sync is the pair SYNC_FREQS, which
+no data symbol uses. Frames have a fixed length, so there is no end tone.
+
+The slot (0-MAX_SLOT) is the diver's number in the Diver table
+(models/diver.py, Diver.slot) instead of their text ID. The CRC is CRC-8
+(polynomial 0x07, initial value 0xFF) of the slot and BPM bytes; frames
+whose CRC does not match are dropped by the decoder before any database
+lookup.
+
+These tables are shared by the decoder (acoustic/detector.py,
+acoustic/framing.py) and the synthetic encoder (acoustic/synth.py), and
+must match the watch app. Decoded frames are reported as text messages
+"#<slot>,<bpm>" (e.g. "#12,95"), so they travel through the same pipeline
+as v1 messages.
+"""
+
+LOW_FREQS = (2700, 3100, 3500, 3900)  # Off the v1 character grid (multiples of 200 Hz)
+HIGH_FREQS = (5700, 6500, 7300, 8100)  # Clear of the second harmonics of the low tones
+SYNC_FREQS = (1700, 9700)
+SYMBOLS = len(LOW_FREQS) * len(HIGH_FREQS)  # 16: one nibble per symbol
+
+SYMBOL_DURATION = 0.06  # Seconds each symbol (and the sync) is played
+GUARD_DURATION = 0.04  # Silence after each symbol; at least one analysis window plus one hop long
+SYNC_DURATION = 0.1
+
+# Analysis windows of the v2 decoder: much shorter than a v1 window, to resolve short symbols.
+# 1024 samples resolve 43 Hz, far finer than the 400 Hz between tones of a group
+WINDOW_SIZE = 1024
+WINDOW_OVERLAP = 0.5
+
+MAX_SLOT = 255
+FRAME_BYTES = 3  # Slot, BPM, CRC
+FRAME_SYMBOLS = 2 * FRAME_BYTES
+MESSAGE_PREFIX = "#"
+
+CRC_POLYNOMIAL = 0x07
+CRC_INITIAL = 0xFF
+
+
+def _crc_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ CRC_POLYNOMIAL) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table.append(crc)
+    return tuple(table)
+
+
+CRC_TABLE = _crc_table()
+
+
+def crc8(data):
+    """CRC-8 of a sequence of byte values (polynomial CRC_POLYNOMIAL, initial value CRC_INITIAL)."""
+    crc = CRC_INITIAL
+    for byte in data:
+        crc = CRC_TABLE[crc ^ byte]
+    return crc
+
+
+def symbol_freqs(symbol):
+    """Returns the (low, high) tone pair of a symbol."""
+    return LOW_FREQS[symbol // len(HIGH_FREQS)], HIGH_FREQS[symbol % len(HIGH_FREQS)]
+
+
+def encode_frame(slot, bpm):
+    """
+    Encodes a reading as the FRAME_SYMBOLS data symbols that follow the sync.
+
+    Raises:
+        ValueError: If the slot or the BPM does not fit in a byte.
+    """
+    if not 0 <= slot <= MAX_SLOT:
+        raise ValueError(f"Slot {slot} is outside 0-{MAX_SLOT}")
+    if not 0 <= bpm <= 255:
+        raise ValueError(f"BPM {bpm} does not fit in a byte")
+    data = (slot, bpm, crc8((slot, bpm)))
+    return [nibble for byte in data for nibble in (byte >> 4, byte & 0x0F)]
+
+
+def decode_frame(symbols):
+    """
+    Decodes the data symbols of a frame.
+
+    Returns:
+        tuple: (slot, bpm), or None if the CRC does not match.
+    """
+    if len(symbols) != FRAME_SYMBOLS:
+        return None
+    slot, bpm, crc = (symbols[i] << 4 | symbols[i + 1] for i in range(0, FRAME_SYMBOLS, 2))
+    if crc8((slot, bpm)) != crc:
+        return None
+    return slot, bpm
+
+
+def format_message(slot, bpm):
+    """Text form of a decoded frame, as handed to the message pipeline."""
+    return f"{MESSAGE_PREFIX}{slot},{bpm}"
+
+
+def parse_message(message):
+    """
+    Splits a "#<slot>,<bpm>" message into (slot, bpm).
+
+    Returns:
+        tuple: (slot, bpm), or None if the message is not a v2 message.
+    """
+    if not message.startswith(MESSAGE_PREFIX):
+        return None
+    slot, _, bpm = message[len(MESSAGE_PREFIX):].partition(",")
+    if not slot.isdigit() or not bpm.isdigit() or int(slot) > MAX_SLOT:
+        return None
+    return int(slot), int(bpm)
+
+
+def frame_tones(slot, bpm):
+    """
+    The tones of a transmission, in order, as the watch plays them.
+
+    Returns:
+        list: (frequencies, tone duration, following silence) tuples.
+    """
+    tones = [(SYNC_FREQS, SYNC_DURATION, GUARD_DURATION)]
+    tones += [(symbol_freqs(symbol), SYMBOL_DURATION, GUARD_DURATION) for symbol in encode_frame(slot, bpm)]
+    return tones
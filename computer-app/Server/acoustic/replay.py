@@ -0,0 +1,131 @@
+import logging
+import os
+import time
+from collections import Counter
+
+import log
+from acoustic.decoder import PROTOCOL
+from acoustic.noise_gate import GATE_SNR_DB
+from acoustic.pipeline import MessageDeduplicator, format_stats
+
+
+def load_expected(source_spec):
+    """
+    Returns the messages a recording is known to contain. For a recording
+    at capture.wav they are read from capture.txt (one message per line);
+    synthetic sources already know their messages.
+    """
+    if source_spec.startswith("synth:"):
+        return [m for m in source_spec[6:].split(";") if m]
+    sidecar = os.path.splitext(source_spec)[0] + ".txt"
+    if os.path.exists(sidecar):
+        with open(sidecar) as f:
+            return [line.strip() for line in f if line.strip()]
+    return []
+
+
+def message_error_rate(expected, decoded):
+    """
+    Fraction of message errors: every expected message that was not decoded
+    and every decoded message that was not expected counts as one error.
+    """
+    if not expected:
+        return None
+    missing = Counter(expected) - Counter(decoded)
+    spurious = Counter(decoded) - Counter(expected)
+    return (sum(missing.values()) + sum(spurious.values())) / len(expected)
+
+
+def run_replay(server, verbose=False):
+    """
+    Runs server.listen() to the end of its source and measures throughput.
+    Only warnings are logged, or every decoder debug line if verbose is set.
+
+    Returns:
+        dict: Benchmark results.
+    """
+    started = time.perf_counter()
+    with log.level(logging.DEBUG if verbose else logging.WARNING):
+        server.listen()
+    elapsed = time.perf_counter() - started
+
+    audio_seconds = server._now()
+    latencies = [end - start for _, start, end in server.decoded_messages]
+    return {
+        "mode": "streaming",
+        "audio_seconds": audio_seconds,
+        "wall_seconds": elapsed,
+        "realtime_factor": audio_seconds / elapsed if elapsed else float("inf"),
+        "windows": server.windows_processed,
+        "windows_per_second": server.windows_processed / elapsed if elapsed else float("inf"),
+        "windows_skipped": server.windows_skipped,
+        "messages": [m for m, _, _ in server.decoded_messages],
+        "times": [end for _, _, end in server.decoded_messages],
+        "latencies": latencies,
+        "stages": server.pipeline_stats(),
+    }
+
+
+def run_batch(source, detector, overlap, dedup_window, verbose=False, gate_snr_db=GATE_SNR_DB, protocol=PROTOCOL):
+    """
+    Decodes a whole recording with the vectorized batch decoder, one channel
+    at a time, and merges the channels like the streaming pipeline does.
+
+    Returns:
+        dict: Benchmark results, in the same shape as run_replay().
+    """
+    from acoustic.batch import decode_batch
+
+    samples = source.read_all()
+    channels = [samples] if samples.ndim == 1 else [samples[:, c] for c in range(samples.shape[1])]
+
+    started = time.perf_counter()
+    decoded = []
+    stats = {}
+    with log.level(logging.DEBUG if verbose else logging.WARNING):
+        for channel, channel_samples in enumerate(channels):
+            decoded += [(channel,) + m for m in decode_batch(channel_samples, detector, overlap, channel,
+                                                             gate_snr_db, stats, protocol)]
+    elapsed = time.perf_counter() - started
+
+    # Same transmission heard on several hydrophones counts once
+    deduplicator = MessageDeduplicator(dedup_window, max_messages=0)
+    decoded = [m for m in sorted(decoded, key=lambda m: m[3]) if deduplicator.offer(*m)]
+
+    windows = stats.get("windows", 0)
+    audio_seconds = len(samples) / source.rate
+    return {
+        "mode": "batch",
+        "audio_seconds": audio_seconds,
+        "wall_seconds": elapsed,
+        "realtime_factor": audio_seconds / elapsed if elapsed else float("inf"),
+        "windows": windows,
+        "windows_per_second": windows / elapsed if elapsed else float("inf"),
+        "windows_skipped": stats.get("windows_skipped", 0),
+        "messages": [m[1] for m in decoded],
+        "times": [m[3] for m in decoded],
+        "latencies": [m[3] - m[2] for m in decoded],
+        "stages": [],
+    }
+
+
+def print_report(results, expected):
+    """Prints a human-readable summary of a replay benchmark."""
+    print(f"=== Acoustic decoder replay ({results['mode']}) ===")
+    print(f"Audio replayed:   {results['audio_seconds']:.1f} s in {results['wall_seconds']:.2f} s "
+          f"({results['realtime_factor']:.1f}x real time)")
+    print(f"Windows analyzed: {results['windows']} ({results['windows_per_second']:.0f} windows/s)")
+    total = results["windows"] + results["windows_skipped"]
+    print(f"Windows skipped:  {results['windows_skipped']} ({results['windows_skipped'] / total if total else 0:.1%}, "
+          f"gated as silence or noise)")
+    print(f"Messages decoded: {len(results['messages'])}")
+    for message, at, latency in zip(results["messages"], results["times"], results["latencies"]):
+        print(f"  {at:8.2f} s  '{message}'  decode latency {latency:.2f} s after start tone")
+    if results["stages"]:
+        print("Pipeline stages:")
+        print(format_stats(results["stages"]))
+    mer = message_error_rate(expected, results["messages"])
+    if mer is None:
+        print("Message error rate: n/a (no expected messages)")
+    else:
+        print(f"Message error rate: {mer:.1%} over {len(expected)} expected messages")
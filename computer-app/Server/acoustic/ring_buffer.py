@@ -0,0 +1,90 @@
+import numpy as np
+
+
+def hop_size_for(window_size, overlap):
+    """Samples between the starts of consecutive windows for a given overlap fraction."""
+    if not 0 <= overlap < 1:
+        raise ValueError("overlap must be in the range [0, 1)")
+    return max(1, int(round(window_size * (1 - overlap))))
+
+
+class AudioRingBuffer:
+    """
+    Fixed-capacity ring buffer for int16 audio that hands out analysis
+    windows as views, without copying or allocating per chunk.
+
+    The storage is mirrored: every sample is written at position i and
+    i + capacity, so any run of up to `capacity` samples starting anywhere
+    in the ring is contiguous in memory and can be returned as a plain
+    numpy slice.
+
+    Windows are window_size samples long and advance by hop_size samples,
+    so overlap = 1 - hop_size / window_size (e.g. 0.5 or 0.75).
+
+    Views returned by windows() and pending() point into the ring and are
+    only valid until the next write().
+    """
+
+    def __init__(self, window_size, overlap=0.5, capacity=None, dtype=np.int16):
+        self.window_size = window_size
+        self.hop_size = hop_size_for(window_size, overlap)
+        self.capacity = capacity or 2 * window_size
+        if self.capacity < window_size:
+            raise ValueError("capacity must be at least window_size")
+
+        self._data = np.zeros(2 * self.capacity, dtype=dtype)
+        self._write_pos = 0  # Total samples ever written
+        self._read_pos = 0  # Total-sample index where the next window starts
+        self.dropped = 0  # Samples overwritten before they could be analyzed
+
+    def __len__(self):
+        """Number of samples written but not yet consumed by a hop."""
+        return self._write_pos - self._read_pos
+
+    def write(self, chunk):
+        """
+        Appends a chunk of samples. If the chunk would overwrite samples that
+        have not been analyzed yet, the oldest ones are dropped.
+        """
+        n = len(chunk)
+        if n == 0:
+            return
+        if n > self.capacity:
+            # Only the newest samples fit; the skipped ones are counted as dropped with the overflow below
+            self._write_pos += n - self.capacity
+            chunk = chunk[-self.capacity:]
+            n = self.capacity
+
+        start = self._write_pos % self.capacity
+        first = min(n, self.capacity - start)
+        # Primary copy and its mirror; a chunk that wraps is written in two parts
+        self._data[start:start + first] = chunk[:first]
+        self._data[start + self.capacity:start + self.capacity + first] = chunk[:first]
+        if first < n:
+            rest = n - first
+            self._data[:rest] = chunk[first:]
+            self._data[self.capacity:self.capacity + rest] = chunk[first:]
+        self._write_pos += n
+
+        overflow = len(self) - self.capacity
+        if overflow > 0:
+            self.dropped += overflow
+            self._read_pos += overflow
+
+    def _view(self, length):
+        start = self._read_pos % self.capacity
+        return self._data[start:start + length]
+
+    def windows(self):
+        """Yields every complete window currently available, advancing by hop_size."""
+        while len(self) >= self.window_size:
+            yield self._view(self.window_size)
+            self._read_pos += self.hop_size
+
+    def pending(self):
+        """Returns a view of the samples that have not been consumed by a hop yet."""
+        return self._view(len(self))
+
+    def clear(self):
+        """Discards all buffered samples."""
+        self._read_pos = self._write_pos
@@ -0,0 +1,234 @@
+import os
+import wave
+
+import numpy as np
+
+from acoustic.protocol import RATE
+from metrics import Counter
+
+INPUT_OVERFLOWS = Counter("aquasafe_input_overflows", "Input buffers the sound card dropped before they were read")
+
+
+class AudioSource:
+    """
+    Base class for everything the acoustic server can listen to.
+
+    read() returns the next chunk of int16 samples, or None when the source
+    is exhausted. Mono sources return a 1-D array; sources with several
+    channels (one per hydrophone) return interleaved frames as a
+    (samples, channels) array.
+
+    Live sources block until audio is available, and can instead push
+    chunks to a callback with start(); file and synthetic sources return
+    immediately, so they replay faster than real time.
+    """
+    realtime = False
+
+    def __init__(self, rate=RATE, channels=1):
+        self.rate = rate
+        self.channels = channels
+        self.overflows = 0  # Input buffers the sound card dropped before we could read them
+
+    def read(self, num_samples):
+        raise NotImplementedError
+
+    def read_all(self, chunk_size=65536):
+        """Returns every remaining sample as one array (for batch decoding of recordings)."""
+        chunks = []
+        while True:
+            chunk = self.read(chunk_size)
+            if chunk is None:
+                break
+            chunks.append(chunk)
+        if not chunks:
+            return np.zeros((0,) if self.channels == 1 else (0, self.channels), dtype=np.int16)
+        return np.concatenate(chunks)
+
+    def start(self, on_chunk):
+        """
+        Push mode: calls on_chunk(samples) from the audio driver's thread for
+        every captured buffer until close(). Only live sources support it.
+        """
+        raise NotImplementedError
+
+    def is_active(self):
+        """True while a push-mode source is still delivering audio."""
+        return False
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class PyAudioSource(AudioSource):
+    """Live microphone / hydrophone input through PyAudio."""
+    realtime = True
+
+    def __init__(self, device_index=2, rate=RATE, frames_per_buffer=1024, channels=1):
+        super().__init__(rate, channels)
+        import pyaudio  # Only needed for live capture
+
+        self.pyaudio = pyaudio
+        self.p = pyaudio.PyAudio()
+        self.device_index = device_index
+        self.frames_per_buffer = frames_per_buffer
+        self.stream = None # Opened on first read() (blocking) or start() (callback)
+
+    def _open(self, callback=None):
+        # Open the audio stream for input (microphone)
+        self.stream = self.p.open(format=self.pyaudio.paInt16,
+                                  channels=self.channels,
+                                  rate=self.rate,
+                                  input=True,
+                                  frames_per_buffer=self.frames_per_buffer,
+                                  input_device_index=self.device_index,
+                                  stream_callback=callback)
+
+    def _to_samples(self, data):
+        samples = np.frombuffer(data, dtype=np.int16)
+        return samples if self.channels == 1 else samples.reshape(-1, self.channels)
+
+    def read(self, num_samples):
+        if self.stream is None:
+            self._open()
+        data = self.stream.read(num_samples, exception_on_overflow=False)
+        return self._to_samples(data)
+
+    def start(self, on_chunk):
+        def callback(in_data, frame_count, time_info, status):
+            if status & self.pyaudio.paInputOverflow:
+                self.overflows += 1
+                INPUT_OVERFLOWS.inc()
+            on_chunk(self._to_samples(in_data))
+            return None, self.pyaudio.paContinue
+
+        self._open(callback)
+        self.stream.start_stream()
+
+    def is_active(self):
+        return self.stream is not None and self.stream.is_active()
+
+    def list_devices(self):
+        """Returns (index, name) for every input device, to help find the hydrophone."""
+        info = self.p.get_host_api_info_by_index(0)
+        devices = []
+        for i in range(info.get('deviceCount')):
+            device = self.p.get_device_info_by_host_api_device_index(0, i)
+            if device.get('maxInputChannels') > 0:
+                devices.append((i, device.get('name')))
+        return devices
+
+    def close(self):
+        # Ensure audio stream and PyAudio resources are properly closed
+        if self.stream is not None:
+            if self.stream.is_active():
+                self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+        self.p.terminate()
+
+
+class ArraySource(AudioSource):
+    """
+    Replays an in-memory (or memory-mapped) int16 array chunk by chunk,
+    returning views. A 2-D array is treated as (samples, channels).
+    """
+
+    def __init__(self, samples, rate=RATE):
+        super().__init__(rate, 1 if samples.ndim == 1 else samples.shape[1])
+        self.samples = samples
+        self.position = 0
+
+    def read(self, num_samples):
+        if self.position >= len(self.samples):
+            return None
+        chunk = self.samples[self.position:self.position + num_samples]
+        self.position += len(chunk)
+        return np.asarray(chunk)
+
+    def read_all(self, chunk_size=None):
+        # No copy: a memory-mapped recording stays on disk until it is read
+        remaining = self.samples[self.position:]
+        self.position = len(self.samples)
+        return remaining
+
+
+class NumpySource(ArraySource):
+    """
+    Replays a .npy file (memory-mapped, so long recordings are never loaded
+    whole) or a headerless .raw/.pcm file of int16 samples.
+    """
+
+    def __init__(self, path, rate=RATE):
+        if path.endswith(".npy"):
+            samples = np.load(path, mmap_mode="r")
+        else:
+            samples = np.memmap(path, dtype=np.int16, mode="r")
+        if samples.dtype != np.int16 or samples.ndim not in (1, 2):
+            raise ValueError(f"{path}: expected a 1-D or 2-D int16 array, got {samples.ndim}-D {samples.dtype}")
+        super().__init__(samples, rate)
+
+
+class WavSource(AudioSource):
+    """Replays a 16-bit WAV recording (mono or one channel per hydrophone)."""
+
+    def __init__(self, path):
+        self.wav = wave.open(path, "rb")
+        if self.wav.getsampwidth() != 2:
+            self.wav.close()
+            raise ValueError(f"{path}: expected 16-bit audio")
+        super().__init__(self.wav.getframerate(), self.wav.getnchannels())
+
+    def read(self, num_samples):
+        data = self.wav.readframes(num_samples)
+        if not data:
+            return None
+        samples = np.frombuffer(data, dtype=np.int16)
+        return samples if self.channels == 1 else samples.reshape(-1, self.channels)
+
+    def close(self):
+        self.wav.close()
+
+
+class SyntheticSource(ArraySource):
+    """Renders watch transmissions for the given messages, separated by silence."""
+
+    def __init__(self, messages, silence=1.0, amplitude=0.5, rate=RATE):
+        from acoustic.synth import render_message
+
+        gap = np.zeros(int(silence * rate), dtype=np.int16)
+        parts = [gap]
+        for message in messages:
+            parts += [render_message(message, amplitude, rate), gap]
+        super().__init__(np.concatenate(parts), rate)
+
+
+def open_source(spec, channels=1):
+    """
+    Opens an audio source from a command-line style spec. `channels` only
+    applies to live input; recordings carry their own channel count.
+
+        mic            live input on the default device (index 2)
+        mic:<index>    live input on a specific device
+        synth:<msg>,.. synthetic transmissions (messages separated by ';')
+        <path>.wav     WAV recording
+        <path>.npy     NumPy array (memory-mapped)
+        <path>.raw     headerless int16 samples (memory-mapped)
+    """
+    if spec == "mic":
+        return PyAudioSource(channels=channels)
+    if spec.startswith("mic:"):
+        return PyAudioSource(device_index=int(spec[4:]), channels=channels)
+    if spec.startswith("synth:"):
+        return SyntheticSource([m for m in spec[6:].split(";") if m])
+
+    if not os.path.exists(spec):
+        raise FileNotFoundError(spec)
+    if spec.lower().endswith(".wav"):
+        return WavSource(spec)
+    return NumpySource(spec)
@@ -0,0 +1,246 @@
+"""
+Synthetic transmissions that mirror the watch app (MainActivity.kt), for
+load-testing the acoustic decoder without divers in the water.
+
+Example: 20 divers over one minute at 10 dB SNR, written with a sidecar
+file of expected messages for the replay benchmark:
+
+    python -m acoustic.synth --divers 20 --duration 60 --snr 10 --out scene.wav
+    python acoustic_server.py --source scene.wav --benchmark
+
+Messages of the form "#<slot>,<bpm>" are sent as protocol v2 frames
+(acoustic/protocol_v2.py), everything else as v1 character tones, so a
+scene can mix both:
+
+    python -m acoustic.synth --divers 20 --protocol v2 --out scene_v2.wav
+    python acoustic_server.py --source scene_v2.wav --benchmark --protocol v2
+"""
+import argparse
+import os
+import random
+import string
+import wave
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+
+from acoustic import protocol_v2
+from acoustic.protocol import (
+    CHAR_TO_FREQ, RATE, START_FREQ, END_FREQ, TONE_DURATION, GAP_DURATION,
+)
+
+SPEED_OF_SOUND_WATER = 1500.0  # m/s, used for Doppler shifts
+V1_ID_COUNT = len(string.ascii_lowercase) ** 2  # Two-letter diver IDs of v1 scenes
+
+
+class Transmission(NamedTuple):
+    """One diver's message placed in a scene."""
+    message: str
+    start_time: float  # Seconds from the start of the scene
+    amplitude: float = 0.5  # Peak amplitude as a fraction of full scale
+    velocity: float = 0.0  # Radial velocity towards the hydrophone in m/s (Doppler)
+    echoes: Tuple[Tuple[float, float], ...] = ()  # (delay in seconds, relative gain) per multipath echo
+
+
+def message_tones(message):
+    """
+    The tones of a transmission, in order.
+
+    Returns:
+        list: (frequencies, tone duration, following silence) tuples.
+    """
+    frame = protocol_v2.parse_message(message)
+    if frame is not None:
+        return protocol_v2.frame_tones(*frame)
+    freqs = [START_FREQ] + [CHAR_TO_FREQ[c] for c in message if c in CHAR_TO_FREQ] + [END_FREQ]
+    return [((freq,), TONE_DURATION, GAP_DURATION) for freq in freqs]
+
+
+def message_duration(message, velocity=0.0):
+    """Airtime of a transmission in seconds, including the trailing gap."""
+    return sum(tone + gap for _, tone, gap in message_tones(message)) / doppler_factor(velocity)
+
+
+def doppler_factor(velocity):
+    """Frequency scale for a source moving towards the receiver at `velocity` m/s."""
+    return 1.0 + velocity / SPEED_OF_SOUND_WATER
+
+
+def _render_tones(message, velocity, rate):
+    """Renders a transmission as float samples in [-1, 1]."""
+    factor = doppler_factor(velocity)
+    tones = message_tones(message)
+    # Doppler compresses time by the same factor it raises frequency
+    out = np.zeros(int(sum(tone + gap for _, tone, gap in tones) * rate / factor) + 1)
+    position = 0.0
+    for freqs, tone, gap in tones:
+        start = int(position * rate / factor)
+        t = np.arange(int(tone * rate / factor)) / rate
+        # The tones of a pair share the amplitude, so the peak stays within [-1, 1]
+        out[start:start + len(t)] = sum(np.sin(2 * np.pi * freq * factor * t) for freq in freqs) / len(freqs)
+        position += tone + gap
+    return out
+
+
+def render_message(message, amplitude=0.5, rate=RATE):
+    """
+    Synthesizes one transmission exactly as the watch app plays it:
+    START tone -> character tones -> END tone, each followed by a gap
+    (protocol v2: sync -> six dual-tone symbols, each followed by a guard).
+
+    Args:
+        message (str): Message to encode (e.g., "li,95", or "#12,95" for v2).
+        amplitude (float): Peak amplitude as a fraction of full scale.
+        rate (int): Sample rate.
+
+    Returns:
+        np.array: int16 samples.
+    """
+    return (_render_tones(message, 0.0, rate) * amplitude * 32767).astype(np.int16)
+
+
+def render_scene(transmissions: List[Transmission], duration=None, snr_db=None, rate=RATE, seed=None):
+    """
+    Mixes several transmissions, with Doppler, multipath echoes and
+    background noise, into a single hydrophone signal.
+
+    Args:
+        transmissions (list): Transmission tuples, possibly overlapping in time.
+        duration (float): Scene length in seconds. Defaults to the end of the last transmission.
+        snr_db (float): Signal-to-noise ratio of a full-scale (amplitude 1.0) tone
+                        against white Gaussian noise. None means no noise.
+        rate (int): Sample rate.
+        seed (int): Seed for the noise generator.
+
+    Returns:
+        np.array: int16 samples (clipped to the int16 range).
+    """
+    if duration is None:
+        duration = max((t.start_time + message_duration(t.message, t.velocity) for t in transmissions), default=0)
+    mix = np.zeros(int(duration * rate))
+
+    for tx in transmissions:
+        signal = _render_tones(tx.message, tx.velocity, rate) * tx.amplitude
+        paths = [(0.0, 1.0)] + list(tx.echoes)
+        for delay, gain in paths:
+            start = int((tx.start_time + delay) * rate)
+            if start >= len(mix):
+                continue
+            end = min(len(mix), start + len(signal))
+            mix[start:end] += signal[:end - start] * gain
+
+    if snr_db is not None:
+        rng = np.random.default_rng(seed)
+        # A sine of amplitude 1.0 has power 0.5
+        noise_std = np.sqrt(0.5 / 10 ** (snr_db / 10))
+        mix += rng.normal(0.0, noise_std, len(mix))
+
+    return (np.clip(mix, -1.0, 1.0) * 32767).astype(np.int16)
+
+
+def generate_divers(num_divers, duration, overlap=True, amplitude=(0.2, 0.8), max_velocity=0.0,
+                    echo_delay=None, echo_gain=0.3, seed=None, protocol="v1"):
+    """
+    Builds one transmission per diver with random IDs and BPMs.
+
+    Args:
+        num_divers (int): Number of divers transmitting.
+        duration (float): Scene length in seconds; every transmission fits inside it.
+        overlap (bool): If True, start times are random and transmissions may overlap.
+                        If False, transmissions are spaced evenly one after another.
+        amplitude (tuple): (min, max) peak amplitude per diver.
+        max_velocity (float): Divers get a random radial velocity in [-max, max] m/s.
+        echo_delay (float): If set, each diver gets one multipath echo delayed by up to this many seconds.
+        echo_gain (float): Relative gain of the echo.
+        seed (int): Seed for reproducible scenes.
+        protocol (str): "v1" for text IDs, "v2" for slot numbers (messages "#<slot>,<bpm>").
+
+    Returns:
+        list: Transmission tuples, sorted by start time.
+
+    Raises:
+        ValueError: If there are more divers than distinct IDs (V1_ID_COUNT two-letter IDs, or v2 slots).
+    """
+    available = protocol_v2.MAX_SLOT + 1 if protocol == "v2" else V1_ID_COUNT
+    if num_divers > available:
+        raise ValueError(f"At most {available} divers have distinct {protocol} IDs, not {num_divers}")
+    rng = random.Random(seed)
+    if protocol == "v2":
+        ids = rng.sample(range(protocol_v2.MAX_SLOT + 1), num_divers)
+    else:
+        ids = set()
+        while len(ids) < num_divers:
+            ids.add("".join(rng.choice(string.ascii_lowercase) for _ in range(2)))
+
+    transmissions = []
+    slot = duration / max(num_divers, 1)
+    for i, diver_id in enumerate(sorted(ids)):
+        bpm = rng.randint(60, 180)
+        message = protocol_v2.format_message(diver_id, bpm) if protocol == "v2" else f"{diver_id},{bpm}"
+        velocity = rng.uniform(-max_velocity, max_velocity)
+        airtime = message_duration(message, velocity)
+        if overlap:
+            start = rng.uniform(0, max(0.0, duration - airtime))
+        else:
+            start = i * slot
+        echoes = ((rng.uniform(0.001, echo_delay), echo_gain),) if echo_delay else ()
+        transmissions.append(Transmission(message, start, rng.uniform(*amplitude), velocity, echoes))
+    return sorted(transmissions, key=lambda t: t.start_time)
+
+
+def write_wav(path, samples, rate=RATE):
+    """Writes int16 mono samples to a WAV file."""
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(np.ascontiguousarray(samples, dtype=np.int16).tobytes())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic multi-diver acoustic transmissions")
+    parser.add_argument("--divers", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=None,
+                        help="Scene length in seconds (default: long enough to send every message back to back)")
+    parser.add_argument("--snr", type=float, default=None, help="SNR in dB of a full-scale tone (default: no noise)")
+    parser.add_argument("--doppler", type=float, default=0.0, help="Maximum diver radial velocity in m/s")
+    parser.add_argument("--echo", type=float, default=None, help="Maximum multipath echo delay in seconds")
+    parser.add_argument("--echo-gain", type=float, default=0.3)
+    parser.add_argument("--sequential", action="store_true", help="Do not let transmissions overlap")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--protocol", default="v1", choices=["v1", "v2"],
+                        help="v1 character tones or v2 dual-tone frames with diver slots")
+    parser.add_argument("--out", help="WAV file to write (expected messages go to a .txt next to it)")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Feed the scene straight into the decoder and report the replay benchmark")
+    parser.add_argument("--verbose", action="store_true", help="Show decoder output during --benchmark")
+    args = parser.parse_args()
+
+    # Long enough for every diver to transmit once without overlapping
+    longest = protocol_v2.format_message(protocol_v2.MAX_SLOT, 180) if args.protocol == "v2" else "zz,180"
+    duration = args.duration or args.divers * message_duration(longest) + 1.0
+    try:
+        transmissions = generate_divers(args.divers, duration, overlap=not args.sequential,
+                                        max_velocity=args.doppler, echo_delay=args.echo,
+                                        echo_gain=args.echo_gain, seed=args.seed, protocol=args.protocol)
+    except ValueError as e:
+        parser.error(str(e))
+    samples = render_scene(transmissions, duration, args.snr, seed=args.seed)
+    expected = [t.message for t in transmissions]
+
+    if args.out:
+        write_wav(args.out, samples)
+        with open(os.path.splitext(args.out)[0] + ".txt", "w") as f:
+            f.write("\n".join(expected) + "\n")
+        print(f"Wrote {len(samples) / RATE:.1f} s with {len(expected)} transmissions to {args.out}")
+
+    if args.benchmark:
+        from acoustic_server import AcousticServer
+        from acoustic.sources import ArraySource
+        from acoustic.replay import run_replay, print_report
+        server = AcousticServer(ArraySource(samples), message_handler=lambda message, at: True, protocol=args.protocol)
+        print_report(run_replay(server, verbose=args.verbose), expected)
+
+
+if __name__ == "__main__":
+    main()
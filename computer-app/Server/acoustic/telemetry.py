@@ -0,0 +1,177 @@
+"""
+Write-behind persistence for diver telemetry decoded by the acoustic server.
+
+Updates are coalesced per diver (only the latest BPM of each diver is
+written) and flushed every FLUSH_INTERVAL seconds as one bulk UPDATE in a
+single transaction, instead of one query and one commit per message. A
+status escalation (normal -> warning -> critical) is flushed right away
+so the API never shows a stale status for a diver in trouble.
+
+Every reading (not only the latest) is also appended to the readings
+history in the same transaction, and the history is compacted into
+rollups every COMPACT_INTERVAL seconds.
+"""
+import logging
+import time
+
+from sqlalchemy import select, update
+
+from acoustic.constants import FLUSH_INTERVAL
+from database import SessionLocal
+from log import get_logger
+from managers.reading_manager import ReadingManager
+from models.diver import Diver as DiverModel
+from models.group import Group  # Registers the Diver.group relationship target
+
+logger = get_logger("acoustic.telemetry")
+
+COMPACT_INTERVAL = 3600.0  # Seconds between compactions of the readings history
+
+# BPM limits for the status of a diver
+WARNING_BPM = 120
+CRITICAL_BPM = 150
+
+STATUS_SEVERITY = {"normal": 0, "warning": 1, "critical": 2}
+
+
+def status_for_bpm(bpm):
+    """Returns the diver status ("normal", "warning" or "critical") for a BPM reading."""
+    if bpm > CRITICAL_BPM:
+        return "critical"
+    if bpm > WARNING_BPM:
+        return "warning"
+    return "normal"
+
+
+class TelemetryWriter:
+    """
+    Buffers BPM updates and writes them in batches. Not thread-safe: it is
+    meant to be used from the persistence worker only.
+    """
+
+    def __init__(self, session_factory=SessionLocal, flush_interval=FLUSH_INTERVAL, compact_interval=COMPACT_INTERVAL):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
+        self._pending = {} # diver_id -> columns to update ("bpm", "status"), latest reading only
+        self._readings = [] # Every reading since the last flush, for the history
+        self._last_compaction = time.monotonic()
+        self._first_pending_at = None # time.monotonic() of the oldest unflushed update
+        self._status = {} # Last status written (or queued) per diver
+        self._known_ids = set() # Divers known to exist, so unknown ids cost one lookup
+
+        # Counters
+        self.received = 0
+        self.coalesced = 0
+        self.written = 0
+        self.flushes = 0
+
+    def update(self, diver_id, bpm, timestamp=None, status=None):
+        """
+        Queues a BPM reading for a diver.
+
+        Args:
+            diver_id (str): Diver the reading belongs to.
+            bpm (int): Heart rate.
+            timestamp (float): Unix time of the reading. Defaults to now.
+            status (str): The diver's status, as decided by the alert engine.
+                          Defaults to the fixed BPM limits (status_for_bpm).
+
+        Returns:
+            str: The diver's new status.
+        """
+        status = status_for_bpm(bpm) if status is None else status
+        self.received += 1
+        if diver_id in self._pending:
+            self.coalesced += 1
+        self._pending[diver_id] = {"bpm": bpm, "status": status}
+        self._readings.append({"diver_id": diver_id, "timestamp": time.time() if timestamp is None else timestamp,
+                               "bpm": bpm, "depth": None}) # The acoustic protocol carries no depth
+        self._queued(diver_id, status)
+        return status
+
+    def set_status(self, diver_id, status):
+        """Queues a status change without a reading (e.g. a diver reported lost)."""
+        self._pending.setdefault(diver_id, {})["status"] = status
+        self._queued(diver_id, status)
+
+    def _queued(self, diver_id, status):
+        escalated = STATUS_SEVERITY[status] > STATUS_SEVERITY[self._status.get(diver_id, "normal")]
+        self._status[diver_id] = status
+        if self._first_pending_at is None:
+            self._first_pending_at = time.monotonic()
+
+        if escalated:
+            self.flush()
+        else:
+            self.flush_if_due()
+
+    def flush_if_due(self):
+        """
+        Flushes if the oldest pending update has waited flush_interval seconds,
+        and compacts the readings history when it is due.
+        """
+        if self._first_pending_at is not None and time.monotonic() - self._first_pending_at >= self.flush_interval:
+            self.flush()
+        if time.monotonic() - self._last_compaction >= self.compact_interval:
+            self.compact()
+
+    def compact(self):
+        """Folds old raw readings into rollups (see ReadingManager.compact)."""
+        self._last_compaction = time.monotonic()
+        session = self.session_factory()
+        try:
+            compacted, expired = ReadingManager(session).compact()
+            if compacted or expired:
+                logger.info("Readings history compacted: %d raw readings, %d expired rollups", compacted, expired)
+        except Exception as e:
+            logger.error("❌ ERROR compacting readings history: %s", e)
+        finally:
+            session.close()
+
+    def flush(self):
+        """Writes every pending update in one transaction."""
+        if not self._pending:
+            return
+        pending, self._pending, self._first_pending_at = self._pending, {}, None
+        readings, self._readings = self._readings, []
+
+        session = self.session_factory()
+        try:
+            unknown = set(pending) - self._known_ids
+            if unknown:
+                found = session.scalars(select(DiverModel.id).where(DiverModel.id.in_(unknown))).all()
+                self._known_ids.update(found)
+                for diver_id in unknown.difference(found):
+                    logger.warning("❌ ERROR: Diver %s not found in database", diver_id)
+                    del pending[diver_id]
+                    self._status.pop(diver_id, None)
+
+            readings = [reading for reading in readings if reading["diver_id"] in pending]
+            rows = [{"id": diver_id, **columns} for diver_id, columns in pending.items()]
+            if rows:
+                # ORM bulk UPDATE by primary key: one executemany per set of updated columns
+                session.execute(update(DiverModel), rows)
+                ReadingManager(session).add_readings(readings)
+                session.commit()
+                self.written += len(rows)
+                self.flushes += 1
+                if logger.isEnabledFor(logging.DEBUG):
+                    for row in rows:
+                        logger.debug("Diver %s updated: BPM = %s, Status = %s", row["id"], row.get("bpm", "-"), row["status"])
+        except Exception as e:
+            logger.error("❌ ERROR writing telemetry batch: %s", e)
+            session.rollback()
+            self._known_ids.difference_update(pending) # A diver may have been deleted; look them up again
+            # Keep the readings for the next flush, unless newer ones arrived meanwhile
+            for diver_id, reading in pending.items():
+                self._pending.setdefault(diver_id, reading)
+            self._readings = readings + self._readings
+            if self._first_pending_at is None:
+                self._first_pending_at = time.monotonic()
+        finally:
+            session.close()
+
+    def close(self):
+        """Writes whatever is still pending."""
+        self.flush()
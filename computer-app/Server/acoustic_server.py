@@ -1,147 +1,151 @@
-import pyaudio
-import numpy as np
-from scipy.fft import fft, fftfreq
+import argparse
+import os
+import queue
 import time
-from sqlalchemy.orm import Session
-from database import SessionLocal
-from managers.diver_manager import DiverManager
-from models.diver import Diver as DiverModel
-from models.group import Group
+# SQLAlchemy and the models are imported by _open_outputs(), on the persistence thread,
+# so audio capture starts without waiting for them
+from acoustic import protocol_v2
+from acoustic.protocol import RATE
+from acoustic.decoder import ChannelDecoder, DETECTOR, PROTOCOL, PROTOCOLS, WINDOW_OVERLAP
+from acoustic.noise_gate import GATE_SNR_DB
+from acoustic.pipeline import DecoderWorker, MessageDeduplicator, PersistenceWorker, StageStats, format_stats
+from acoustic.sources import PyAudioSource
+from events.publisher import EventPublisher
+from notifications.dispatcher import alert_notification, dispatcher
+from log import get_logger
+from metrics import Counter, start_http_server
 
 
 # --- Acoustic Communication Protocol Settings ---
+# Tone frequencies and the sample rate are defined in acoustic/protocol.py,
+# detection thresholds and message framing in acoustic/framing.py
 
-CHAR_TO_FREQ = {
-    '0': 3000, '1': 3200, '2': 3400, '3': 3600, '4': 3800,
-    '5': 4000, '6': 4200, '7': 4400, '8': 4600, '9': 4800,
-    'a': 5000, 'b': 5200, 'c': 5400, 'd': 5600, 'e': 5800,
-    'f': 6000, 'g': 6200, 'h': 6400, 'i': 6600, 'j': 6800,
-    'k': 7000, 'l': 7200, 'm': 7400, 'n': 7600, 'o': 7800,
-    'p': 8000, 'q': 8200, 'r': 8400, 's': 8600, 't': 8800,
-    'u': 9000, 'v': 9200, 'w': 9400, 'x': 9600, 'y': 9800,
-    'z': 10000, '-': 2200, ',': 2000 
-}
-FREQ_TO_CHAR = {v: k for k, v in CHAR_TO_FREQ.items()}
-
-RATE = 44100
 BUFFER_CHUNK_SIZE = 1024  # Smaller chunks for continuous listening
+INPUT_DEVICE_INDEX = 2  # Run with --list-devices to find your microphone's index
+MAX_QUEUED_AUDIO = 5.0  # Seconds of audio each decoder worker may fall behind before chunks are dropped
+DEDUP_WINDOW = 3.0  # Same message from several hydrophones within this many seconds is one transmission
+STATS_INTERVAL = 30.0  # Seconds between pipeline health reports while listening live
+IDLE_INTERVAL = 1.0  # Seconds without messages before lost divers are checked and telemetry is flushed
+METRICS_PORT = int(os.environ.get("AQUASAFE_ACOUSTIC_METRICS_PORT", "9101"))  # Prometheus scrape port; 0 disables
 
-START_FREQ = 1200  # Match watch app's start frequency
-END_FREQ = 11000  # Match watch app's end frequency
-
-# Timing parameters
-FFT_WINDOW_SIZE = int(0.25 * RATE)  # Reduced for faster processing
-MAX_SILENT_TIME = 15.0  
-DIGIT_WAIT_TIME = 0  # Time to wait for additional digits after receiving a valid but potentially incomplete BPM
-
-# Signal strength thresholds
-CHAR_THRESHOLD = 5e2  # Reduced threshold for better sensitivity
-START_END_THRESHOLD = 1.5e3  # Reduced threshold
-END_FREQ_TOLERANCE = 500  # Tolerance for end frequency detection
-SIGNAL_STRENGTH_SENSITIVITY_THRESHOLD = 100  # Reduced for better sensitivity  
-
-# Message validation
-MIN_MESSAGE_LENGTH = 4  # Minimum length for a valid message (e.g., "a,99")
-MAX_MESSAGE_LENGTH = 10  # Maximum length for a valid message (e.g., "abcdef,123")
+logger = get_logger("acoustic.server")
+MESSAGES_PROCESSED = Counter("aquasafe_messages_processed", "Decoded messages handed to the database, by result "
+                             "(ok, error)", ["result"])
 
 class AcousticServer:
-    def __init__(self):
-        self.p = pyaudio.PyAudio()
-        # Open the audio stream for input (microphone)
-        self.stream = self.p.open(format=pyaudio.paInt16,
-                                  channels=1,
-                                  rate=RATE,
-                                  input=True,
-                                  frames_per_buffer=BUFFER_CHUNK_SIZE,
-                                  input_device_index=2) 
-        
-        # --- Uncomment to list audio devices and find your microphone's index ---
-        # info = self.p.get_host_api_info_by_index(0)
-        # numdevices = info.get('deviceCount')
-        # for i in range(0, numdevices):
-        #     if (self.p.get_device_info_by_host_api_device_index(0, i).get('maxInputChannels')) > 0:
-        #         print("Input Device id ", i, " - ", self.p.get_device_info_by_host_api_device_index(0, i).get('name'))
-        # -----------------------------------------------------------------------
-
-        self.db_session: Session = SessionLocal() # Initialize database session
-        self.diver_manager = DiverManager(self.db_session) # Initialize DiverManager
-        self.is_recording = False # Flag to indicate if a message is currently being recorded
-        self.message_buffer = [] # Stores detected characters for the current message
-        self.last_char_time = time.time() # Timestamp of the last detected character
-        self.max_silent_time = MAX_SILENT_TIME # Use the global constant for consistency
-
-    def _find_dominant_freq(self, data, min_freq, max_freq, apply_threshold=True):
+    def __init__(self, source=None, detector=DETECTOR, overlap=WINDOW_OVERLAP, message_handler=None,
+                 gate_snr_db=GATE_SNR_DB, protocol=PROTOCOL):
         """
-        Performs FFT on audio data to find the dominant frequency within a specified range.
-        
         Args:
-            data (np.array): Audio data (numpy array of int16 samples).
-            min_freq (int): Minimum frequency of interest.
-            max_freq (int): Maximum frequency of interest.
-            apply_threshold (bool): If True, apply CHAR_THRESHOLD to max_amplitude.
-            
-        Returns:
-            tuple: (dominant_frequency, max_amplitude) or (None, 0) if no dominant freq found
-                   or if amplitude is below threshold (if apply_threshold is True).
+            source (AudioSource): Where audio comes from. Defaults to the live
+                                  microphone on INPUT_DEVICE_INDEX.
+            detector (str): Tone detector name ("rfft" or "goertzel").
+            overlap (float): Fraction of overlap between consecutive analysis windows.
+            message_handler (callable): Called with every complete message and its completion time
+                                        (stream seconds).
+                                        Defaults to process_message (database update).
+            gate_snr_db (float): Band power above the noise floor needed before a chunk
+                                 is analyzed (acoustic/noise_gate.py); 0 disables the gate.
+            protocol (str): "v1" (character tones) or "v2" (dual-tone frames with diver
+                            slots, acoustic/protocol_v2.py).
         """
-        fft_size = len(data)
-        if fft_size == 0:
-            return None, 0
-
-        yf = fft(data) # Perform Fast Fourier Transform
-        xf = fftfreq(fft_size, 1 / RATE) # Get frequency bins
-
-        # Create a mask to select frequencies within the desired range
-        interest_mask = np.where((xf > min_freq) & (xf < max_freq))
-        
-        if len(interest_mask[0]) == 0: # No frequencies found in the interest range
-            return None, 0
-
-        freqs = xf[interest_mask] # Frequencies within the range
-        amps = np.abs(yf[interest_mask]) # Corresponding amplitudes
-
-        max_amplitude = np.max(amps) # Get the maximum amplitude in the range
-        
-        # Apply amplitude threshold if required (for character detection)
-        if apply_threshold and max_amplitude < CHAR_THRESHOLD:
-            return None, max_amplitude
-
-        dominant_freq_index = np.argmax(amps) # Index of the dominant frequency
-        return freqs[dominant_freq_index], max_amplitude
-
-    def _get_closest_char(self, freq):
+        self.source = source if source is not None else PyAudioSource(INPUT_DEVICE_INDEX, RATE, BUFFER_CHUNK_SIZE)
+        if self.source.rate != RATE:
+            raise ValueError(f"Audio source rate is {self.source.rate} Hz, the decoder expects {RATE} Hz")
+        self.message_handler = message_handler or self.process_message
+        self._persists = message_handler is None # Replay benchmarks pass their own handler and need no database
+
+        # Outputs of process_message, opened by _open_outputs() once listen() has started capturing
+        self.telemetry = None # Write-behind, batched BPM updates
+        self.alerts = None # Diver status from the alert rules; alerts on self.alerts.alerts
+        self.events = EventPublisher() # Readings and alerts to the API server
+        self.samples_read = 0 # Capture clock, in samples per channel
+
+        # One decoder per channel; every channel's messages meet in the deduplicator
+        self.deduplicator = MessageDeduplicator(DEDUP_WINDOW)
+        self.decoders = [ChannelDecoder(self.deduplicator.offer, detector, overlap, channel, gate_snr_db, protocol)
+                         for channel in range(self.source.channels)]
+        self.decoded_messages = [] # (message, start signal time, completion time) in stream time
+
+        # Pipeline stages, created by listen()
+        self.capture_stats = StageStats("capture")
+        self.workers = []
+        self.persistence = None
+
+    @property
+    def windows_processed(self):
+        return sum(decoder.windows_processed for decoder in self.decoders)
+
+    @property
+    def windows_skipped(self):
+        return sum(decoder.windows_skipped for decoder in self.decoders)
+
+    def _now(self):
+        """Current stream time in seconds (samples captured per channel / sample rate)."""
+        return self.samples_read / RATE
+
+    def _record_message(self, channel, message, start_time, end_time):
+        """Keeps every processed message for the replay report."""
+        self.decoded_messages.append((message, start_time, end_time))
+
+    def pipeline_stats(self):
+        """Returns a snapshot (queue depth, drops, latency) of every pipeline stage."""
+        capture = self.capture_stats.snapshot()
+        capture["dropped"] = self.source.overflows
+        stages = [capture]
+        for worker in self.workers:
+            dsp = worker.stats.snapshot()
+            dsp["skipped"] = worker.decoder.skipped_fraction # Share of windows the gates saved
+            stages.append(dsp)
+        if self.persistence is not None:
+            persistence = self.persistence.stats.snapshot()
+            persistence["dropped"] = self.deduplicator.dropped
+            stages.append(persistence)
+        return stages
+
+    def _on_audio(self, audio_chunk, block=False):
         """
-        Maps a detected frequency to its closest character in the protocol.
-        
-        Args:
-            freq (float): The detected frequency.
-            
-        Returns:
-            str: The character corresponding to the closest frequency, or None if too far.
+        Capture stage: hands each channel of a chunk to its decoder worker.
+        Runs on the audio driver's callback thread during live capture, so it
+        must never wait on decoding or the database.
         """
-        if freq is None:
-            return None
-        
-        # Find the defined protocol frequency closest to the detected frequency
-        closest_defined_freq = min(FREQ_TO_CHAR.keys(), key=lambda k: abs(k - freq))
-        
-        # Reduced tolerance for frequency matching to improve accuracy
-        if abs(closest_defined_freq - freq) > 150:  # Reduced from 200 Hz to 150 Hz
-            return None
-        
-        return FREQ_TO_CHAR[closest_defined_freq]
+        started = time.perf_counter()
+        self.samples_read += len(audio_chunk)
+        if audio_chunk.ndim == 1:
+            self.workers[0].submit(audio_chunk, block)
+        else:
+            # Deinterleave without copying: each column is a strided view
+            for channel, worker in enumerate(self.workers):
+                worker.submit(audio_chunk[:, channel], block)
+        self.capture_stats.record(time.perf_counter() - started)
 
-    def process_message(self, message):
+    def process_message(self, message, timestamp=None):
         """
         Processes the fully decoded message, attempts to parse ID and BPM,
         and updates the diver's data in the database.
         
         Args:
-            message (str): The decoded string message (e.g., "li95" or "li,95").
+            message (str): The decoded string message (e.g., "li95" or "li,95"), or
+                           "#<slot>,<bpm>" from protocol v2.
+            timestamp (float): Stream time (seconds) at which the message was complete.
+                               Readings are evaluated at this time, not when they are processed,
+                               so a backlog handled in a burst does not look like a fast BPM change.
+                               Defaults to the current stream time.
         """
-        print(f"\n=== Processing Message: '{message}' ===")
+        logger.debug("Processing Message: '%s'", message)
 
         try:
+            frame = protocol_v2.parse_message(message)
+            if frame is not None:
+                # The frame's CRC was checked by the decoder; only the slot needs the database
+                slot, bpm = frame
+                diver_id = self.alerts.diver_for_slot(slot, timestamp)
+                if diver_id is None:
+                    logger.warning("❌ ERROR: No diver has slot %d (message '%s')", slot, message)
+                    MESSAGES_PROCESSED.labels("error").inc()
+                    return False
+                return self._update_diver(diver_id, bpm, timestamp)
+
             # Find where numbers start
             number_start = -1
             for i, char in enumerate(message):
@@ -150,7 +154,8 @@ class AcousticServer:
                     break
             
             if number_start == -1:
-                print("❌ ERROR: No BPM found in message")
+                logger.warning("❌ ERROR: No BPM found in message '%s'", message)
+                MESSAGES_PROCESSED.labels("error").inc()
                 return False
                 
             # Split into ID and BPM
@@ -159,233 +164,172 @@ class AcousticServer:
 
             if bpm_str.isdigit():
                 bpm = int(bpm_str)
-                print(f"Parsed: Diver ID = {diver_id}, BPM = {bpm}")
-                
-                # Get the diver from database
-                diver = self.db_session.query(DiverModel).filter(DiverModel.id == diver_id).first()
-                if diver:
-                    # Update BPM and status
-                    old_bpm = diver.bpm
-                    old_status = diver.status
-                    
-                    diver.bpm = bpm
-                    if bpm > 150:
-                        diver.status = "critical"
-                    elif bpm > 120:
-                        diver.status = "warning"
-                    else:
-                        diver.status = "normal"
-                    
-                    # Save changes
-                    self.db_session.commit()
-                    print(f"\nDiver {diver_id} updated:")
-                    print(f"  BPM: {old_bpm} -> {bpm}")
-                    print(f"  Status: {old_status} -> {diver.status}")
-                    if diver.status != "normal":
-                        print(f"\n⚠️ ALERT: Diver {diver_id} status is {diver.status.upper()}")
-                    return True
-                else:
-                    print(f"❌ ERROR: Diver {diver_id} not found in database")
+                logger.debug("Parsed: Diver ID = %s, BPM = %d", diver_id, bpm)
+                return self._update_diver(diver_id, bpm, timestamp)
             else:
-                print(f"❌ ERROR: Invalid BPM format: '{bpm_str}'")
+                logger.warning("❌ ERROR: Invalid BPM format: '%s'", bpm_str)
         except Exception as e:
-            print(f"❌ ERROR processing message: {e}")
-            self.db_session.rollback()
-        print("=" * 40)
+            logger.exception("❌ ERROR processing message: %s", e)
+        MESSAGES_PROCESSED.labels("error").inc()
         return False
 
+    def _update_diver(self, diver_id, bpm, timestamp=None):
+        """Evaluates a reading taken at `timestamp` (stream time) and queues the diver's update. Returns True."""
+        # Queue the update; escalations are written at once, the rest in the next batch
+        status = self.alerts.evaluate(diver_id, bpm, timestamp)
+        self.telemetry.update(diver_id, bpm, status=status)
+        self.events.publish_reading(diver_id, bpm, status) # Live dashboards get it now, not after the flush
+        self.check_lost_divers()
+        self.forward_alerts()
+        MESSAGES_PROCESSED.labels("ok").inc()
+        return True
+
+    def check_lost_divers(self):
+        """Marks divers that stopped transmitting as critical."""
+        for alert in self.alerts.tick():
+            self.telemetry.set_status(alert.diver_id, alert.status)
+
+    def forward_alerts(self):
+        """
+        Publishes new alerts on the event bus and e-mails warning and critical
+        ones to AQUASAFE_ALERT_RECIPIENTS, if set.
+        """
+        recipients = dispatcher.config.alert_recipients
+        while True:
+            try:
+                alert = self.alerts.alerts.get_nowait()
+            except queue.Empty:
+                return
+            self.events.publish_alert(alert)
+            if recipients and alert.status != "normal":
+                dispatcher.submit(alert_notification(alert, recipients)) # Never blocks; coalesced per diver
+
+    def _open_outputs(self):
+        """Imports the database layer, checks the schema and opens the outputs of process_message."""
+        started = time.perf_counter()
+        from database import SessionLocal, ensure_schema
+        from acoustic.telemetry import TelemetryWriter, FLUSH_INTERVAL
+        from acoustic.alerts import AlertEngine
+
+        ensure_schema()
+        self.telemetry = TelemetryWriter(SessionLocal, FLUSH_INTERVAL)
+        # Readings are evaluated at their stream time, so silence deadlines run on the same clock
+        self.alerts = AlertEngine(SessionLocal, clock=self._now)
+        self.events.start()
+        logger.info("Database ready in %.0f ms", (time.perf_counter() - started) * 1000)
+
+    def _on_idle(self):
+        self.check_lost_divers()
+        self.forward_alerts()
+        self.telemetry.flush_if_due()
+
     def listen(self):
         """
         Main listening loop for the acoustic server.
-        Continuously reads audio, detects signals, and processes messages.
+        Starts the pipeline: capture -> one decoder worker per channel ->
+        deduplicated message queue -> persistence worker.
         """
-        print("Acoustic server is listening... Press Ctrl+C to stop.")
-        
-        audio_buffer = np.array([], dtype=np.int16) # Buffer to accumulate audio data for FFT
-        
+        logger.info("Acoustic server is listening... Press Ctrl+C to stop.")
+
+        max_chunks = int(MAX_QUEUED_AUDIO * RATE / BUFFER_CHUNK_SIZE)
+        self.workers = [DecoderWorker(decoder, max_chunks) for decoder in self.decoders]
+        if self._persists:
+            self.persistence = PersistenceWorker(self.deduplicator.messages, self.message_handler,
+                                                 self._record_message, on_idle=self._on_idle,
+                                                 idle_interval=IDLE_INTERVAL, on_start=self._open_outputs)
+        else:
+            self.persistence = PersistenceWorker(self.deduplicator.messages, self.message_handler,
+                                                 self._record_message)
+        for worker in self.workers + [self.persistence]:
+            worker.start()
+
         try:
-            while True:
-                # Read a small chunk of audio data
-                data = self.stream.read(BUFFER_CHUNK_SIZE, exception_on_overflow=False)
-                audio_chunk = np.frombuffer(data, dtype=np.int16)
-                
-                # Get the maximum amplitude in the current chunk to detect significant sound
-                max_amp_in_chunk = np.max(np.abs(audio_chunk))
-                
-                # If significant sound is detected, add it to the audio buffer
-                if max_amp_in_chunk > SIGNAL_STRENGTH_SENSITIVITY_THRESHOLD:
-                    audio_buffer = np.concatenate((audio_buffer, audio_chunk))
-                    
-                    # Process smaller buffers more frequently for better character detection
-                    if len(audio_buffer) >= FFT_WINDOW_SIZE // 2:  # Process at half window size
-                        self._process_audio_buffer(audio_buffer[:FFT_WINDOW_SIZE])
-                        # Keep some overlap for continuity
-                        audio_buffer = audio_buffer[FFT_WINDOW_SIZE // 4:] if len(audio_buffer) > FFT_WINDOW_SIZE // 4 else np.array([], dtype=np.int16)
-                        
-                else: # If silence is detected in the current chunk
-                    if len(audio_buffer) > 0: # If there was accumulated sound but now it's silent
-                        # Process any remaining substantial audio in the buffer
-                        if len(audio_buffer) >= FFT_WINDOW_SIZE // 2: 
-                             self._process_audio_buffer(audio_buffer)
-                        audio_buffer = np.array([], dtype=np.int16) # Reset buffer
-
-                    # If recording is active and silence persists for too long
-                    if self.is_recording and (time.time() - self.last_char_time) > self.max_silent_time:
-                        current_message = "".join(self.message_buffer)
-                        # Only reset if we don't have a valid message format
-                        if not self._is_valid_message(current_message):
-                            print("Timeout during recording. No valid message received.")
-                            self.is_recording = False
-                            self.message_buffer = []
-                        else:
-                            # If we have a valid message, process it
-                            print(f"Message complete: '{current_message}'")
-                            self.process_message(current_message)
-                            self.message_buffer = []
-                            self.is_recording = False
+            if self.source.realtime:
+                # The audio driver calls _on_audio; this thread only reports pipeline health
+                self.source.start(self._on_audio)
+                while self.source.is_active():
+                    time.sleep(STATS_INTERVAL)
+                    logger.info("Pipeline status:\n%s", format_stats(self.pipeline_stats()))
+            else:
+                # A replayed recording waits for the decoders instead of dropping audio
+                while True:
+                    audio_chunk = self.source.read(BUFFER_CHUNK_SIZE)
+                    if audio_chunk is None: # Recording finished
+                        break
+                    self._on_audio(audio_chunk, block=True)
 
         except KeyboardInterrupt:
-            print("\nStopping server.")
+            logger.info("Stopping server.")
         except Exception as e:
-            print(f"An error occurred in listen loop: {e}")
+            logger.exception("An error occurred in listen loop: %s", e)
         finally:
-            # Ensure audio stream and PyAudio resources are properly closed
-            if self.stream.is_active():
-                self.stream.stop_stream()
-            self.stream.close()
-            self.p.terminate()
-            self.db_session.close() # Close database session
-
-    def _process_audio_buffer(self, buffer_data):
-        """ 
-        Helper function to analyze a larger audio buffer for start, end, 
-        and character frequencies.
-        """
-        if len(buffer_data) == 0:
-            return
-
-        # Use the configured FFT window size that matches the watch's chunk duration
-        if len(buffer_data) < FFT_WINDOW_SIZE:
-            padded_data = np.pad(buffer_data, (0, FFT_WINDOW_SIZE - len(buffer_data)), 'constant')
-            audio_for_fft = padded_data
+            self.source.close()
+            for worker in self.workers:
+                worker.stop()
+            for worker in self.workers:
+                worker.join()
+            self.persistence.stop()
+            self.persistence.join()
+            if self.telemetry is not None:
+                self.telemetry.close() # Write updates still waiting for their batch
+            dispatcher.close() # Send alert e-mails still in the queue
+            self.events.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AquaSafe acoustic server")
+    parser.add_argument("--source", default="mic",
+                        help="mic, mic:<index>, synth:<msg>;<msg>, or a .wav/.npy/.raw recording")
+    parser.add_argument("--channels", type=int, default=1,
+                        help="Number of live input channels (one per hydrophone), each decoded separately")
+    parser.add_argument("--detector", default=DETECTOR, choices=["rfft", "goertzel"])
+    parser.add_argument("--overlap", type=float, default=WINDOW_OVERLAP)
+    parser.add_argument("--protocol", default=PROTOCOL, choices=PROTOCOLS,
+                        help="v1 character tones, or v2 dual-tone frames with diver slots and a CRC")
+    parser.add_argument("--gate-snr", type=float, default=GATE_SNR_DB,
+                        help="dB above the noise floor a tone band needs before spectral analysis (0 disables)")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Replay the source as fast as possible and report decoder throughput "
+                             "(decoded messages are not written to the database)")
+    parser.add_argument("--batch", action="store_true",
+                        help="With --benchmark: decode the whole recording with the vectorized batch decoder")
+    parser.add_argument("--expect", action="append", default=None,
+                        help="Expected message for the error rate (repeatable; defaults to <recording>.txt)")
+    parser.add_argument("--verbose", action="store_true", help="Show decoder output during --benchmark")
+    parser.add_argument("--list-devices", action="store_true", help="List audio input devices and exit")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="Port serving Prometheus metrics while listening (0 disables)")
+    args = parser.parse_args()
+
+    from acoustic.sources import PyAudioSource, open_source
+    if args.list_devices:
+        # Devices are always enumerated through PyAudio, whatever --source is
+        devices = PyAudioSource()
+        for index, name in devices.list_devices():
+            print("Input Device id ", index, " - ", name)
+        devices.close()
+        return
+
+    source = open_source(args.source, args.channels)
+
+    if args.benchmark:
+        from acoustic.replay import load_expected, run_replay, run_batch, print_report
+        if args.batch:
+            results = run_batch(source, args.detector, args.overlap, DEDUP_WINDOW, verbose=args.verbose,
+                                gate_snr_db=args.gate_snr, protocol=args.protocol)
         else:
-            audio_for_fft = buffer_data[-FFT_WINDOW_SIZE:]  # Use the most recent part of the buffer
-
-        # Detect Start Frequency
-        start_freq_detected, start_amp = self._find_dominant_freq(audio_for_fft, 
-                                                                START_FREQ - 150, START_FREQ + 150, 
-                                                                apply_threshold=False)
-
-        # Detect End Frequency
-        end_freq_detected, end_amp = self._find_dominant_freq(audio_for_fft, 
-                                                            END_FREQ - END_FREQ_TOLERANCE, 
-                                                            END_FREQ + END_FREQ_TOLERANCE, 
-                                                            apply_threshold=False)
-
-        # Detect character frequencies (including comma)
-        char_freq_detected, char_amp = self._find_dominant_freq(audio_for_fft, 
-                                                              1900, 10100,  # Range for all characters including comma
-                                                              apply_threshold=False)
-
-        # Debug logging - add more detailed logging
-        if start_freq_detected is not None and start_amp > START_END_THRESHOLD:
-            current_time = time.time()
-            if not hasattr(self, '_last_start_signal_time') or \
-               (current_time - self._last_start_signal_time) > 0.5:  # Cooldown period of 0.5 seconds
-                self._last_start_signal_time = current_time
-                print(f"DEBUG: Start signal frequency: {start_freq_detected:.0f} Hz, Amplitude: {start_amp:.0f}")
-                if not self.is_recording:
-                    self.is_recording = True
-                    self.message_buffer = [] # Clear buffer for new message
-                    self.last_char_time = time.time()
-                    if hasattr(self, '_valid_bpm_time'):
-                        delattr(self, '_valid_bpm_time')  # Reset BPM timer on new message
-                    print(f"\n>>> Start sequence detected. Start Amp: {start_amp:.0f}. Recording message...")
-
-        if end_freq_detected is not None and end_amp > START_END_THRESHOLD:
-            print(f"DEBUG: End signal frequency: {end_freq_detected:.0f} Hz, Amplitude: {end_amp:.0f}")
-
-        if char_freq_detected is not None and char_amp > CHAR_THRESHOLD:
-            char = self._get_closest_char(char_freq_detected)
-            freq_type = "Comma" if char == ',' else "Character"
-            print(f"DEBUG: {freq_type} frequency: {char_freq_detected:.0f} Hz, Amplitude: {char_amp:.0f}, Mapped to: '{char}'")
-
-        # Additional logic for processing characters and end signals remains unchanged...
-        if self.is_recording:
-            # Enforce a delay after the start signal before processing characters
-            if (time.time() - self.last_char_time) < 0.5:  # Match silentDuration from watch app
-                return
-
-            # Check for characters (including comma)
-            if char_freq_detected is not None and char_amp > CHAR_THRESHOLD:
-                char = self._get_closest_char(char_freq_detected)
-                if char is not None:
-                    if not self.message_buffer or \
-                       self.message_buffer[-1] != char or \
-                       (time.time() - self.last_char_time) > 0.5:  # Match silentDuration from watch app
-                        # Auto-insert comma when transitioning from letters to numbers if no comma exists
-                        current_message = "".join(self.message_buffer)
-                        if char.isdigit() and ',' not in current_message and \
-                           (len(self.message_buffer) > 0 and self.message_buffer[-1].isalpha()):
-                            self.message_buffer.append(',')
-                            print("Auto-inserted comma before number")
-                            
-                        self.message_buffer.append(char)
-                        current_message = "".join(self.message_buffer)
-                        print(f"Current buffer: '{current_message}'")
-                        print(f"Character detected: '{char}' (freq: {char_freq_detected:.0f} Hz) (Amp: {char_amp:.0f})")
-
-                        # Only process if we have waited long enough for a complete message
-                        if self._is_valid_message(current_message):
-                            print(f"Valid message format detected: '{current_message}'")
-                            self.process_message(current_message)
-                            self.message_buffer = []
-                            self.is_recording = False
-                            if hasattr(self, '_valid_bpm_time'):
-                                delattr(self, '_valid_bpm_time')  # Reset BPM timer
-                            print("\nReady for next message...")
-                            return
-                    self.last_char_time = time.time()
-
-    def _is_valid_message(self, message):
-        """Helper function to check if a message is valid (has ID and BPM)"""
-        if ',' not in message:
-            return False
-        parts = message.split(',')
-        # Check if we have exactly one comma and both parts are non-empty
-        if len(parts) != 2 or not parts[0] or not parts[1]:
-            return False
-        # Check if the first part has at least one character
-        if len(parts[0]) == 0:
-            return False
-        # Check if second part is all digits and within valid BPM range
-        if not parts[1].isdigit():
-            return False
-        bpm = int(parts[1])
-        # If BPM is too high, invalid
-        if bpm > 200:
-            return False
-        # If BPM is valid (40-200), mark as potentially complete
-        if bpm >= 40:
-            # Store the time we first saw a valid BPM
-            if not hasattr(self, '_valid_bpm_time'):
-                self._valid_bpm_time = time.time()
-            # If we've waited long enough for more digits, consider it complete
-            if time.time() - self._valid_bpm_time >= DIGIT_WAIT_TIME:
-                delattr(self, '_valid_bpm_time')  # Reset the timer
-                return True
-            return False  # Keep waiting for potential more digits
-        # If BPM is too low, keep waiting
-        return False
-
-    def _format_message(self, message):
-        """Format message by inserting comma between ID and BPM"""
-        for i, char in enumerate(message):
-            if char.isdigit():
-                return message[:i] + ',' + message[i:]
-        return message
+            server = AcousticServer(source, args.detector, args.overlap, message_handler=lambda message, at: True,
+                                    gate_snr_db=args.gate_snr, protocol=args.protocol)
+            results = run_replay(server, verbose=args.verbose)
+        print_report(results, args.expect or load_expected(args.source))
+        return
+
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+        logger.info("Metrics at http://localhost:%d/metrics", args.metrics_port)
+    server = AcousticServer(source, args.detector, args.overlap, gate_snr_db=args.gate_snr, protocol=args.protocol)
+    server.listen()
 
 
 if __name__ == "__main__":
-    server = AcousticServer()
-    server.listen()
+    main()
@@ -0,0 +1,15 @@
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from database import DATABASE_PROFILE, MAX_OVERFLOW, POOL_SIZE, POOL_TIMEOUT, apply_sqlite_profile
+
+# Async access to the same SQLite file for the API routes (requires aiosqlite).
+# The sync engine in database.py stays in use by the acoustic server and scripts.
+ASYNC_SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./divers.db"
+
+# Create async engine, with the same pool size and connection PRAGMAs as the sync one
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT
+)
+apply_sqlite_profile(async_engine.sync_engine, DATABASE_PROFILE)
+
+# Create async session; objects stay readable after commit, since lazy refreshes are not possible in async code
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
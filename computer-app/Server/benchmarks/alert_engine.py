@@ -0,0 +1,97 @@
+"""
+Cost of the alert engine per reading and per lost-diver check, as the
+number of divers grows.
+
+Every diver is heard once, then random readings are evaluated; the clock
+is simulated so ticks with nobody overdue, and once-per-second ticks while
+a fraction of the divers goes silent, can both be measured. The latter
+include moving the deadlines of divers that were heard again.
+
+Run from the Server directory:
+    python -m benchmarks.alert_engine --divers 100 1000 10000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from acoustic.alerts import AlertEngine, LOST_AFTER
+from database import create_sqlite_engine, create_schema
+from models.diver import Diver as DiverModel
+
+
+def seed(engine, divers):
+    create_schema(engine)
+    with Session(engine) as db:
+        db.add_all(
+            DiverModel(id=f"d{d}", name=f"Diver {d}", age=random.randint(20, 70), weight=75.0, contact_info="-",
+                       bpm=80, entry_point="north", current_depth=random.uniform(5, 40), status="normal")
+            for d in range(divers)
+        )
+        db.commit()
+
+
+def run(divers, readings, silent_fraction):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_sqlite_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        seed(engine, divers)
+        clock = [0.0]
+        alerts = AlertEngine(sessionmaker(bind=engine), max_queued=10, refresh_interval=float("inf"),
+                             clock=lambda: clock[0])
+        alerts._raise = lambda alert: None  # Measure evaluation, not printing
+
+        started = time.perf_counter()
+        alerts.refresh()
+        compile_time = time.perf_counter() - started
+
+        ids = [f"d{d}" for d in range(divers)]
+        for diver_id in ids:
+            alerts.evaluate(diver_id, 80)
+        samples = [(random.choice(ids), random.randint(60, 170)) for _ in range(readings)]
+        started = time.perf_counter()
+        for i, (diver_id, bpm) in enumerate(samples):
+            clock[0] = i * LOST_AFTER / (2 * readings)  # Stay within the lost deadline of the first round
+            alerts.evaluate(diver_id, bpm)
+        evaluate_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(1000):
+            alerts.tick()
+        idle_tick_time = (time.perf_counter() - started) / 1000
+
+        # Only the silent divers miss the next deadline
+        clock[0] += LOST_AFTER / 2
+        for diver_id in ids[int(silent_fraction * divers):]:
+            alerts.evaluate(diver_id, 80)
+        # Tick once per second, as the acoustic server does, until they are overdue
+        lost = []
+        steps = int(0.9 * LOST_AFTER)
+        started = time.perf_counter()
+        for _ in range(steps):
+            clock[0] += 1.0
+            lost += alerts.tick()
+        lost_tick_time = (time.perf_counter() - started) / steps
+        engine.dispose()
+
+    print(f"  {divers:>6} divers  compile={1000 * compile_time:7.1f} ms  "
+          f"evaluate={1e6 * evaluate_time / readings:5.2f} us/reading  "
+          f"idle tick={1e6 * idle_tick_time:5.2f} us  "
+          f"1 Hz ticks finding {len(lost)} lost={1e6 * lost_tick_time:7.1f} us/tick")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Alert engine cost per reading and per tick")
+    parser.add_argument("--divers", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--readings", type=int, default=100000)
+    parser.add_argument("--silent", type=float, default=0.01, help="Fraction of divers that go silent")
+    args = parser.parse_args()
+
+    for divers in args.divers:
+        run(divers, args.readings, args.silent)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+Load test of the REST API against a large seeded database, with a JSON
+baseline to catch regressions.
+
+A throwaway divers.db is seeded with --groups groups and --divers divers
+(spread evenly over the groups), then every scenario runs --clients
+concurrent clients doing --requests requests each:
+    groups:  GET /groups/ (every group with its divers)
+    group:   GET /groups/{id} of a random group
+    diver:   GET /divers/{id} of a random diver
+    list:    GET /divers/ pages: from a random diver on, by group, by
+             status, or by BPM range (the filters of the dashboard's lists)
+    create:  POST /divers/web of a new diver
+    mixed:   dashboards polling /groups/?summary=true and /groups/{id}
+             while an acoustic writer commits BPM updates of random divers
+             at --write-rate readings per second (TelemetryWriter, on its
+             own connection like the acoustic server), so the response
+             cache is invalidated as in a real dive
+Random choices come from --seed, so runs are reproducible.
+
+The app runs in-process through httpx's ASGI transport (--mode inprocess),
+under a local uvicorn process (--mode uvicorn), or both. Each mode gets
+its own copy of the seeded database. p50/p95/p99 latency and requests/s
+are reported per mode, scenario and route.
+
+--save writes the results to a JSON baseline; --baseline compares against
+one and exits with status 1 if a route's p95 latency rose, or its
+requests/s fell, by more than --tolerance (a fraction). Baselines are
+only comparable on the same machine with the same sizes.
+
+Run from the Server directory:
+    python -m benchmarks.api_load --groups 500 --divers 50000 --save api_baseline.json
+    python -m benchmarks.api_load --groups 500 --divers 50000 --baseline api_baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.db_concurrency import percentile
+from database import create_schema, create_sqlite_engine
+from models.diver import Diver as DiverModel
+from models.group import Group as GroupModel
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("groups", "group", "diver", "list", "create", "mixed")
+SEED_BATCH_SIZE = 5000  # Divers per executemany while seeding
+UVICORN_START_TIMEOUT = 30.0  # Seconds to wait for the uvicorn process to answer
+TOLERANCE = 0.25
+LIST_PAGE_SIZE = 100  # Divers per page in the list scenario (the API's default)
+
+
+def seed(path, groups, divers, rng):
+    """
+    Creates a database at `path` with the current schema, `groups` groups
+    and `divers` divers, assigned to the groups in turn.
+    """
+    engine = create_sqlite_engine(f"sqlite:///{path}")
+    create_schema(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(GroupModel), [{"id": g + 1, "name": f"group {g}"} for g in range(groups)])
+        for start in range(0, divers, SEED_BATCH_SIZE):
+            rows = []
+            for d in range(start, min(divers, start + SEED_BATCH_SIZE)):
+                bpm = rng.randint(60, 160)
+                rows.append({"id": f"d{d:06d}", "name": f"Diver {d}", "age": rng.randint(18, 70),
+                             "weight": 75.0, "contact_info": "-", "bpm": bpm, "entry_point": "north",
+                             "current_depth": round(rng.uniform(0, 40), 1),
+                             "status": "critical" if bpm > 150 else "warning" if bpm > 120 else "normal",
+                             "group_id": d % groups + 1 if groups else None})
+            connection.execute(insert(DiverModel), rows)
+    engine.dispose()
+
+
+def scenario_requests(scenario, rng, groups, divers, client):
+    """
+    Request generator of one client: yields (route, method, url, json body)
+    tuples forever. `route` is the path template results are grouped by.
+    """
+    count = 0
+    while True:
+        count += 1
+        if scenario == "groups":
+            yield "GET /groups/", "GET", "/groups/", None
+        elif scenario == "group" or (scenario == "mixed" and count % 2):
+            yield "GET /groups/{id}", "GET", f"/groups/{rng.randint(1, groups)}", None
+        elif scenario == "mixed":
+            yield "GET /groups/?summary=true", "GET", "/groups/?summary=true", None
+        elif scenario == "diver":
+            yield "GET /divers/{id}", "GET", f"/divers/d{rng.randrange(divers):06d}", None
+        elif scenario == "list":
+            params = [f"after=d{rng.randrange(divers):06d}", f"group_id={rng.randint(1, groups)}",
+                      f"status={rng.choice(('normal', 'warning', 'critical'))}",
+                      f"min_bpm={rng.randint(60, 140)}&max_bpm=160"][count % 4]
+            yield "GET /divers/", "GET", f"/divers/?limit={LIST_PAGE_SIZE}&{params}", None
+        elif scenario == "create":
+            diver = {"id": f"new-{client}-{count}", "name": "Load Test", "age": 30, "weight": 75.0,
+                     "contact_info": "-", "bpm": 80, "entry_point": "north", "current_depth": 0.0,
+                     "status": "normal", "group_id": rng.randint(1, groups)}
+            yield "POST /divers/web", "POST", "/divers/web", diver
+
+
+class AcousticWriter(threading.Thread):
+    """Commits BPM readings of random divers at a fixed rate, like the acoustic server's persistence worker."""
+
+    def __init__(self, path, divers, rate, seed):
+        super().__init__(daemon=True)
+        from acoustic.telemetry import TelemetryWriter
+        self.engine = create_sqlite_engine(f"sqlite:///{path}")
+        self.writer = TelemetryWriter(sessionmaker(bind=self.engine, autocommit=False, autoflush=False))
+        self.divers = divers
+        self.rate = rate
+        self.rng = random.Random(seed)
+        self.stopped = threading.Event()
+
+    def run(self):
+        interval = 1.0 / self.rate
+        next_at = time.perf_counter()
+        while not self.stopped.is_set():
+            # Normal BPMs only, so no escalation forces a flush per reading
+            self.writer.update(f"d{self.rng.randrange(self.divers):06d}", self.rng.randint(60, 110))
+            next_at += interval
+            self.stopped.wait(max(0.0, next_at - time.perf_counter()))
+        self.writer.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.engine.dispose()
+
+
+async def run_scenario(client, scenario, args, rng):
+    """
+    Runs one scenario with args.clients concurrent clients.
+
+    Returns:
+        dict: route -> {"latencies": [...], "failed": count}, and the elapsed seconds.
+    """
+    routes = {}
+    generators = [scenario_requests(scenario, random.Random(rng.random()), args.groups, args.divers, c)
+                  for c in range(args.clients)]
+
+    async def run_client(requests):
+        for _ in range(args.requests):
+            route, method, url, body = next(requests)
+            stats = routes.setdefault(route, {"latencies": [], "failed": 0})
+            started = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(client.request(method, url, json=body), args.timeout)
+                response.raise_for_status()
+            except Exception: # Timeouts, HTTP errors, refused connections
+                stats["failed"] += 1
+                continue
+            stats["latencies"].append(time.perf_counter() - started)
+
+    # Warm up caches and connection pools, unmeasured
+    warmup = scenario_requests(scenario, random.Random(0), args.groups, args.divers, "warmup")
+    for _ in range(args.warmup):
+        _, method, url, body = next(warmup)
+        await client.request(method, url, json=body)
+
+    writer = None
+    if scenario == "mixed":
+        writer = AcousticWriter(args.db_path, args.divers, args.write_rate, args.seed)
+        writer.start()
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(run_client(requests) for requests in generators))
+    finally:
+        elapsed = time.perf_counter() - started
+        if writer is not None:
+            writer.stop()
+    return routes, elapsed
+
+
+def summarize(routes, elapsed):
+    """Latency percentiles (ms) and throughput of every route of a scenario."""
+    summary = {}
+    for route, stats in routes.items():
+        latencies = stats["latencies"]
+        summary[route] = {
+            "requests": len(latencies),
+            "failed": stats["failed"],
+            "rps": len(latencies) / elapsed if elapsed else 0.0,
+            "p50_ms": 1000 * statistics.median(latencies) if latencies else None,
+            "p95_ms": 1000 * percentile(latencies, 0.95) if latencies else None,
+            "p99_ms": 1000 * percentile(latencies, 0.99) if latencies else None,
+        }
+    return summary
+
+
+async def run_scenarios(client, args):
+    rng = random.Random(args.seed)
+    results = {}
+    for scenario in args.scenarios:
+        routes, elapsed = await run_scenario(client, scenario, args, rng)
+        results[scenario] = summarize(routes, elapsed)
+    return results
+
+
+async def run_inprocess(args):
+    # The app opens ./divers.db, so it must be imported and started from the database's directory
+    os.chdir(os.path.dirname(args.db_path))
+    from server import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            return await run_scenarios(client, args)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_until_up(client, process):
+    deadline = time.monotonic() + UVICORN_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+        try:
+            if (await client.get("/status")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError(f"uvicorn did not answer within {UVICORN_START_TIMEOUT:g} s")
+
+
+async def run_uvicorn(args):
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=SERVER_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""),
+               AQUASAFE_LOG_LEVEL=os.environ.get("AQUASAFE_LOG_LEVEL", "WARNING"))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=os.path.dirname(args.db_path), env=env)
+    try:
+        limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits) as client:
+            await wait_until_up(client, process)
+            return await run_scenarios(client, args)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def flatten(results):
+    """{mode: {scenario: {route: stats}}} -> {"mode scenario route": stats}"""
+    return {f"{mode} {scenario} {route}": stats
+            for mode, scenarios in results.items()
+            for scenario, routes in scenarios.items()
+            for route, stats in routes.items()}
+
+
+def print_results(results):
+    for key, stats in flatten(results).items():
+        if stats["p50_ms"] is None:
+            print(f"  {key:<48} every request failed ({stats['failed']})")
+            continue
+        print(f"  {key:<48} {stats['rps']:8.0f} req/s  p50={stats['p50_ms']:.1f} ms  "
+              f"p95={stats['p95_ms']:.1f} ms  p99={stats['p99_ms']:.1f} ms  failed={stats['failed']}")
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compares results with a baseline.
+
+    Returns:
+        list: One message per regressed route (empty if none).
+    """
+    regressions = []
+    current = flatten(results)
+    for key, old in flatten(baseline).items():
+        new = current.get(key)
+        if new is None or old["p95_ms"] is None:
+            continue
+        if new["p95_ms"] is None:
+            regressions.append(f"{key}: every request failed")
+            continue
+        if new["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {old['p95_ms']:.1f} -> {new['p95_ms']:.1f} ms")
+        if new["rps"] < old["rps"] / (1 + tolerance):
+            regressions.append(f"{key}: {old['rps']:.0f} -> {new['rps']:.0f} req/s")
+        if new["failed"] > old["failed"]:
+            regressions.append(f"{key}: {old['failed']} -> {new['failed']} failed requests")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="REST API load test against a large seeded database")
+    parser.add_argument("--groups", type=int, default=500)
+    parser.add_argument("--divers", type=int, default=50000, help="Divers in total, spread over the groups")
+    parser.add_argument("--clients", type=int, default=50, help="Concurrent clients per scenario")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests before each scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument("--write-rate", type=float, default=50.0,
+                        help="Acoustic readings per second during the mixed scenario")
+    parser.add_argument("--mode", choices=["both", "inprocess", "uvicorn"], default="inprocess")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds before a request counts as failed")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save", help="Write the results to this JSON baseline")
+    parser.add_argument("--baseline", help="Compare with this JSON baseline; exit status 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="Allowed fractional slowdown of p95 latency and requests/s before failing")
+    args = parser.parse_args()
+    args.scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    if args.groups < 1 or args.divers < 1:
+        parser.error("--groups and --divers must be at least 1")
+
+    config = {name: getattr(args, name) for name in ("groups", "divers", "clients", "requests", "write_rate", "seed")}
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["config"] != config:
+            parser.error(f"baseline was recorded with {baseline['config']}, not {config}")
+
+    modes = ["inprocess", "uvicorn"] if args.mode == "both" else [args.mode]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        template = os.path.join(tmp, "seed.db")
+        started = time.perf_counter()
+        seed(template, args.groups, args.divers, random.Random(args.seed))
+        print(f"Seeded {args.groups} groups and {args.divers} divers in {time.perf_counter() - started:.1f} s; "
+              f"{args.clients} clients x {args.requests} requests per scenario")
+        cwd = os.getcwd()
+        for mode in modes:
+            # Every mode starts from the same data, in its own directory
+            os.makedirs(os.path.join(tmp, mode))
+            args.db_path = os.path.join(tmp, mode, "divers.db")
+            shutil.copy(template, args.db_path)
+            try:
+                results[mode] = asyncio.run(run_inprocess(args) if mode == "inprocess" else run_uvicorn(args))
+            finally:
+                os.chdir(cwd)
+    print_results(results)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"config": config, "results": results}, f, indent=2)
+        print(f"Baseline written to {args.save}")
+    if baseline is not None:
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No route regressed by more than {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
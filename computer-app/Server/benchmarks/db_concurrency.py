@@ -0,0 +1,164 @@
+"""
+Benchmarks the sync and async database paths of the API under many
+concurrent dashboard clients.
+
+Every client repeatedly loads one group with all its divers (what
+SensorDashboard fetches) through:
+    sync:  a `def` handler with a SessionLocal-style Session and joinedload,
+           run by FastAPI in its threadpool (the previous implementation)
+    async: an `async def` handler with an AsyncSession and AsyncGroupManager
+The response cache is bypassed, so only the database layer is compared.
+Both run in-process against a freshly seeded temporary database.
+
+With enough clients the sync path can stall completely: every threadpool
+worker waits for a pooled connection that is held by a request waiting
+for a worker. Requests that take longer than --timeout count as failed.
+
+Run from the Server directory:
+    python -m benchmarks.db_concurrency --clients 200 --requests 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, joinedload, sessionmaker
+
+from database import Base
+from models.diver import Diver as DiverModel
+from models.group import Group as GroupModel
+from schemas.group import GroupOut
+
+
+def seed(path, groups, divers_per_group):
+    """Creates a database with `groups` groups of `divers_per_group` divers each."""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        for g in range(groups):
+            group = GroupModel(name=f"group {g}")
+            db.add(group)
+            db.flush()
+            db.add_all(
+                DiverModel(id=f"d{g}x{d}", name=f"Diver {d}", age=30, weight=75.0, contact_info="-", bpm=80,
+                           entry_point="north", current_depth=10.0, status="normal", group_id=group.id)
+                for d in range(divers_per_group)
+            )
+        db.commit()
+    engine.dispose()
+
+
+def sync_app(path):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    app = FastAPI()
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @app.get("/groups/{group_id}", response_model=GroupOut)
+    def get_group(group_id: int, db: Session = Depends(get_db)):
+        group = db.query(GroupModel).options(joinedload(GroupModel.divers)).filter(GroupModel.id == group_id).first()
+        if group is None:
+            raise HTTPException(status_code=404, detail="Group not found")
+        return group
+
+    return app
+
+
+def async_app(path):
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    from managers.async_group_manager import AsyncGroupManager
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+    app = FastAPI()
+
+    async def get_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    @app.get("/groups/{group_id}", response_model=GroupOut)
+    async def get_group(group_id: int, db: AsyncSession = Depends(get_db)):
+        group = await AsyncGroupManager(db).get_group_by_id(group_id)
+        if group is None:
+            raise HTTPException(status_code=404, detail="Group not found")
+        return group
+
+    return app
+
+
+async def run_clients(app, clients, requests, groups, timeout):
+    """
+    Runs `clients` concurrent clients doing `requests` sequential requests each.
+
+    Returns:
+        tuple: (elapsed seconds, latencies of successful requests, failed request count)
+    """
+    latencies = []
+    failures = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def dashboard(index):
+            for i in range(requests):
+                started = time.perf_counter()
+                try:
+                    response = await asyncio.wait_for(client.get(f"/groups/{(index + i) % groups + 1}"), timeout)
+                    response.raise_for_status()
+                except Exception as e: # Timeouts, or errors such as an exhausted connection pool
+                    failures.append(e)
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(dashboard(c) for c in range(clients)))
+        elapsed = time.perf_counter() - started
+    return elapsed, latencies, len(failures)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async database path under concurrent clients")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client")
+    parser.add_argument("--groups", type=int, default=10)
+    parser.add_argument("--divers", type=int, default=20, help="Divers per group")
+    parser.add_argument("--mode", choices=["both", "sync", "async"], default="both")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Seconds before a request counts as failed")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed(path, args.groups, args.divers)
+        builders = {"sync": sync_app, "async": async_app}
+        modes = ["sync", "async"] if args.mode == "both" else [args.mode]
+
+        print(f"{args.clients} clients x {args.requests} requests, {args.groups} groups of {args.divers} divers")
+        for mode in modes:
+            elapsed, latencies, failed = asyncio.run(
+                run_clients(builders[mode](path), args.clients, args.requests, args.groups, args.timeout))
+            if not latencies:
+                print(f"  {mode:<5} every request failed ({failed})")
+                continue
+            print(f"  {mode:<5} {len(latencies) / elapsed:8.0f} req/s  "
+                  f"p50={1000 * statistics.median(latencies):.1f} ms  "
+                  f"p95={1000 * percentile(latencies, 0.95):.1f} ms  "
+                  f"p99={1000 * percentile(latencies, 0.99):.1f} ms  "
+                  f"failed={failed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Mixed read/write throughput of the SQLite connection profiles.
+
+Reproduces the deployment: a writer process (the acoustic server, bulk
+updating diver BPM and appending readings, one commit per batch) and
+reader threads in another process (the API loading groups with their
+divers), all on the same database file, for a fixed duration.
+
+Run from the Server directory:
+    python -m benchmarks.sqlite_profile --seconds 10 --readers 8
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, selectinload
+
+from database import SQLITE_PROFILES, create_sqlite_engine, create_schema
+from managers.reading_manager import ReadingManager
+from models.diver import Diver as DiverModel
+from models.group import Group as GroupModel
+
+
+def seed(path, profile, groups, divers_per_group):
+    engine = create_sqlite_engine(f"sqlite:///{path}", profile)
+    create_schema(engine)
+    with Session(engine) as db:
+        for g in range(groups):
+            group = GroupModel(name=f"group {g}")
+            db.add(group)
+            db.flush()
+            db.add_all(
+                DiverModel(id=f"d{g}x{d}", name=f"Diver {d}", age=30, weight=75.0, contact_info="-", bpm=80,
+                           entry_point="north", current_depth=10.0, status="normal", group_id=group.id)
+                for d in range(divers_per_group)
+            )
+        db.commit()
+    engine.dispose()
+
+
+def writer(path, profile, seconds, batch, diver_ids, results):
+    """Writes batches of BPM updates plus their readings, like the acoustic telemetry writer."""
+    engine = create_sqlite_engine(f"sqlite:///{path}", profile)
+    writes = errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        chosen = random.sample(diver_ids, batch)
+        rows = [{"id": diver_id, "bpm": random.randint(60, 180), "status": "normal"} for diver_id in chosen]
+        readings = [{"diver_id": r["id"], "timestamp": time.time(), "bpm": r["bpm"], "depth": None} for r in rows]
+        try:
+            with Session(engine) as db:
+                db.execute(update(DiverModel), rows)
+                ReadingManager(db).add_readings(readings)
+                db.commit()
+            writes += 1
+        except OperationalError: # "database is locked"
+            errors += 1
+    results.put(("writes", writes, errors))
+    engine.dispose()
+
+
+def reader(engine, seconds, groups, counts):
+    reads = errors = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        query = select(GroupModel).options(selectinload(GroupModel.divers)).where(GroupModel.id == random.randint(1, groups))
+        try:
+            with Session(engine) as db:
+                db.scalars(query).first()
+            reads += 1
+        except OperationalError:
+            errors += 1
+    counts.append((reads, errors))
+
+
+def run(profile, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        seed(path, profile, args.groups, args.divers)
+        diver_ids = [f"d{g}x{d}" for g in range(args.groups) for d in range(args.divers)]
+
+        results = multiprocessing.Queue()
+        writer_process = multiprocessing.Process(
+            target=writer, args=(path, profile, args.seconds, args.batch, diver_ids, results))
+        engine = create_sqlite_engine(f"sqlite:///{path}", profile)
+        counts = []
+        threads = [threading.Thread(target=reader, args=(engine, args.seconds, args.groups, counts))
+                   for _ in range(args.readers)]
+
+        writer_process.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        _, writes, write_errors = results.get()
+        writer_process.join()
+        engine.dispose()
+
+    reads = sum(r for r, _ in counts)
+    read_errors = sum(e for _, e in counts)
+    print(f"  {profile:<10} reads={reads / args.seconds:8.0f}/s  writes={writes / args.seconds:6.0f} batches/s  "
+          f"locked errors: reads={read_errors} writes={write_errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed read/write throughput per SQLite profile")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--readers", type=int, default=8, help="API reader threads")
+    parser.add_argument("--batch", type=int, default=10, help="Diver updates per write transaction")
+    parser.add_argument("--groups", type=int, default=10)
+    parser.add_argument("--divers", type=int, default=20, help="Divers per group")
+    parser.add_argument("--profile", action="append", choices=list(SQLITE_PROFILES),
+                        help="Profile to run (repeatable; default: all)")
+    args = parser.parse_args()
+
+    print(f"{args.readers} readers + 1 writer process for {args.seconds:.0f} s, "
+          f"{args.groups} groups of {args.divers} divers")
+    for profile in args.profile or list(SQLITE_PROFILES):
+        run(profile, args)
+
+
+if __name__ == "__main__":
+    main()
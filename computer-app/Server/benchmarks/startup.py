@@ -0,0 +1,117 @@
+"""
+Startup time of the API and acoustic servers, each measured in a fresh
+interpreter (imports are cached per process):
+    - import time of server.py and acoustic_server.py
+    - time to first window: from interpreter start until the acoustic
+      server has analyzed its first window of (synthetic) audio
+    - time until the acoustic server's database outputs are ready, which
+      happens on the persistence thread while audio is already decoded
+
+Each child runs in an empty temporary directory, so it creates its own
+divers.db. Fails (exit status 1) if the median time to first window is
+over --budget seconds, so a slow import sneaking back in is caught.
+
+Run from the Server directory:
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_BUDGET = 1.0  # Seconds from process start to the first analyzed window
+
+IMPORT_CHILD = """
+import json, time
+started = time.perf_counter()
+try:
+    import {module}
+    print(json.dumps({{"seconds": time.perf_counter() - started}}))
+except Exception as e:
+    print(json.dumps({{"error": f"{{type(e).__name__}}: {{e}}"}}))
+"""
+
+FIRST_WINDOW_CHILD = """
+import json, threading, time
+started = time.perf_counter()
+import acoustic_server
+from acoustic.sources import open_source
+
+imported = time.perf_counter() - started
+server = acoustic_server.AcousticServer(open_source("synth:a1"))
+detector = server.decoders[0].detector
+analyze_batch = detector.analyze_batch
+first_window = []
+
+def timed_analyze_batch(windows):
+    result = analyze_batch(windows)
+    if not first_window:
+        first_window.append(time.perf_counter() - started)
+    return result
+
+detector.analyze_batch = timed_analyze_batch
+open_outputs = server._open_outputs
+outputs_ready = []
+
+def timed_open_outputs():
+    open_outputs()
+    outputs_ready.append(time.perf_counter() - started)
+
+server._open_outputs = timed_open_outputs
+server.listen()
+print(json.dumps({"import": imported, "first_window": first_window[0], "outputs_ready": outputs_ready[0]}))
+"""
+
+
+def run_child(code, env):
+    with tempfile.TemporaryDirectory() as tmp:
+        result = subprocess.run([sys.executable, "-c", code], cwd=tmp, env=env, capture_output=True, text=True)
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        return {"error": (result.stderr.strip().splitlines() or ["no output"])[-1]}
+    return json.loads(lines[-1])
+
+
+def median_of(results, key):
+    values = [result[key] for result in results if key in result]
+    return statistics.median(values) if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AquaSafe startup benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET,
+                        help="Maximum median time to first window, in seconds")
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=SERVER_DIR, AQUASAFE_LOG_LEVEL="WARNING",
+               AQUASAFE_EVENTS_ADDRESS="127.0.0.1:0")  # Any free port: runs must not clash with a live server
+
+    rows = []
+    for module in ("server", "acoustic_server"):
+        results = [run_child(IMPORT_CHILD.format(module=module), env) for _ in range(args.runs)]
+        errors = [result["error"] for result in results if "error" in result]
+        rows.append((f"import {module}", median_of(results, "seconds"), errors[0] if errors else ""))
+
+    results = [run_child(FIRST_WINDOW_CHILD, env) for _ in range(args.runs)]
+    errors = [result["error"] for result in results if "error" in result]
+    first_window = median_of(results, "first_window")
+    rows.append(("acoustic: first window", first_window, errors[0] if errors else ""))
+    rows.append(("acoustic: database ready", median_of(results, "outputs_ready"), ""))
+
+    print(f"=== Startup, median of {args.runs} runs ===")
+    for name, seconds, error in rows:
+        value = f"{seconds * 1000:8.0f} ms" if seconds is not None else "  failed"
+        print(f"  {name:<26}{value}  {error}")
+
+    if first_window is None or first_window > args.budget:
+        print(f"Time to first window is over the {args.budget:g} s budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,130 @@
-from sqlalchemy import create_engine
+import importlib
+import os
+import time
+from sqlalchemy import create_engine, event, inspect
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from metrics import Histogram
 
 # SQLite database file path (you can change the filename if needed)
 SQLALCHEMY_DATABASE_URL = "sqlite:///./divers.db"
 
+# Connection settings applied to every new SQLite connection. The API server and
+# the acoustic server write to the same file from two processes.
+SQLITE_PROFILES = {
+    # SQLite defaults: rollback journal, fsync on every commit
+    "default": {},
+    "production": {
+        "journal_mode": "WAL",  # Readers and the writer no longer block each other
+        "synchronous": "NORMAL",  # fsync at WAL checkpoints instead of every commit (safe with WAL)
+        "busy_timeout": 5000,  # Milliseconds to wait for a lock before "database is locked"
+        "mmap_size": 256 * 1024 * 1024,  # Read pages through a memory map instead of read() calls
+        "cache_size": -64000,  # Page cache per connection; negative means KiB (about 64 MB)
+    },
+}
+DATABASE_PROFILE = os.environ.get("AQUASAFE_DB_PROFILE", "production")
+
+# Connection pool, sized for the API server's threadpool (40 workers) plus the live watchers
+POOL_SIZE = 20
+MAX_OVERFLOW = 30
+POOL_TIMEOUT = 10  # Seconds to wait for a free connection
+
+
+def apply_sqlite_profile(db_engine, profile=DATABASE_PROFILE):
+    """Runs the profile's PRAGMAs on every connection the engine opens."""
+    pragmas = SQLITE_PROFILES[profile]
+    if not pragmas:
+        return
+
+    @event.listens_for(db_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def create_sqlite_engine(url=SQLALCHEMY_DATABASE_URL, profile=DATABASE_PROFILE):
+    """Creates a pooled engine for a SQLite file with the given connection profile."""
+    db_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+    )
+    apply_sqlite_profile(db_engine, profile)
+    return db_engine
+
+
+DB_COMMIT_SECONDS = Histogram("aquasafe_db_commit_seconds", "Session commit time, including the final flush",
+                              buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+
+
+# Every Session (also the one inside an AsyncSession) reports its commit time
+@event.listens_for(Session, "before_commit")
+def _commit_started(session):
+    session.info["commit_started"] = time.perf_counter()
+
+
+@event.listens_for(Session, "after_commit")
+def _commit_finished(session):
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        DB_COMMIT_SECONDS.observe(time.perf_counter() - started)
+
+
 # Create engine
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+engine = create_sqlite_engine()
 
 # Create session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Shared base for all models
 Base = declarative_base()
+
+
+# Bump when a model gains a table, a column or an index, so ensure_schema() runs create_schema() again
+SCHEMA_VERSION = 2
+MODEL_MODULES = ("models.diver", "models.group", "models.reading", "models.alert_rule")
+
+
+def schema_version(db_engine=engine):
+    """Returns the schema version recorded in the database file (SQLite's user_version), 0 if never set."""
+    with db_engine.connect() as connection:
+        return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def create_schema(db_engine=engine):
+    """
+    Creates missing tables, and missing columns and indexes on existing
+    tables (create_all only creates the columns and indexes of tables it
+    creates), then records SCHEMA_VERSION. Run by migrate.py.
+
+    New columns must be nullable: existing rows get NULL.
+    """
+    for module in MODEL_MODULES:
+        importlib.import_module(module)  # Registers every table in Base.metadata
+    Base.metadata.create_all(bind=db_engine)
+    inspector = inspect(db_engine)
+    with db_engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=db_engine.dialect)
+                    connection.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}')
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db_engine, checkfirst=True)
+    with db_engine.begin() as connection:
+        connection.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+def ensure_schema(db_engine=engine):
+    """
+    Startup check of the servers: one PRAGMA when the schema is current,
+    create_schema() only if the database file is older than SCHEMA_VERSION.
+    """
+    if schema_version(db_engine) < SCHEMA_VERSION:
+        create_schema(db_engine)
@@ -8,3 +8,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Async version for async routes; the async engine is only created when first used
+async def get_async_db():
+    from async_database import AsyncSessionLocal
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,195 @@
+"""
+Publishing side of the event bus, run by the acoustic server.
+
+Decoded readings and alerts are encoded once (events/records.py), kept in
+a ring of the last RING_SIZE records and sent to every connected
+subscriber (the API server). publish() never blocks the acoustic
+pipeline: each subscriber has its own bounded queue and sender thread,
+and a subscriber that falls behind is disconnected. It reconnects and
+resumes from the last sequence number it received, replayed from the
+ring.
+"""
+import os
+import queue
+import socket
+import threading
+import time
+from collections import deque
+
+from events.records import EVENTS_ADDRESS, RESUME, WELCOME, encode_alert, encode_reading, parse_address
+from log import get_logger
+from metrics import Counter, Gauge
+
+RING_SIZE = 65536  # Records kept for subscribers that reconnect
+SUBSCRIBER_QUEUE = 4096  # Sends a subscriber may fall behind before it is disconnected
+HANDSHAKE_TIMEOUT = 5.0
+
+logger = get_logger("events.publisher")
+RECORDS_PUBLISHED = Counter("aquasafe_events_published", "Records published on the event bus", ["type"])
+SUBSCRIBERS = Gauge("aquasafe_events_subscribers", "Connected event bus subscribers")
+SUBSCRIBERS_DROPPED = Counter("aquasafe_events_subscribers_dropped", "Subscribers disconnected for falling behind")
+
+
+def _recv_exactly(connection, size):
+    data = b""
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Subscriber closed the connection")
+        data += chunk
+    return data
+
+
+class _Subscriber:
+    def __init__(self, connection, publisher):
+        self.connection = connection
+        self.publisher = publisher
+        self.outbox = queue.Queue(SUBSCRIBER_QUEUE)  # Encoded frames; None stops the sender
+        self.thread = threading.Thread(target=self._send_loop, name="events-sender", daemon=True)
+
+    def offer(self, data):
+        """Queues data without waiting. Returns False if the subscriber is too far behind."""
+        try:
+            self.outbox.put_nowait(data)
+            return True
+        except queue.Full:
+            return False
+
+    def _send_loop(self):
+        try:
+            while True:
+                data = self.outbox.get()
+                if data is None:
+                    return
+                # Send everything that queued up meanwhile in one call
+                parts = [data]
+                while True:
+                    try:
+                        data = self.outbox.get_nowait()
+                    except queue.Empty:
+                        break
+                    if data is None:
+                        self.connection.sendall(b"".join(parts))
+                        return
+                    parts.append(data)
+                self.connection.sendall(b"".join(parts))
+        except OSError as e:
+            logger.info("Event bus subscriber disconnected: %s", e)
+        finally:
+            self.publisher._remove(self)
+            self.connection.close()
+
+    def close(self):
+        # Make room for the stop marker if the queue is full
+        while True:
+            try:
+                self.outbox.put_nowait(None)
+                return
+            except queue.Full:
+                try:
+                    self.outbox.get_nowait()
+                except queue.Empty:
+                    pass
+
+
+class EventPublisher:
+    def __init__(self, address=EVENTS_ADDRESS, ring_size=RING_SIZE):
+        self.address = address
+        self.epoch = int.from_bytes(os.urandom(8), "little") | 1  # Identifies this run; never 0
+        self._ring = deque(maxlen=ring_size)  # (seq, frame)
+        self._next_seq = 1
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._server = None
+        SUBSCRIBERS.set_function(lambda: len(self._subscribers))
+
+    def start(self):
+        """Starts accepting subscribers. If the address is taken, records are still kept in the ring."""
+        family, target = parse_address(self.address)
+        try:
+            if family == "unix":
+                if os.path.exists(target):
+                    os.remove(target)  # Left behind by a previous run
+                server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            else:
+                server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            server.bind(target)
+            server.listen()
+        except OSError as e:
+            logger.error("❌ ERROR: event bus cannot listen on %s: %s", self.address, e)
+            return False
+        self._server = server
+        threading.Thread(target=self._accept_loop, name="events-accept", daemon=True).start()
+        logger.info("Event bus listening on %s", self.address)
+        return True
+
+    def publish_reading(self, diver_id, bpm, status, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        self._publish(lambda seq: encode_reading(seq, timestamp, diver_id, bpm, status), "reading")
+
+    def publish_alert(self, alert):
+        self._publish(lambda seq: encode_alert(seq, alert), "alert")
+
+    def _publish(self, encode, kind):
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            frame = encode(seq)
+            self._ring.append((seq, frame))
+            lagging = [subscriber for subscriber in self._subscribers if not subscriber.offer(frame)]
+        RECORDS_PUBLISHED.labels(kind).inc()
+        for subscriber in lagging:
+            SUBSCRIBERS_DROPPED.inc()
+            logger.warning("Event bus subscriber fell behind; disconnecting it (it will resume on reconnect)")
+            self._remove(subscriber)
+            subscriber.close()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                return  # Closed by close()
+            threading.Thread(target=self._handshake, args=(connection,), name="events-handshake", daemon=True).start()
+
+    def _handshake(self, connection):
+        try:
+            if connection.family == socket.AF_INET:
+                connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # Records are small; send at once
+            connection.settimeout(HANDSHAKE_TIMEOUT)
+            epoch, wanted = RESUME.unpack(_recv_exactly(connection, RESUME.size))
+            connection.settimeout(None)
+        except (OSError, ConnectionError) as e:
+            logger.info("Event bus handshake failed: %s", e)
+            connection.close()
+            return
+
+        subscriber = _Subscriber(connection, self)
+        with self._lock:
+            # Registering under the lock: no record falls between the backlog and the live stream
+            oldest = self._ring[0][0] if self._ring else self._next_seq
+            resumed = wanted > 0 and epoch in (0, self.epoch) and oldest <= wanted <= self._next_seq
+            backlog = [frame for seq, frame in self._ring if seq >= wanted] if resumed else []
+            subscriber.offer(WELCOME.pack(self.epoch, wanted if resumed else self._next_seq, resumed)
+                             + b"".join(backlog))
+            self._subscribers.add(subscriber)
+        subscriber.thread.start()
+        logger.info("Event bus subscriber connected (%s)",
+                    f"replaying {len(backlog)} records" if resumed else "live only")
+
+    def _remove(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.shutdown(socket.SHUT_RDWR)  # Wakes the accept loop, so the address is released
+            except OSError:
+                pass
+            self._server.close()
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.close()
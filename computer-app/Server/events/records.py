@@ -0,0 +1,107 @@
+"""
+Binary records of the event bus between the acoustic server and the API
+(events/publisher.py, events/subscriber.py).
+
+Every record travels as a frame: a 2-byte little-endian length followed by
+the payload. The payload starts with a common header:
+    seq (u64)        Position in the publisher's stream, starting at 1
+    timestamp (f64)  Unix time
+    type (u8)        READING or ALERT
+then a type-specific body, and the diver id (UTF-8) fills the rest:
+    READING: bpm (u16), status (u8)
+    ALERT:   kind (u8), status (u8), previous status (u8), bpm (u16, NO_BPM
+             if unknown), group id (i32, NO_GROUP if none)
+
+Connecting works in two steps:
+    subscriber -> publisher: RESUME   epoch (u64), first seq wanted (u64), 0 for live only
+    publisher -> subscriber: WELCOME  epoch (u64), next seq (u64), resumed (bool)
+The epoch identifies one run of the publisher; epoch 0 means "the current
+run" (for replaying from a known sequence number). If `resumed` is false,
+the records the subscriber missed are gone: it must reload its state from
+the database.
+"""
+import os
+import struct
+
+EVENTS_ADDRESS = os.environ.get("AQUASAFE_EVENTS_ADDRESS", "127.0.0.1:8765")
+
+READING = 1
+ALERT = 2
+
+STATUSES = ("normal", "warning", "critical")
+ALERT_KINDS = ("status", "lost", "found")
+NO_BPM = 0xFFFF
+NO_GROUP = -1
+
+FRAME = struct.Struct("<H")
+HEADER = struct.Struct("<QdB")
+READING_BODY = struct.Struct("<HB")
+ALERT_BODY = struct.Struct("<BBBHi")
+RESUME = struct.Struct("<QQ")
+WELCOME = struct.Struct("<QQ?")
+
+_STATUS_CODES = {status: code for code, status in enumerate(STATUSES)}
+_KIND_CODES = {kind: code for code, kind in enumerate(ALERT_KINDS)}
+
+
+class Event:
+    """A decoded record. Alert-only fields are None for readings."""
+    __slots__ = ("seq", "timestamp", "type", "diver_id", "bpm", "status", "kind", "previous_status", "group_id")
+
+    def __init__(self, seq, timestamp, type, diver_id, bpm, status, kind=None, previous_status=None, group_id=None):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.type = type
+        self.diver_id = diver_id
+        self.bpm = bpm
+        self.status = status
+        self.kind = kind
+        self.previous_status = previous_status
+        self.group_id = group_id
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+def encode_reading(seq, timestamp, diver_id, bpm, status):
+    """Returns the framed record of a decoded BPM reading."""
+    payload = (HEADER.pack(seq, timestamp, READING) + READING_BODY.pack(bpm, _STATUS_CODES[status])
+               + diver_id.encode())
+    return FRAME.pack(len(payload)) + payload
+
+
+def encode_alert(seq, alert):
+    """Returns the framed record of an Alert from acoustic/alerts.py."""
+    body = ALERT_BODY.pack(_KIND_CODES[alert.kind], _STATUS_CODES[alert.status],
+                           _STATUS_CODES[alert.previous_status], NO_BPM if alert.bpm is None else alert.bpm,
+                           NO_GROUP if alert.group_id is None else alert.group_id)
+    payload = HEADER.pack(seq, alert.timestamp, ALERT) + body + alert.diver_id.encode()
+    return FRAME.pack(len(payload)) + payload
+
+
+def decode(payload):
+    """Decodes a payload (a frame without its length prefix) into an Event."""
+    seq, timestamp, kind = HEADER.unpack_from(payload)
+    offset = HEADER.size
+    if kind == READING:
+        bpm, status = READING_BODY.unpack_from(payload, offset)
+        diver_id = payload[offset + READING_BODY.size:].decode()
+        return Event(seq, timestamp, READING, diver_id, bpm, STATUSES[status])
+    if kind == ALERT:
+        alert_kind, status, previous, bpm, group_id = ALERT_BODY.unpack_from(payload, offset)
+        diver_id = payload[offset + ALERT_BODY.size:].decode()
+        return Event(seq, timestamp, ALERT, diver_id, None if bpm == NO_BPM else bpm, STATUSES[status],
+                     ALERT_KINDS[alert_kind], STATUSES[previous], None if group_id == NO_GROUP else group_id)
+    raise ValueError(f"Unknown record type {kind}")
+
+
+def parse_address(address):
+    """
+    Splits an event bus address into (family, target): "unix:/path/to.sock"
+    (POSIX only) or "host:port" for loopback TCP (the default, which also
+    works on Windows).
+    """
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
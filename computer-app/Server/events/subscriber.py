@@ -0,0 +1,133 @@
+"""
+Receiving side of the event bus, run by the API server (asyncio).
+
+Connects to the acoustic server's publisher, reconnects with backoff when
+the connection drops and resumes from the last sequence number received.
+When records were lost (the acoustic server restarted, or the gap is
+older than its ring) on_resync is awaited first so the caller can reload
+its state from the database.
+
+Also runs on its own to dump the stream:
+    python -m events.subscriber [--address 127.0.0.1:8765] [--from-seq N]
+"""
+import argparse
+import asyncio
+import json
+
+from events.records import EVENTS_ADDRESS, FRAME, RESUME, WELCOME, decode, parse_address
+from log import get_logger
+from metrics import Counter
+
+RECONNECT_DELAY = 0.5  # Seconds before the first reconnect attempt
+MAX_RECONNECT_DELAY = 5.0
+
+logger = get_logger("events.subscriber")
+RECORDS_RECEIVED = Counter("aquasafe_events_received", "Records received from the event bus")
+RESYNCS = Counter("aquasafe_events_resyncs", "Connections that could not resume and reloaded state")
+
+
+class EventSubscriber:
+    def __init__(self, on_event, on_resync=None, address=EVENTS_ADDRESS, from_seq=0):
+        """
+        Args:
+            on_event (callable): Called with every Event, in sequence order.
+            on_resync (coroutine function): Awaited when records were missed.
+            address (str): Publisher address, see events.records.parse_address.
+            from_seq (int): Sequence number to replay from on the first connection; 0 for live only.
+        """
+        self.on_event = on_event
+        self.on_resync = on_resync
+        self.address = address
+        self.epoch = 0  # Publisher run of last_seq; 0 until the first connection
+        self.last_seq = 0
+        self._from_seq = from_seq
+        self.connected = False
+        self._task = None
+
+    def start(self):
+        """Starts the connection task on the running event loop, if it is not running yet."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        delay = RECONNECT_DELAY
+        while True:
+            try:
+                await self._session()
+            except (OSError, asyncio.IncompleteReadError) as e:
+                if self.connected:
+                    logger.warning("Event bus connection lost: %s", e)
+            except Exception as e:
+                logger.error("❌ ERROR on the event bus: %s", e)
+            if self.connected:
+                delay = RECONNECT_DELAY  # It worked for a while: retry quickly
+            self.connected = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    def _wanted_seq(self):
+        if self.epoch:
+            return self.last_seq + 1
+        return self._from_seq  # First connection: live only unless a replay was asked for
+
+    async def _session(self):
+        family, target = parse_address(self.address)
+        if family == "unix":
+            reader, writer = await asyncio.open_unix_connection(target)
+        else:
+            reader, writer = await asyncio.open_connection(*target)
+        try:
+            writer.write(RESUME.pack(self.epoch, self._wanted_seq()))
+            await writer.drain()
+            epoch, next_seq, resumed = WELCOME.unpack(await reader.readexactly(WELCOME.size))
+            first_connection = not self.epoch
+            self.epoch, self.last_seq = epoch, next_seq - 1
+            self.connected = True
+            if not resumed and not (first_connection and not self._from_seq):
+                RESYNCS.inc()
+                logger.warning("Event bus records were missed; reloading state")
+            if not resumed and self.on_resync is not None:
+                await self.on_resync()
+            logger.info("Connected to the event bus at %s (next record %d)", self.address, next_seq)
+
+            while True:
+                size, = FRAME.unpack(await reader.readexactly(FRAME.size))
+                event = decode(await reader.readexactly(size))
+                if event.seq != self.last_seq + 1:
+                    raise ConnectionError(f"Event bus skipped from {self.last_seq} to {event.seq}")
+                self.last_seq = event.seq
+                RECORDS_RECEIVED.inc()
+                self.on_event(event)
+        finally:
+            writer.close()
+
+
+async def _dump(address, from_seq):
+    subscriber = EventSubscriber(lambda event: print(json.dumps(event.to_dict())), address=address,
+                                 from_seq=from_seq)
+    subscriber.start()
+    await subscriber._task
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the AquaSafe event bus as JSON lines")
+    parser.add_argument("--address", default=EVENTS_ADDRESS)
+    parser.add_argument("--from-seq", type=int, default=0,
+                        help="Replay from this sequence number, if the publisher still has it (default: live only)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_dump(args.address, args.from_seq))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
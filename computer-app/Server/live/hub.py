@@ -0,0 +1,70 @@
+"""
+In-process publish/subscribe hub for live diver status.
+
+Each connected dashboard owns a Subscription with a bounded queue. The hub
+never waits for a client: publishing to a full queue drops that client
+(it is told to reconnect and gets a fresh snapshot), so one slow browser
+cannot hold up the updates of everyone else.
+
+The hub lives on the server's event loop; publish() and subscribe() must
+be called from it.
+"""
+import asyncio
+
+QUEUE_SIZE = 100  # Events a client may fall behind before it is dropped
+
+
+class Subscription:
+    def __init__(self, group_id, max_events):
+        self.group_id = group_id
+        self.events = asyncio.Queue(maxsize=max_events)  # Serialized JSON events; None means "dropped"
+        self.dropped = False
+
+
+class StatusHub:
+    def __init__(self, max_events=QUEUE_SIZE):
+        self.max_events = max_events
+        self._subscribers = {}  # group_id -> set of Subscription
+        self.dropped_clients = 0
+
+    def subscribe(self, group_id):
+        """Registers a client for the events of one group."""
+        subscription = Subscription(group_id, self.max_events)
+        self._subscribers.setdefault(group_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscribers = self._subscribers.get(subscription.group_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.group_id]
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def client_count(self):
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, group_id, event):
+        """
+        Queues a serialized event for every client of a group. Clients whose
+        queue is full are dropped instead of blocking the publisher.
+        """
+        for subscription in list(self._subscribers.get(group_id, ())):
+            try:
+                subscription.events.put_nowait(event)
+            except asyncio.QueueFull:
+                self._drop(subscription)
+
+    def _drop(self, subscription):
+        self.unsubscribe(subscription)
+        self.dropped_clients += 1
+        subscription.dropped = True
+        # Replace the backlog with the sentinel so the client's sender wakes up and disconnects
+        while not subscription.events.empty():
+            subscription.events.get_nowait()
+        subscription.events.put_nowait(None)
+
+
+hub = StatusHub()
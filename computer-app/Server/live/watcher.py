@@ -0,0 +1,209 @@
+"""
+Detects diver changes and publishes them to the status hub.
+
+Live fields (bpm, status) arrive from the acoustic server over the event
+bus (events/) as soon as a message is decoded, along with its alerts.
+Each record also invalidates the cached responses of its diver and group
+(state_cache.py).
+Divers added, removed or moved between groups through the API are still
+found in the database: the watcher checks SQLite's data_version (a
+counter that changes whenever another connection commits) and only then
+reads the divers table and publishes the differences. While the event bus
+is down, that check runs every WATCH_INTERVAL and covers the live fields
+too, as before the bus existed.
+
+When the bus reports missed records, the divers are re-read once the
+acoustic server has written them (it writes behind, up to FLUSH_INTERVAL
+later). Divers the bus updated since then keep the bus's live fields,
+which are newer than the database.
+
+One watcher serves every connected client. The API server starts it with
+the app, so the cache follows the event bus even while no dashboard is
+connected.
+"""
+import asyncio
+import json
+
+from acoustic.constants import FLUSH_INTERVAL
+from database import engine
+from events.records import ALERT, READING
+from events.subscriber import EventSubscriber
+from live.hub import hub
+from log import get_logger
+from state_cache import state_cache
+
+logger = get_logger("live.watcher")
+
+WATCH_INTERVAL = 0.25  # Seconds between checks for new commits while clients are connected
+BUS_WATCH_INTERVAL = 5.0  # Same, while the event bus delivers the live fields or no client is connected
+LIVE_FIELDS = ("bpm", "status", "current_depth")
+BUS_FIELDS = ("bpm", "status")  # Live fields the event bus delivers
+RESYNC_MARGIN = 0.5  # Seconds allowed for the acoustic server's flush on top of FLUSH_INTERVAL
+
+
+def _event(kind, **fields):
+    # Serialized once and shared by every client of the group
+    return json.dumps({"type": kind, **fields})
+
+
+class DiverChangeWatcher:
+    def __init__(self, status_hub, db_engine, cache, interval=WATCH_INTERVAL, bus_interval=BUS_WATCH_INTERVAL):
+        self.hub = status_hub
+        self.engine = db_engine
+        self.cache = cache
+        self.interval = interval
+        self.bus_interval = bus_interval
+        self.bus = EventSubscriber(self._on_bus_event, self._on_bus_resync)
+        self._connection = None  # Dedicated connection: data_version is tracked per connection
+        self._data_version = None  # None until the first read
+        self._divers = {}  # diver_id -> {"id", "group_id", "bpm", "status", "current_depth"}
+        self._loaded = False  # Whether _divers holds a first read (which publishes nothing)
+        self._bus_seq = {}  # diver_id -> sequence number of the last bus record applied, since the last resync
+        self._resync_seq = 0  # Last sequence number the publisher had sent when records were missed
+        self._resync_task = None
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    def start(self):
+        """Starts the polling task and the event bus connection on the running event loop, if not running yet."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        self.cache.follow_event_bus(self.bus)
+        self.bus.start()
+
+    async def stop(self):
+        """Stops the polling task and closes the event bus connection."""
+        self.cache.follow_event_bus(None)
+        await self.bus.stop()
+        for task in (self._task, self._resync_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+    async def _run(self):
+        while True:
+            try:
+                # Also without clients: bus records need the group of their diver
+                await self.refresh()
+            except Exception as e:
+                logger.error("Error while watching diver changes: %s", e)
+            # Without clients only group membership matters, and the cache checks commits itself
+            fast = self.hub.has_subscribers() and not self.bus.connected
+            await asyncio.sleep(self.interval if fast else self.bus_interval)
+
+    async def refresh(self, force=False):
+        """
+        Reads committed changes (if any) and publishes them.
+
+        Args:
+            force (bool): Re-read and compare every field even if nothing was committed.
+        """
+        async with self._lock:
+            rows = await asyncio.to_thread(self._read, force)
+            if rows is None:
+                return
+            # The bus is fresher than the database (telemetry is written behind): only compare
+            # the live fields when the bus is not delivering them. A forced read still keeps the
+            # bus's values for divers it updated after the last resync
+            bus_newer = set()
+            if force:
+                bus_newer = {diver_id for diver_id, seq in self._bus_seq.items() if seq > self._resync_seq}
+            events = self._diff(rows, live=force or not self.bus.connected, bus_newer=bus_newer)
+        for group_id, event in events:
+            self.hub.publish(group_id, event)
+
+    async def snapshot(self, group_id):
+        """Returns the serialized current state of a group's divers, for a client that just connected."""
+        await self.refresh()
+        divers = [diver for diver in self._divers.values() if diver["group_id"] == group_id]
+        return _event("snapshot", group_id=group_id, divers=divers)
+
+    def _read(self, force):
+        # Runs in a worker thread; returns None if nothing was committed since the last read
+        if self._connection is None:
+            self._connection = self.engine.raw_connection()
+        cursor = self._connection.cursor()
+        try:
+            cursor.execute("PRAGMA data_version")
+            version = cursor.fetchone()[0]
+            if version == self._data_version and not force:
+                return None
+            self._data_version = version
+            cursor.execute("SELECT id, group_id, bpm, status, current_depth FROM divers")
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def _diff(self, rows, live, bus_newer=frozenset()):
+        # Runs on the event loop, like the bus callbacks that also update self._divers
+        first_read = not self._loaded
+        self._loaded = True
+        events = []
+        current = {}
+        for diver_id, group_id, bpm, status, depth in rows:
+            diver = {"id": diver_id, "group_id": group_id, "bpm": bpm, "status": status, "current_depth": depth}
+            old = self._divers.get(diver_id)
+            if old is not None and old["group_id"] == group_id:
+                if live:
+                    if diver_id in bus_newer:
+                        diver.update({field: old[field] for field in BUS_FIELDS})
+                    changes = {field: diver[field] for field in LIVE_FIELDS if diver[field] != old[field]}
+                else:
+                    diver.update(bpm=old["bpm"], status=old["status"])
+                    changes = {"current_depth": depth} if depth != old["current_depth"] else {}
+                current[diver_id] = diver
+                if changes:
+                    events.append((group_id, _event("update", diver_id=diver_id, changes=changes)))
+                continue
+            current[diver_id] = diver
+            if old is not None:
+                events.append((old["group_id"], _event("removed", diver_id=diver_id)))
+            events.append((group_id, _event("added", diver=diver)))
+        for diver_id in self._divers.keys() - current.keys():
+            events.append((self._divers[diver_id]["group_id"], _event("removed", diver_id=diver_id)))
+
+        self._divers = current
+        return [] if first_read else events
+
+    def _on_bus_event(self, event):
+        diver = self._divers.get(event.diver_id)
+        group_id = diver["group_id"] if diver is not None else event.group_id
+        if diver is None and group_id is None:
+            self.cache.resync(FLUSH_INTERVAL + RESYNC_MARGIN)  # Group unknown until the next database read
+        else:
+            self.cache.invalidate_diver(event.diver_id, group_id, settle=FLUSH_INTERVAL + RESYNC_MARGIN)
+        if event.type == ALERT:
+            self.hub.publish(group_id, _event("alert", alert={
+                "diver_id": event.diver_id, "kind": event.kind, "status": event.status,
+                "previous_status": event.previous_status, "bpm": event.bpm, "timestamp": event.timestamp}))
+        if diver is None:
+            return  # Not loaded yet; the next database read includes it
+        self._bus_seq[event.diver_id] = event.seq
+        changes = {"status": event.status} if event.status != diver["status"] else {}
+        if event.type == READING and event.bpm != diver["bpm"]:
+            changes["bpm"] = event.bpm
+        if changes:
+            diver.update(changes)
+            self.hub.publish(diver["group_id"], _event("update", diver_id=event.diver_id, changes=changes))
+
+    async def _on_bus_resync(self):
+        # Records were missed: the database is the only complete source, once the acoustic server
+        # has flushed them. Read it later, without holding up the bus meanwhile
+        self.cache.resync(FLUSH_INTERVAL + RESYNC_MARGIN)
+        self._resync_seq = self.bus.last_seq
+        self._bus_seq.clear()  # Sequence numbers of an earlier publisher run are not comparable
+        if self._resync_task is None or self._resync_task.done():
+            self._resync_task = asyncio.get_running_loop().create_task(self._resync())
+
+    async def _resync(self):
+        await asyncio.sleep(FLUSH_INTERVAL + RESYNC_MARGIN)
+        try:
+            await self.refresh(force=True)
+        except Exception as e:
+            logger.error("Error while reloading divers after missed bus records: %s", e)
+
+
+watcher = DiverChangeWatcher(hub, engine, state_cache)
@@ -0,0 +1,88 @@
+"""
+Leveled, rate-limited logging for the API and acoustic servers.
+
+The level comes from AQUASAFE_LOG_LEVEL (default INFO). Per-window and
+per-message details are logged at DEBUG, so by default they cost only a
+level check. Every call site may log at most RATE_LIMIT_BURST records per
+RATE_LIMIT_INTERVAL seconds; the rest are counted, and the count is added
+to the next record that call site gets through.
+
+Log with %-style arguments (logger.debug("buffer: '%s'", message)) so
+the message is only formatted if it is actually written.
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+LOG_LEVEL = os.environ.get("AQUASAFE_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+RATE_LIMIT_INTERVAL = 10.0  # Seconds
+RATE_LIMIT_BURST = 20  # Records per call site per interval
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+class RateLimitFilter(logging.Filter):
+    """Drops records from call sites that logged more than `burst` times in `interval` seconds."""
+
+    def __init__(self, interval=RATE_LIMIT_INTERVAL, burst=RATE_LIMIT_BURST):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self._sites = {}  # (file, line) -> [window start, records let through, records suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        now = time.monotonic()
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None:
+                site = self._sites[key] = [now, 0, 0]
+            if now - site[0] >= self.interval:
+                if site[2]:
+                    record.msg = f"{record.msg} [{site[2]} similar messages suppressed]"
+                site[:] = [now, 0, 0]
+            if site[1] < self.burst:
+                site[1] += 1
+                return True
+            site[2] += 1
+            return False
+
+
+def configure(level=LOG_LEVEL):
+    """Sets up the "aquasafe" logger once: console output, level and rate limiting."""
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handler.addFilter(RateLimitFilter())
+        root = logging.getLogger("aquasafe")
+        root.addHandler(handler)
+        root.setLevel(level)
+        root.propagate = False
+        _configured = True
+
+
+@contextmanager
+def level(value):
+    """Sets the level of every "aquasafe" logger for the duration of the block."""
+    configure()
+    root = logging.getLogger("aquasafe")
+    previous = root.level
+    root.setLevel(value)
+    try:
+        yield
+    finally:
+        root.setLevel(previous)
+
+
+def get_logger(name):
+    """Logger for one component, e.g. get_logger("acoustic.framing")."""
+    configure()
+    return logging.getLogger(f"aquasafe.{name}")
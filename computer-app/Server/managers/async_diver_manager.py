@@ -0,0 +1,100 @@
+import operator
+from typing import List, Optional
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.diver import Diver as DiverModel
+from schemas.diver import DiverCreate
+
+ID_CHUNK_SIZE = 500  # Ids per IN query, well below SQLite's bound-parameter limit
+EXPORT_BATCH_SIZE = 500  # Rows fetched from the cursor per batch when exporting
+MAX_PAGE_SIZE = 500  # Largest page of a diver listing
+
+# Async counterpart of DiverManager for the API routes (kept separate so the
+# acoustic server and scripts don't need the asyncio extras installed)
+class AsyncDiverManager:
+    def __init__(self, db_session: AsyncSession):
+        self.db = db_session
+
+    async def get_all_divers(self):
+        return (await self.db.scalars(select(DiverModel))).all()
+
+    async def list_divers(self, after: Optional[str] = None, limit: int = 100, status: Optional[str] = None,
+                          group_id: Optional[int] = None, min_bpm: Optional[int] = None, max_bpm: Optional[int] = None,
+                          min_depth: Optional[float] = None, max_depth: Optional[float] = None):
+        """
+        Returns one page of divers ordered by id, using keyset pagination: the
+        page starts after the id `after` (the last id of the previous page),
+        so every page costs an index seek regardless of how deep it is.
+
+        Returns:
+            tuple: (list of divers, id to pass as `after` for the next page, or None on the last page)
+        """
+        query = select(DiverModel)
+        filters = [
+            (after, DiverModel.id, operator.gt),
+            (status, DiverModel.status, operator.eq),
+            (group_id, DiverModel.group_id, operator.eq),
+            (min_bpm, DiverModel.bpm, operator.ge),
+            (max_bpm, DiverModel.bpm, operator.le),
+            (min_depth, DiverModel.current_depth, operator.ge),
+            (max_depth, DiverModel.current_depth, operator.le),
+        ]
+        # Only given filters become clauses: SQLAlchemy rejects comparisons such as `id > None`
+        for value, column, compare in filters:
+            if value is not None:
+                query = query.where(compare(column, value))
+        # One extra row tells whether there is a next page
+        divers = (await self.db.scalars(query.order_by(DiverModel.id).limit(limit + 1))).all()
+        if len(divers) > limit:
+            return divers[:limit], divers[limit - 1].id
+        return divers, None
+
+    async def get_diver_by_id(self, diver_id: str):
+        return await self.db.get(DiverModel, diver_id)
+
+    async def get_diver_by_slot(self, slot: int):
+        return await self.db.scalar(select(DiverModel).where(DiverModel.slot == slot))
+
+    async def get_existing_slots(self, slots):
+        """Returns which of the given protocol v2 slots are already assigned, with one IN query."""
+        slots = [slot for slot in slots if slot is not None]
+        if not slots:
+            return set()
+        return set(await self.db.scalars(select(DiverModel.slot).where(DiverModel.slot.in_(slots))))
+
+    async def add_diver(self, diver: DiverCreate):
+        db_diver = DiverModel(**diver.model_dump())
+        self.db.add(db_diver)
+        await self.db.commit()
+        await self.db.refresh(db_diver)
+        return db_diver
+
+    async def delete_diver(self, db_diver: DiverModel):
+        await self.db.delete(db_diver)
+        await self.db.commit()
+
+    async def get_existing_ids(self, diver_ids):
+        """Returns which of the given ids already exist, with one IN query per chunk of ids."""
+        diver_ids = list(diver_ids)
+        existing = set()
+        for i in range(0, len(diver_ids), ID_CHUNK_SIZE):
+            chunk = diver_ids[i:i + ID_CHUNK_SIZE]
+            existing.update(await self.db.scalars(select(DiverModel.id).where(DiverModel.id.in_(chunk))))
+        return existing
+
+    async def add_divers(self, divers: List[DiverCreate]):
+        """Inserts many divers with one executemany, in a single transaction."""
+        if divers:
+            await self.db.execute(insert(DiverModel), [diver.model_dump() for diver in divers])
+        await self.db.commit()
+
+    async def stream_divers(self, columns, batch_size=EXPORT_BATCH_SIZE):
+        """
+        Yields the given columns of every diver, ordered by id, in lists of up
+        to batch_size rows. Rows are fetched from a server-side cursor, so the
+        table is never loaded into memory at once.
+        """
+        query = select(*(DiverModel.__table__.c[name] for name in columns)).order_by(DiverModel.id)
+        result = await self.db.stream(query.execution_options(yield_per=batch_size))
+        async for rows in result.partitions():
+            yield rows
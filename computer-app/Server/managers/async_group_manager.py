@@ -0,0 +1,47 @@
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from models.diver import Diver as DiverModel
+from models.group import Group as GroupModel
+from schemas.group import GroupCreate
+
+# Async counterpart of GroupManager. Divers are loaded eagerly with one extra
+# IN query: lazy loading is not possible in async code
+class AsyncGroupManager:
+    def __init__(self, db_session: AsyncSession):
+        self.db = db_session
+
+    async def get_all_groups(self):
+        return (await self.db.scalars(select(GroupModel).options(selectinload(GroupModel.divers)))).all()
+
+    async def get_group_summaries(self):
+        """
+        Returns every group with its number of divers per status, counted by
+        the database in one grouped query instead of loading the divers.
+
+        Returns:
+            list: dicts matching GroupSummary
+        """
+        query = (
+            select(GroupModel.id, GroupModel.name, DiverModel.status, func.count(DiverModel.group_id))
+            .outerjoin(DiverModel, DiverModel.group_id == GroupModel.id)
+            .group_by(GroupModel.id, DiverModel.status)
+            .order_by(GroupModel.id)
+        )
+        summaries = {}
+        for group_id, name, status, count in await self.db.execute(query):
+            summary = summaries.setdefault(group_id, {"id": group_id, "name": name, "diver_count": 0, "status_counts": {}})
+            if count:  # A group without divers has one row with a NULL status and a count of 0
+                summary["diver_count"] += count
+                summary["status_counts"][status] = count
+        return list(summaries.values())
+
+    async def get_group_by_id(self, group_id: int):
+        query = select(GroupModel).options(selectinload(GroupModel.divers)).where(GroupModel.id == group_id)
+        return (await self.db.scalars(query)).first()
+
+    async def add_group(self, group: GroupCreate):
+        db_group = GroupModel(**group.model_dump(), divers=[])  # A new group has no divers; nothing to load
+        self.db.add(db_group)
+        await self.db.commit()
+        return db_group
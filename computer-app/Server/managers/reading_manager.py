@@ -0,0 +1,174 @@
+import time
+from sqlalchemy import Float, Integer, cast, delete, func, insert, literal, select, union_all
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from models.reading import Reading, ReadingRollup
+
+ROLLUP_SECONDS = 60  # Raw readings are compacted into one rollup per diver per minute
+RAW_RETENTION = 7 * 24 * 3600  # Seconds raw readings are kept before being compacted
+ROLLUP_RETENTION = 365 * 24 * 3600  # Seconds rollups are kept
+MAX_BUCKETS = 10000  # Largest number of buckets one range query may return
+
+
+def _merge_min(column, excluded):
+    # SQLite's scalar min()/max() return NULL if either argument is NULL
+    return func.min(func.coalesce(column, excluded), func.coalesce(excluded, column))
+
+
+def _merge_max(column, excluded):
+    return func.max(func.coalesce(column, excluded), func.coalesce(excluded, column))
+
+
+class ReadingManager:
+    def __init__(self, db_session: Session):
+        self.db = db_session
+
+    def add_readings(self, readings):
+        """
+        Appends raw readings in one bulk INSERT. Does not commit, so readings
+        can be written in the same transaction as the diver updates.
+
+        Args:
+            readings (list): Dicts with diver_id, timestamp, bpm and depth.
+        """
+        if readings:
+            self.db.execute(insert(Reading), readings)
+
+    def get_raw_readings(self, diver_id: str, start: float, end: float, limit: int):
+        """Returns raw readings of a diver in [start, end), oldest first."""
+        return (
+            self.db.query(Reading)
+            .filter(Reading.diver_id == diver_id, Reading.timestamp >= start, Reading.timestamp < end)
+            .order_by(Reading.timestamp)
+            .limit(limit)
+            .all()
+        )
+
+    def get_buckets(self, diver_id: str, start: float, end: float, bucket_seconds: int):
+        """
+        Downsamples the readings of a diver in [start, end) to buckets of
+        bucket_seconds, computing min/max/avg per bucket in SQL.
+
+        Raw readings and rollups are aggregated separately and merged, so
+        ranges that span compacted history are answered seamlessly. Compacted
+        ranges only have ROLLUP_SECONDS resolution: a rollup overlapping the
+        range is counted whole, in the bucket that contains its start.
+
+        Returns:
+            list: Rows with start, count, bpm_min, bpm_max, bpm_avg,
+                  depth_min, depth_max and depth_avg.
+        """
+        raw_bucket = (cast(Reading.timestamp / bucket_seconds, Integer) * bucket_seconds).label("start")
+        raw = (
+            select(
+                raw_bucket,
+                func.count().label("count"),
+                func.count(Reading.bpm).label("bpm_count"),
+                func.min(Reading.bpm).label("bpm_min"),
+                func.max(Reading.bpm).label("bpm_max"),
+                func.total(Reading.bpm).label("bpm_sum"),
+                func.count(Reading.depth).label("depth_count"),
+                func.min(Reading.depth).label("depth_min"),
+                func.max(Reading.depth).label("depth_max"),
+                func.total(Reading.depth).label("depth_sum"),
+            )
+            .where(Reading.diver_id == diver_id, Reading.timestamp >= start, Reading.timestamp < end)
+            .group_by(raw_bucket)
+        )
+        rollup_bucket = (cast(ReadingRollup.bucket_start / bucket_seconds, Integer) * bucket_seconds).label("start")
+        rollups = (
+            select(
+                rollup_bucket,
+                func.sum(ReadingRollup.count),
+                func.sum(ReadingRollup.bpm_count),
+                func.min(ReadingRollup.bpm_min),
+                func.max(ReadingRollup.bpm_max),
+                func.total(ReadingRollup.bpm_sum),
+                func.sum(ReadingRollup.depth_count),
+                func.min(ReadingRollup.depth_min),
+                func.max(ReadingRollup.depth_max),
+                func.total(ReadingRollup.depth_sum),
+            )
+            .where(ReadingRollup.diver_id == diver_id,
+                   ReadingRollup.bucket_start > start - ROLLUP_SECONDS, ReadingRollup.bucket_start < end)
+            .group_by(rollup_bucket)
+        )
+        merged = union_all(raw, rollups).subquery()
+        query = (
+            select(
+                merged.c.start,
+                func.sum(merged.c.count).label("count"),
+                func.min(merged.c.bpm_min).label("bpm_min"),
+                func.max(merged.c.bpm_max).label("bpm_max"),
+                (cast(func.total(merged.c.bpm_sum), Float) / func.nullif(func.sum(merged.c.bpm_count), 0)).label("bpm_avg"),
+                func.min(merged.c.depth_min).label("depth_min"),
+                func.max(merged.c.depth_max).label("depth_max"),
+                (cast(func.total(merged.c.depth_sum), Float) / func.nullif(func.sum(merged.c.depth_count), 0)).label("depth_avg"),
+            )
+            .group_by(merged.c.start)
+            .order_by(merged.c.start)
+        )
+        return self.db.execute(query).mappings().all()
+
+    def compact(self, now=None, raw_retention=RAW_RETENTION, rollup_retention=ROLLUP_RETENTION):
+        """
+        Folds raw readings older than raw_retention into per-minute rollups,
+        deletes them, and deletes rollups older than rollup_retention, all in
+        one transaction. Readings that arrive late for an already compacted
+        minute are merged into the existing rollup.
+
+        Returns:
+            tuple: (raw readings compacted, rollups deleted)
+        """
+        now = time.time() if now is None else now
+        cutoff = int(now - raw_retention) // ROLLUP_SECONDS * ROLLUP_SECONDS # Only whole minutes are compacted
+
+        bucket = (cast(Reading.timestamp / ROLLUP_SECONDS, Integer) * ROLLUP_SECONDS).label("bucket_start")
+        aggregates = (
+            select(
+                Reading.diver_id,
+                bucket,
+                func.count(),
+                func.count(Reading.bpm),
+                func.min(Reading.bpm),
+                func.max(Reading.bpm),
+                func.total(Reading.bpm),
+                func.count(Reading.depth),
+                func.min(Reading.depth),
+                func.max(Reading.depth),
+                func.total(Reading.depth),
+            )
+            .where(Reading.timestamp < cutoff)
+            .group_by(Reading.diver_id, bucket)
+        )
+        columns = ["diver_id", "bucket_start", "count", "bpm_count", "bpm_min", "bpm_max", "bpm_sum",
+                   "depth_count", "depth_min", "depth_max", "depth_sum"]
+        upsert = sqlite_insert(ReadingRollup).from_select(columns, aggregates)
+        excluded = upsert.excluded
+        rollup = ReadingRollup
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[rollup.diver_id, rollup.bucket_start],
+            set_={
+                "count": rollup.count + excluded["count"],
+                "bpm_count": rollup.bpm_count + excluded.bpm_count,
+                "bpm_min": _merge_min(rollup.bpm_min, excluded.bpm_min),
+                "bpm_max": _merge_max(rollup.bpm_max, excluded.bpm_max),
+                "bpm_sum": func.coalesce(rollup.bpm_sum, literal(0)) + excluded.bpm_sum,
+                "depth_count": rollup.depth_count + excluded.depth_count,
+                "depth_min": _merge_min(rollup.depth_min, excluded.depth_min),
+                "depth_max": _merge_max(rollup.depth_max, excluded.depth_max),
+                "depth_sum": func.coalesce(rollup.depth_sum, literal(0)) + excluded.depth_sum,
+            },
+        )
+
+        try:
+            self.db.execute(upsert)
+            compacted = self.db.execute(delete(Reading).where(Reading.timestamp < cutoff)).rowcount
+            expired = self.db.execute(
+                delete(ReadingRollup).where(ReadingRollup.bucket_start < now - rollup_retention)
+            ).rowcount
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        return compacted, expired
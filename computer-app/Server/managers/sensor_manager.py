@@ -1,20 +1,20 @@
-from typing import List
-from models.sensor import Sensor
-from managers.diver_manager import DiverManager
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from models.diver import Diver as DiverModel
+
+# Columns of the compact Sensor view (models/sensor.py)
+SENSOR_COLUMNS = (DiverModel.id, DiverModel.bpm, DiverModel.current_depth, DiverModel.status)
 
 class SensorManager:
-    def __init__(self, diver_manager: DiverManager):
-        self.diver_manager = diver_manager
+    def __init__(self, db_session: Session):
+        self.db = db_session
 
     def get_all_sensors(self):
-        # Create a simplified list from the full data in DiverManager
-        return [
-            {
-                "id": diver["id"],
-                "name": diver["name"],
-                "bpm": diver["bpm"],
-                "current_depth": diver["current_depth"],  # Using current_depth
-                "status": diver["status"],
-            }
-            for diver in self.diver_manager.divers
-        ]
\ No newline at end of file
+        """
+        Returns the live readings of every diver, ordered by id. Only the
+        needed columns are selected, so no Diver objects are built.
+
+        Returns:
+            list: dicts matching Sensor
+        """
+        return [dict(row._mapping) for row in self.db.execute(select(*SENSOR_COLUMNS).order_by(DiverModel.id))]
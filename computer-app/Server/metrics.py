@@ -0,0 +1,299 @@
+"""
+Prometheus-compatible metrics without extra dependencies.
+
+Counters, gauges and histograms are registered in REGISTRY when they are
+created (at import time of the module that owns them) and rendered in
+the Prometheus text format by render(). The API serves them at /metrics;
+the acoustic server runs start_http_server() on its own port.
+
+Updating a metric takes a lock and a few additions, so it is cheap enough
+for per-window hot paths.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Seconds
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if any(m.name == metric.name for m in self._metrics):
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics.append(metric)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}  # Label values -> child
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+        registry.register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """The child metric for these label values (in labelnames order)."""
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            labels = list(zip(self.labelnames, values))
+            for suffix, extra, value in child.samples():
+                yield suffix, labels + extra, value
+
+
+class _CounterValue:
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def samples(self):
+        yield "_total", [], self._value
+
+
+class Counter(_Metric):
+    """A value that only goes up. The name gets the _total suffix when rendered."""
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterValue()
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+
+class _GaugeValue:
+    def __init__(self):
+        self._value = 0
+        self._function = None
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self._value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set_function(self, function):
+        """Reads the value from function() at every scrape instead (e.g. a queue depth)."""
+        self._function = function
+
+    def samples(self):
+        yield "", [], self._function() if self._function is not None else self._value
+
+
+class Gauge(_Metric):
+    """A value that goes up and down."""
+    type = "gauge"
+
+    def _new_child(self):
+        return _GaugeValue()
+
+    def set(self, value):
+        self._default.set(value)
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        self._default.dec(amount)
+
+    def set_function(self, function):
+        self._default.set_function(function)
+
+
+class _HistogramValue:
+    def __init__(self, buckets):
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)  # Per bucket, not cumulative; the last one is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self):
+        """Observes the duration of the block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def samples(self):
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative = 0
+        for bound, count in zip(self._buckets + (float("inf"),), counts):
+            cumulative += count
+            yield "_bucket", [("le", _format_value(float(bound)))], cumulative
+        yield "_sum", [], total
+        yield "_count", [], cumulative
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (usually durations in seconds) over fixed buckets."""
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+
+REQUEST_SECONDS = Histogram("aquasafe_http_request_duration_seconds",
+                            "Time until the response headers were sent, per route",
+                            ["method", "route", "status"])
+
+
+def route_template(scope):
+    """
+    Full path template of the route that matched a request (e.g.
+    /divers/{diver_id}), or "unmatched".
+
+    Routes of a router included with a prefix may report their path
+    relative to the router ("/{diver_id}"). The prefix is then the part of
+    the request path before what the route's own pattern matches; the
+    longest match is taken, so a route that already has its full path
+    gets no prefix.
+    """
+    route = scope.get("route")  # Set by the router once it matched
+    if route is None:
+        return "unmatched"
+    regex = getattr(route, "path_regex", None)
+    if regex is None:
+        return route.path
+    path = scope["path"]
+    for split in [0] + [i for i, char in enumerate(path) if char == "/" and i] + [len(path)]:
+        if regex.match(path[split:]):
+            return path[:split] + route.path
+    return route.path
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording the latency of every HTTP request, labeled by
+    route template (e.g. /divers/{diver_id}) so ids do not explode the
+    number of series. Streaming responses are timed until their headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        recorded = False
+
+        def record(status):
+            nonlocal recorded
+            recorded = True
+            REQUEST_SECONDS.labels(scope["method"], route_template(scope), status).observe(
+                time.perf_counter() - started)
+
+        async def send_and_record(message):
+            if message["type"] == "http.response.start":
+                record(str(message["status"]))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            if not recorded:  # The app failed before it sent a response
+                record("500")
+
+
+def start_http_server(port, address="0.0.0.0", registry=REGISTRY):
+    """Serves the metrics at http://address:port/ (any path) from a daemon thread."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # Only the acoustic server needs it
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes every few seconds would flood the console
+
+    server = ThreadingHTTPServer((address, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,30 @@
+"""
+Creates the tables, columns and indexes of divers.db, or adds the ones a newer
+version of AquaSafe needs. Run it after updating, before starting the
+servers:
+    python migrate.py [--check]
+
+The servers only compare the schema version at startup (one PRAGMA) and
+run the same migration if the file is behind.
+"""
+import argparse
+import sys
+
+from database import SCHEMA_VERSION, create_schema, schema_version
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create or upgrade the AquaSafe database schema")
+    parser.add_argument("--check", action="store_true", help="Only report whether a migration is needed")
+    args = parser.parse_args()
+
+    version = schema_version()
+    if args.check:
+        print(f"Schema version {version}, current is {SCHEMA_VERSION}")
+        sys.exit(0 if version >= SCHEMA_VERSION else 1)
+    create_schema()
+    print(f"Schema is at version {SCHEMA_VERSION} (was {version})")
+
+
+if __name__ == "__main__":
+    main()
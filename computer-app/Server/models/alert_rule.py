@@ -0,0 +1,23 @@
+from sqlalchemy import Column, String, Integer, Float
+from database import Base
+
+
+class AlertRule(Base):
+    """
+    Alert thresholds for one diver (diver_id set), one group (group_id set),
+    or every diver (neither set). Each threshold left NULL is inherited from
+    the next broader rule: diver, then group, then the default rule, then
+    the built-in defaults in acoustic/alerts.py.
+    """
+    __tablename__ = "alert_rules"
+
+    id = Column(Integer, primary_key=True)
+    diver_id = Column(String, unique=True)
+    group_id = Column(Integer, unique=True)
+
+    warning_bpm = Column(Integer)  # Above this BPM the diver is in warning
+    critical_bpm = Column(Integer)  # Above this BPM the diver is critical
+    hysteresis_bpm = Column(Integer)  # BPM must drop this far below a limit before the status goes back down
+    max_bpm_rate = Column(Float)  # BPM change per second between readings that raises a warning
+    lost_after = Column(Float)  # Seconds without a reading before the diver is reported lost
+    max_depth = Column(Float)  # Meters; a diver deeper than this is at least in warning
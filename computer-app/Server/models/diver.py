@@ -1,9 +1,20 @@
-from sqlalchemy import Column, String, Integer, Float, ForeignKey
+from sqlalchemy import Column, String, Integer, Float, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
 class Diver(Base):
     __tablename__ = "divers"
+    __table_args__ = (
+        # Listing filtered by status, in id order (keyset pagination)
+        Index("ix_divers_status_id", "status", "id"),
+        # Loading a group's divers, and listing a group in id order
+        Index("ix_divers_group_keyset", "group_id", "id"),
+        # Per-status diver counts of every group, read from the index alone.
+        # bpm and current_depth are not indexed: they change every second and are only range-filtered
+        Index("ix_divers_group_status", "group_id", "status"),
+        # Protocol v2 slot of the diver's watch (acoustic/protocol_v2.py); at most one diver per slot
+        Index("ix_divers_slot", "slot", unique=True),
+    )
 
     id = Column(String, primary_key=True, index=True)
     name = Column(String)
@@ -14,6 +25,7 @@ class Diver(Base):
     entry_point = Column(String)
     current_depth = Column(Float)
     status = Column(String)
+    slot = Column(Integer)
 
     group_id = Column(Integer, ForeignKey("groups.id"))
     group = relationship("Group", back_populates="divers")
\ No newline at end of file
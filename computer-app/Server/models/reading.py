@@ -0,0 +1,43 @@
+from sqlalchemy import Column, String, Integer, Float, Index
+from database import Base
+
+
+class Reading(Base):
+    """
+    One raw BPM/depth sample of a diver. Append-only: rows are never updated,
+    only compacted into ReadingRollup rows once they are older than the
+    raw retention period.
+    """
+    __tablename__ = "readings"
+
+    id = Column(Integer, primary_key=True)
+    diver_id = Column(String, nullable=False)
+    timestamp = Column(Float, nullable=False)  # Unix time in seconds
+    bpm = Column(Integer)
+    depth = Column(Float)
+
+    # Range queries scan (diver_id, timestamp); bpm and depth are included so
+    # aggregations are answered from the index without touching the table
+    __table_args__ = (
+        Index("ix_readings_diver_time", "diver_id", "timestamp", "bpm", "depth"),
+    )
+
+
+class ReadingRollup(Base):
+    """
+    Aggregate of the raw readings of one diver over a fixed period. Sums and
+    counts are stored instead of averages so rollups can be merged exactly.
+    """
+    __tablename__ = "reading_rollups"
+
+    diver_id = Column(String, primary_key=True)
+    bucket_start = Column(Integer, primary_key=True)  # Unix time of the start of the period
+    count = Column(Integer, nullable=False)
+    bpm_count = Column(Integer, nullable=False)
+    bpm_min = Column(Integer)
+    bpm_max = Column(Integer)
+    bpm_sum = Column(Integer)
+    depth_count = Column(Integer, nullable=False)
+    depth_min = Column(Float)
+    depth_max = Column(Float)
+    depth_sum = Column(Float)
@@ -0,0 +1,251 @@
+"""
+Background e-mail dispatcher for contact messages and diver alerts.
+
+submit() never blocks: notifications go to a bounded queue that worker
+threads send through a pool of persistent SMTP connections
+(notifications/mailer.py). On the way out:
+    - Rate limiting: a token bucket caps messages per second, so an alert
+      storm is not throttled or blocked by the mail provider.
+    - Coalescing: a notification with a coalesce key (e.g. one diver)
+      that is still waiting in the queue absorbs newer notifications with
+      the same key, so a burst of alerts for one diver becomes one e-mail.
+    - Retries: temporary failures (disconnects, 4xx replies) are retried
+      with exponential backoff; permanent ones (5xx replies) are dropped.
+
+The email package is imported when the first message is built, not at startup.
+"""
+import queue
+import random
+import threading
+import time
+
+from log import get_logger
+from metrics import Counter
+from notifications.mailer import MailConfig, SMTPConnectionPool, POOL_SIZE
+
+logger = get_logger("notifications")
+NOTIFICATIONS = Counter("aquasafe_notifications", "E-mail notifications by outcome "
+                        "(sent, coalesced, retried, failed, rejected)", ["outcome"])
+
+QUEUE_SIZE = 500  # Notifications waiting to be sent; submit() refuses more
+RATE_PER_SECOND = 2.0  # Sustained messages per second
+BURST = 10  # Messages that may be sent at once after a quiet period
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 1.0  # Seconds before the first retry; doubles every attempt
+BACKOFF_MAX = 60.0
+MAX_COALESCED_LINES = 20  # Updates quoted in one coalesced e-mail
+
+
+class Notification:
+    def __init__(self, subject, body, recipients, reply_to=None, key=None):
+        """
+        Args:
+            subject (str): E-mail subject.
+            body (str): Plain text body.
+            recipients (list): Addresses to send to.
+            reply_to (str): Optional Reply-To address.
+            key: Optional coalesce key; queued notifications with the same key are merged.
+        """
+        self.subject = subject
+        self.lines = [body]
+        self.recipients = list(recipients)
+        self.reply_to = reply_to
+        self.key = key
+        self.merged = 0
+        self.attempts = 0
+
+    def merge(self, other):
+        """Absorbs a newer notification: its subject wins, its body is appended."""
+        self.subject = other.subject
+        self.lines = (self.lines + other.lines)[-MAX_COALESCED_LINES:]
+        self.merged += 1
+
+    def to_message(self, sender):
+        from email.mime.text import MIMEText
+        body = self.lines[0] if len(self.lines) == 1 else \
+            f"{self.merged + 1} updates, latest last:\n\n" + "\n\n".join(self.lines)
+        message = MIMEText(body)
+        message["Subject"] = self.subject
+        message["From"] = sender
+        message["To"] = ", ".join(self.recipients)
+        if self.reply_to:
+            message["Reply-To"] = self.reply_to
+        return message
+
+
+class TokenBucket:
+    """Thread-safe rate limiter: acquire() waits until a token is available."""
+
+    def __init__(self, rate=RATE_PER_SECOND, burst=BURST):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, stop_event):
+        """Takes a token. Returns False if stop_event was set while waiting."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if stop_event.wait(wait):
+                return False
+
+
+def _is_temporary(error):
+    """Whether a send error is worth retrying."""
+    import smtplib
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)  # Network errors
+
+
+class NotificationDispatcher:
+    """Sends notifications in the background. Workers start on the first submit()."""
+
+    def __init__(self, config: MailConfig = None, workers=POOL_SIZE, max_queued=QUEUE_SIZE,
+                 rate=RATE_PER_SECOND, burst=BURST, max_attempts=MAX_ATTEMPTS, backoff_base=BACKOFF_BASE):
+        self.config = config or MailConfig.from_env()
+        self.pool = SMTPConnectionPool(self.config, size=workers)
+        self.rate_limiter = TokenBucket(rate, burst)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.worker_count = workers
+        self._queue = queue.Queue(max_queued)
+        self._pending = {}  # Coalesce key -> queued Notification
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._workers = []
+
+        # Counters
+        self.sent = 0
+        self.coalesced = 0
+        self.retried = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self):
+        with self._lock:
+            if self._workers:
+                return
+            self._workers = [threading.Thread(target=self._run, name=f"notifications-{i}", daemon=True)
+                             for i in range(self.worker_count)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, notification: Notification):
+        """
+        Queues a notification without waiting.
+
+        Returns:
+            bool: False if the queue is full and the notification was dropped.
+        """
+        self.start()
+        with self._lock:
+            queued = self._pending.get(notification.key) if notification.key is not None else None
+            if queued is not None:
+                queued.merge(notification)
+                self.coalesced += 1
+                NOTIFICATIONS.labels("coalesced").inc()
+                return True
+            try:
+                self._queue.put_nowait(notification)
+            except queue.Full:
+                self.rejected += 1
+                NOTIFICATIONS.labels("rejected").inc()
+                logger.error("❌ ERROR: notification queue full, dropped '%s'", notification.subject)
+                return False
+            if notification.key is not None:
+                self._pending[notification.key] = notification
+        return True
+
+    def _take(self):
+        """Next notification to send, or None when stopping. Ends its coalescing window."""
+        while not self._stop.is_set():
+            try:
+                notification = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            with self._lock:
+                if self._pending.get(notification.key) is notification:
+                    del self._pending[notification.key]
+            return notification
+        return None
+
+    def _run(self):
+        while True:
+            notification = self._take()
+            if notification is None:
+                return
+            try:
+                self._send(notification)
+            finally:
+                self._queue.task_done()
+
+    def _send(self, notification):
+        while self.rate_limiter.acquire(self._stop):
+            notification.attempts += 1
+            try:
+                with self.pool.connection() as connection:
+                    message = notification.to_message(self.config.sender)
+                    connection.sendmail(self.config.sender, notification.recipients, message.as_string())
+                self.sent += 1
+                NOTIFICATIONS.labels("sent").inc()
+                return
+            except Exception as e:
+                if not _is_temporary(e) or notification.attempts >= self.max_attempts:
+                    self.failed += 1
+                    NOTIFICATIONS.labels("failed").inc()
+                    logger.error("❌ ERROR sending '%s' (attempt %d): %s", notification.subject, notification.attempts, e)
+                    return
+                self.retried += 1
+                NOTIFICATIONS.labels("retried").inc()
+                delay = min(BACKOFF_MAX, self.backoff_base * 2 ** (notification.attempts - 1))
+                if self._stop.wait(delay * random.uniform(0.5, 1.0)):  # Jitter spreads the retries of all workers
+                    return
+
+    def join(self, timeout=None):
+        """Waits until every queued notification was sent or given up. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def close(self, timeout=10.0):
+        """Sends what is queued (for up to `timeout` seconds), then stops the workers and the pool."""
+        if self._workers:
+            self.join(timeout)
+        self._stop.set()
+        for worker in self._workers:
+            worker.join()
+        self.pool.close()
+
+    def stats(self):
+        return {"queued": self._queue.qsize(), "sent": self.sent, "coalesced": self.coalesced,
+                "retried": self.retried, "failed": self.failed, "rejected": self.rejected,
+                "connects": self.pool.connects, "reused_connections": self.pool.reused}
+
+
+def alert_notification(alert, recipients):
+    """E-mail for an Alert from the alert engine, coalesced per diver."""
+    reasons = f" ({', '.join(alert.reasons)})" if alert.reasons else ""
+    subject = f"AquaSafe {alert.status.upper()}: diver {alert.diver_id}"
+    when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(alert.timestamp))
+    body = (f"{when}  Diver {alert.diver_id} {alert.kind}: {alert.previous_status} -> {alert.status}{reasons}"
+            + (f", last BPM {alert.bpm}" if alert.bpm is not None else ""))
+    return Notification(subject, body, recipients, key=("diver", alert.diver_id))
+
+
+dispatcher = NotificationDispatcher()
@@ -0,0 +1,158 @@
+"""
+SMTP settings and a pool of persistent SMTP connections.
+
+Settings come from the process environment, never from source (nothing
+reads a .env file; export the variables before starting the servers):
+    AQUASAFE_SMTP_HOST, AQUASAFE_SMTP_PORT
+    AQUASAFE_SMTP_USER, AQUASAFE_SMTP_PASSWORD  (no login if the user is empty)
+    AQUASAFE_SMTP_STARTTLS                      ("0" for a plain local server)
+    AQUASAFE_SMTP_SENDER                        (defaults to the user)
+    AQUASAFE_CONTACT_RECIPIENTS, AQUASAFE_ALERT_RECIPIENTS  (comma separated; nothing is
+                                                            sent while a list is empty)
+
+To try it without a real mail account, run a local stand-in server, e.g.
+    python -m aiosmtpd -n -l localhost:8025
+and set AQUASAFE_SMTP_HOST=localhost AQUASAFE_SMTP_PORT=8025 AQUASAFE_SMTP_STARTTLS=0.
+
+smtplib and ssl are imported when the first connection is opened, so the
+servers do not load them at startup.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+POOL_SIZE = 2  # Open connections at most; mail providers limit concurrent sessions
+CONNECT_TIMEOUT = 10.0  # Seconds for connecting and for every SMTP command
+IDLE_CHECK = 30.0  # A connection idle for longer is checked with NOOP before reuse
+MAX_IDLE = 240.0  # A connection idle for longer is closed (servers drop idle sessions after a few minutes)
+
+
+def _recipients(value):
+    return [address.strip() for address in value.split(",") if address.strip()]
+
+
+class MailConfig:
+    def __init__(self, host="smtp.office365.com", port=587, user="", password="", starttls=True, sender="",
+                 contact_recipients=(), alert_recipients=()):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.sender = sender or user
+        self.contact_recipients = list(contact_recipients)
+        self.alert_recipients = list(alert_recipients)
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        return cls(
+            host=environ.get("AQUASAFE_SMTP_HOST", "smtp.office365.com"),
+            port=int(environ.get("AQUASAFE_SMTP_PORT", "587")),
+            user=environ.get("AQUASAFE_SMTP_USER", ""),
+            password=environ.get("AQUASAFE_SMTP_PASSWORD", ""),
+            starttls=environ.get("AQUASAFE_SMTP_STARTTLS", "1") != "0",
+            sender=environ.get("AQUASAFE_SMTP_SENDER", ""),
+            contact_recipients=_recipients(environ.get("AQUASAFE_CONTACT_RECIPIENTS", "")),
+            alert_recipients=_recipients(environ.get("AQUASAFE_ALERT_RECIPIENTS", "")),
+        )
+
+
+class SMTPConnectionPool:
+    """
+    Keeps up to `size` logged-in SMTP connections open and hands them out
+    to one sender at a time, so each message costs one SMTP transaction
+    instead of a connect, STARTTLS and login. Connections that went stale
+    are replaced transparently. Thread-safe.
+    """
+
+    def __init__(self, config: MailConfig, size=POOL_SIZE, timeout=CONNECT_TIMEOUT):
+        self.config = config
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = []  # (connection, released at) of connections nobody is using
+        self._lock = threading.Lock()
+
+        # Counters
+        self.connects = 0
+        self.reused = 0
+
+    def _connect(self):
+        import smtplib
+        import ssl
+        connection = smtplib.SMTP(self.config.host, self.config.port, timeout=self.timeout)
+        try:
+            if self.config.starttls:
+                connection.starttls(context=ssl.create_default_context())
+            if self.config.user:
+                connection.login(self.config.user, self.config.password)
+        except Exception:
+            self._close(connection)
+            raise
+        self.connects += 1
+        return connection
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.quit()
+        except Exception:
+            connection.close()
+
+    def _take_idle(self):
+        """Returns a usable idle connection, or None. Closes stale ones on the way."""
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                connection, released_at = self._idle.pop()
+            idle = time.monotonic() - released_at
+            if idle > MAX_IDLE:
+                self._close(connection)
+                continue
+            if idle > IDLE_CHECK:
+                try:
+                    if connection.noop()[0] != 250:
+                        raise ConnectionError("NOOP failed")
+                except Exception:
+                    connection.close()
+                    continue
+            self.reused += 1
+            return connection
+
+    def _release(self, connection):
+        with self._lock:
+            self._idle.append((connection, time.monotonic()))
+
+    @contextmanager
+    def connection(self):
+        """
+        Lends a connection for the duration of the block. If the block
+        raises, the connection is closed instead of returned to the pool,
+        unless the server refused the message: sendmail() resets the session
+        first, so the connection is still good.
+        """
+        import smtplib
+        self._slots.acquire()
+        connection = None
+        try:
+            connection = self._take_idle() or self._connect()
+            yield connection
+        except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+            if connection is not None:
+                self._release(connection)
+            raise
+        except Exception:
+            if connection is not None:
+                connection.close()
+            raise
+        else:
+            self._release(connection)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self._close(connection)
@@ -1,29 +1,20 @@
-from fastapi import APIRouter, Request, BackgroundTasks
-import smtplib
-from email.mime.text import MIMEText
+from fastapi import APIRouter, HTTPException, Request
+from notifications.dispatcher import Notification, dispatcher
 
 router = APIRouter()
 
 @router.post("/contact")
-async def contact_us(request: Request, background_tasks: BackgroundTasks):
+async def contact_us(request: Request):
+    if not dispatcher.config.contact_recipients:
+        raise HTTPException(status_code=503, detail="The contact form is not configured")
     data = await request.json()
     name = data.get("name", "")
     email = data.get("email", "")
     message = data.get("message", "")
     subject = f"New inquiry from AquaSafe website"
     body = f"Name: {name}\nEmail: {email}\nMessage: {message}"
-    recipients = ["noa4000@gmail.com", "lihicohen122@gmail.com"]
-    def send_email(name, email, message):
-        msg = MIMEText(body)
-        msg["Subject"] = subject
-        msg["From"] = email
-        msg["To"] = ", ".join(recipients)
-        try:
-            with smtplib.SMTP("smtp.office365.com", 587) as server:
-                server.starttls()
-                server.login("aquasafehelp@outlook.co.il", "AU5UV-5N7DX-8PHBW-BMSQA-369PY")
-                server.sendmail(email, recipients, msg.as_string())
-        except Exception as e:
-            print(f"Error sending email: {e}")
-    background_tasks.add_task(send_email, name, email, message)
+    # Sent in the background through the shared SMTP pool. The visitor's address goes in
+    # Reply-To: the mail server only accepts our own address as the sender
+    if not dispatcher.submit(Notification(subject, body, dispatcher.config.contact_recipients, reply_to=email or None)):
+        raise HTTPException(status_code=503, detail="Too many messages right now, please try again later")
     return {"message": "Message sent"}
@@ -1,34 +1,146 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import csv
+import io
+import json
+import time
+from collections import Counter
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from models.diver import Diver as DiverModel
-from schemas.diver import DiverCreate, DiverOut
-from dependencies import get_db
+from schemas.diver import DiverCreate, DiverOut, DiverPage
+from schemas.reading import ReadingBucket, ReadingOut
+from managers.async_diver_manager import AsyncDiverManager, MAX_PAGE_SIZE
+from managers.reading_manager import ReadingManager, MAX_BUCKETS
+from async_database import AsyncSessionLocal
+from dependencies import get_async_db
+from state_cache import state_cache
 
 router = APIRouter()
 
+EXPORT_COLUMNS = list(DiverCreate.model_fields)  # Exported files can be imported again as they are
+MAX_REPORTED_ERRORS = 50  # Invalid rows listed in a rejected import
+
+def _parse_divers(text: str, csv_format: bool):
+    """
+    Parses and validates an import file.
+
+    Returns:
+        tuple: (list of DiverCreate, list of {"line", "errors"} for invalid rows)
+    """
+    if csv_format:
+        # Empty CSV cells mean "no value" (e.g. no group)
+        records = ({k: (v if v != "" else None) for k, v in row.items()} for row in csv.DictReader(io.StringIO(text)))
+        first_line = 2  # Line 1 is the header
+    else:
+        records = (line for line in text.splitlines())
+        first_line = 1
+
+    divers, errors = [], []
+    for line, record in enumerate(records, start=first_line):
+        try:
+            if csv_format:
+                divers.append(DiverCreate.model_validate(record))
+            elif record.strip():
+                divers.append(DiverCreate.model_validate_json(record))
+        except ValidationError as e:
+            errors.append({"line": line, "errors": e.errors(include_url=False, include_input=False)})
+    return divers, errors
+
+# Lists divers in id order, one page at a time. Pass the returned next_cursor as `after` for the next page
+@router.get("/", response_model=DiverPage)
+async def list_divers(after: Optional[str] = None, limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+                      status: Optional[str] = None, group_id: Optional[int] = None,
+                      min_bpm: Optional[int] = None, max_bpm: Optional[int] = None,
+                      min_depth: Optional[float] = None, max_depth: Optional[float] = None,
+                      db: AsyncSession = Depends(get_async_db)):
+    manager = AsyncDiverManager(db)
+    divers, next_cursor = await manager.list_divers(after, limit, status, group_id,
+                                                    min_bpm, max_bpm, min_depth, max_depth)
+    return DiverPage(items=divers, next_cursor=next_cursor)
+
+# Streams every diver as JSON Lines (default) or CSV, without loading the table into memory
+@router.get("/export")
+async def export_divers(file_format: str = Query("jsonl", alias="format", pattern="^(jsonl|csv)$")):
+    async def content():
+        # Own session: the stream outlives the request handler and its dependencies
+        async with AsyncSessionLocal() as db:
+            if file_format == "csv":
+                yield ",".join(EXPORT_COLUMNS) + "\n"
+            async for rows in AsyncDiverManager(db).stream_divers(EXPORT_COLUMNS):
+                if file_format == "csv":
+                    buffer = io.StringIO()
+                    csv.writer(buffer, lineterminator="\n").writerows(rows)
+                    yield buffer.getvalue()
+                else:
+                    yield "".join(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in rows)
+
+    media_type = "text/csv" if file_format == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f"attachment; filename=divers.{file_format}"}
+    return StreamingResponse(content(), media_type=media_type, headers=headers)
+
 @router.get("/{diver_id}", response_model=DiverOut)
-def get_diver(diver_id: str, db: Session = Depends(get_db)):
-    diver = db.query(DiverModel).filter(DiverModel.id == diver_id).first()
-    if not diver:
-        raise HTTPException(status_code=404, detail="Diver not found")
-    return diver
+async def get_diver(diver_id: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    async def build():
+        diver = await AsyncDiverManager(db).get_diver_by_id(diver_id)
+        if not diver:
+            raise HTTPException(status_code=404, detail="Diver not found")
+        return DiverOut.model_validate(diver).model_dump_json().encode()
+    return await state_cache.respond_async(request, ("diver", diver_id), build)
+
+def _reading_range(start: Optional[float], end: Optional[float]):
+    """Defaults to the last hour; times are Unix seconds."""
+    end = time.time() if end is None else end
+    start = end - 3600 if start is None else start
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return start, end
+
+# Reading history of a diver, downsampled to min/max/avg per bucket (kept after the diver is deleted)
+@router.get("/{diver_id}/readings", response_model=List[ReadingBucket])
+async def get_diver_readings(diver_id: str, start: Optional[float] = None, end: Optional[float] = None,
+                             bucket: int = Query(60, ge=1, description="Bucket size in seconds"),
+                             db: AsyncSession = Depends(get_async_db)):
+    start, end = _reading_range(start, end)
+    if (end - start) / bucket > MAX_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"Range too large for bucket size; at most {MAX_BUCKETS} buckets")
+    # ReadingManager is shared with the acoustic server, so it runs on the sync facade of the session
+    return await db.run_sync(lambda session: ReadingManager(session).get_buckets(diver_id, start, end, bucket))
+
+@router.get("/{diver_id}/readings/raw", response_model=List[ReadingOut])
+async def get_diver_raw_readings(diver_id: str, start: Optional[float] = None, end: Optional[float] = None,
+                                 limit: int = Query(1000, ge=1, le=10000), db: AsyncSession = Depends(get_async_db)):
+    start, end = _reading_range(start, end)
+    return await db.run_sync(lambda session: ReadingManager(session).get_raw_readings(diver_id, start, end, limit))
 
 # This endpoint is used by the acoustic server - DO NOT MODIFY
 @router.post("/", response_model=DiverOut)
-def create_diver(diver: DiverCreate, db: Session = Depends(get_db)):
+async def create_diver(diver: DiverCreate, db: AsyncSession = Depends(get_async_db)):
     new_diver = DiverModel(**diver.dict())
     db.add(new_diver)
-    db.commit()
-    db.refresh(new_diver)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        # Slots are unique (protocol v2); anything else fails as it always did
+        if diver.slot is not None and await AsyncDiverManager(db).get_diver_by_slot(diver.slot):
+            raise HTTPException(status_code=400, detail=f"Slot {diver.slot} is already assigned to another diver")
+        raise
+    await db.refresh(new_diver)
+    state_cache.invalidate_diver(new_diver.id, new_diver.group_id)
     return new_diver
 
 # New endpoint specifically for web form submissions
 @router.post("/web", response_model=DiverOut)
-def create_diver_web(diver: DiverCreate, db: Session = Depends(get_db)):
+async def create_diver_web(diver: DiverCreate, db: AsyncSession = Depends(get_async_db)):
     # Check if diver with this ID already exists
-    existing_diver = db.query(DiverModel).filter(DiverModel.id == diver.id).first()
+    existing_diver = await AsyncDiverManager(db).get_diver_by_id(diver.id)
     if existing_diver:
         raise HTTPException(status_code=400, detail=f"Diver with ID '{diver.id}' already exists")
+    if diver.slot is not None and await AsyncDiverManager(db).get_diver_by_slot(diver.slot):
+        raise HTTPException(status_code=400, detail=f"Slot {diver.slot} is already assigned to another diver")
     
     # Create new diver with group_id
     new_diver = DiverModel(
@@ -41,18 +153,59 @@ def create_diver_web(diver: DiverCreate, db: Session = Depends(get_db)):
         entry_point=diver.entry_point,
         current_depth=diver.current_depth,
         status=diver.status,
-        group_id=diver.group_id
+        group_id=diver.group_id,
+        slot=diver.slot
     )
     db.add(new_diver)
-    db.commit()
-    db.refresh(new_diver)
+    await db.commit()
+    await db.refresh(new_diver)
+    state_cache.invalidate_diver(new_diver.id, new_diver.group_id)
     return new_diver
 
+# Imports many divers at once from JSON Lines or CSV (Content-Type: text/csv). All rows are
+# validated first and inserted in one transaction: either every new diver is imported or none
+@router.post("/bulk")
+async def import_divers(request: Request, skip_existing: bool = False, db: AsyncSession = Depends(get_async_db)):
+    content_type = request.headers.get("content-type", "")
+    text = (await request.body()).decode("utf-8-sig")  # Tolerate a BOM from spreadsheet exports
+    divers, errors = _parse_divers(text, csv_format="csv" in content_type)
+    if errors:
+        raise HTTPException(status_code=422, detail={"message": f"{len(errors)} invalid rows; nothing was imported",
+                                                     "errors": errors[:MAX_REPORTED_ERRORS]})
+
+    repeated = [diver_id for diver_id, count in Counter(d.id for d in divers).items() if count > 1]
+    if repeated:
+        raise HTTPException(status_code=400, detail={"message": "Diver IDs repeated in the file", "ids": repeated})
+    repeated_slots = [slot for slot, count in Counter(d.slot for d in divers if d.slot is not None).items()
+                      if count > 1]
+    if repeated_slots:
+        raise HTTPException(status_code=400, detail={"message": "Slots repeated in the file", "slots": repeated_slots})
+
+    manager = AsyncDiverManager(db)
+    existing = await manager.get_existing_ids(d.id for d in divers)
+    if existing and not skip_existing:
+        raise HTTPException(status_code=400, detail={"message": "Divers already exist; nothing was imported",
+                                                     "ids": sorted(existing)})
+    new_divers = [d for d in divers if d.id not in existing]
+    taken = await manager.get_existing_slots(d.slot for d in new_divers)
+    if taken:
+        raise HTTPException(status_code=400, detail={"message": "Slots already assigned; nothing was imported",
+                                                     "slots": sorted(taken)})
+    try:
+        await manager.add_divers(new_divers)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Divers were added concurrently; nothing was imported")
+    state_cache.invalidate_all()
+    return {"imported": len(new_divers), "skipped": len(existing)}
+
 @router.delete("/{diver_id}")
-def delete_diver(diver_id: str, db: Session = Depends(get_db)):
-    diver = db.query(DiverModel).filter(DiverModel.id == diver_id).first()
+async def delete_diver(diver_id: str, db: AsyncSession = Depends(get_async_db)):
+    manager = AsyncDiverManager(db)
+    diver = await manager.get_diver_by_id(diver_id)
     if not diver:
         raise HTTPException(status_code=404, detail="Diver not found")
-    db.delete(diver)
-    db.commit()
+    group_id = diver.group_id
+    await manager.delete_diver(diver)
+    state_cache.invalidate_diver(diver_id, group_id)
     return {"message": f"Diver {diver_id} deleted successfully"}
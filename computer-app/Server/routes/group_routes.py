@@ -1,26 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
-from typing import List
-from managers.group_manager import GroupManager
-from schemas.group import GroupCreate, GroupOut
-from models.group import Group as GroupModel
-from dependencies import get_db
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Union
+from managers.async_group_manager import AsyncGroupManager
+from schemas.group import GroupCreate, GroupOut, GroupSummary
+from dependencies import get_async_db
+from state_cache import state_cache
 
 router = APIRouter()
+group_list_adapter = TypeAdapter(List[GroupOut])
+group_summary_adapter = TypeAdapter(List[GroupSummary])
 
-@router.get("/", response_model=List[GroupOut])
-def get_groups(db: Session = Depends(get_db)):
-    manager = GroupManager(db)
-    return manager.get_all_groups()
+# ?summary=true returns each group with diver counts per status instead of the full diver list
+@router.get("/", response_model=Union[List[GroupOut], List[GroupSummary]])
+async def get_groups(request: Request, summary: bool = False, db: AsyncSession = Depends(get_async_db)):
+    async def build():
+        manager = AsyncGroupManager(db)
+        if summary:
+            return group_summary_adapter.dump_json(group_summary_adapter.validate_python(await manager.get_group_summaries()))
+        return group_list_adapter.dump_json([GroupOut.model_validate(g) for g in await manager.get_all_groups()])
+    return await state_cache.respond_async(request, ("groups", summary), build)
 
 @router.post("/", response_model=GroupOut)
-def add_group(group: GroupCreate, db: Session = Depends(get_db)):
-    manager = GroupManager(db)
-    return manager.add_group(group)
+async def add_group(group: GroupCreate, db: AsyncSession = Depends(get_async_db)):
+    manager = AsyncGroupManager(db)
+    new_group = await manager.add_group(group)
+    state_cache.invalidate(("groups", False), ("groups", True))
+    return new_group
 
 @router.get("/{group_id}", response_model=GroupOut)
-def get_group_by_id(group_id: int, db: Session = Depends(get_db)):
-    group = db.query(GroupModel).options(joinedload(GroupModel.divers)).filter(GroupModel.id == group_id).first()
-    if group is None:
-        raise HTTPException(status_code=404, detail="Group not found")
-    return group
+async def get_group_by_id(group_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
+    async def build():
+        group = await AsyncGroupManager(db).get_group_by_id(group_id)
+        if group is None:
+            raise HTTPException(status_code=404, detail="Group not found")
+        return GroupOut.model_validate(group).model_dump_json().encode()
+    return await state_cache.respond_async(request, ("group", group_id), build)
@@ -0,0 +1,51 @@
+import asyncio
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from live.hub import hub
+from live.watcher import watcher
+
+router = APIRouter()
+
+SSE_KEEPALIVE = 15.0  # Seconds between keep-alive comments on an idle event stream
+
+# Live status of a group's divers. The first message is a snapshot of the group,
+# then only changes are pushed: {"type": "update", "diver_id", "changes": {bpm/status/current_depth}},
+# "added" and "removed". A client that falls too far behind is disconnected and should reconnect.
+@router.websocket("/ws/groups/{group_id}")
+async def group_status_socket(websocket: WebSocket, group_id: int):
+    await websocket.accept()
+    subscription = hub.subscribe(group_id)
+    try:
+        await websocket.send_text(await watcher.snapshot(group_id))
+        while True:
+            event = await subscription.events.get()
+            if event is None:
+                await websocket.close(code=1013)  # Try again later
+                return
+            await websocket.send_text(event)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.unsubscribe(subscription)
+
+# Same stream as Server-Sent Events, for clients that cannot use WebSockets
+@router.get("/groups/{group_id}/events")
+async def group_status_events(group_id: int):
+    subscription = hub.subscribe(group_id)
+
+    async def stream():
+        try:
+            yield f"data: {await watcher.snapshot(group_id)}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.events.get(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    return
+                yield f"data: {event}\n\n"
+        finally:
+            hub.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
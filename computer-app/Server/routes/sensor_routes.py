@@ -1,11 +1,20 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Request
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from managers.sensor_manager import SensorManager
 from models.sensor import Sensor
+from dependencies import get_async_db
+from state_cache import state_cache
 
 router = APIRouter()
-sensor_manager = SensorManager()
+sensor_list_adapter = TypeAdapter(List[Sensor])
 
-@router.get("/", response_model=List[Sensor])
-def get_sensors():
-    return sensor_manager.get_all_sensors()
\ No newline at end of file
+# Live readings of every diver, for monitoring screens that poll every second.
+# Send the last ETag in If-None-Match: the response is a bodyless 304 until a diver changes
+@router.get("", response_model=List[Sensor])
+async def get_sensors(request: Request, db: AsyncSession = Depends(get_async_db)):
+    async def build():
+        sensors = await db.run_sync(lambda session: SensorManager(session).get_all_sensors())
+        return sensor_list_adapter.dump_json(sensor_list_adapter.validate_python(sensors))
+    return await state_cache.respond_async(request, ("sensors",), build)
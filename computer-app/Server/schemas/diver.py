@@ -1,4 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from acoustic.protocol_v2 import MAX_SLOT
 
 class DiverBase(BaseModel):
     id: str
@@ -13,15 +15,27 @@ class DiverBase(BaseModel):
 
 class DiverCreate(DiverBase):
     group_id: int | None = None
+    slot: int | None = Field(None, ge=0, le=MAX_SLOT)  # Protocol v2 slot of the diver's watch
 
 class DiverOut(DiverBase):
     group_id: int | None = None
+    slot: int | None = None
 
     class Config:
         from_attributes = True  # New pydantic v2 attribute instead of orm_mode
 
 class Diver(DiverBase):
     group_id: int | None = None
+    slot: int | None = None
 
     class Config:
-        from_attributes = True  # Updated to new pydantic v2 attribute
\ No newline at end of file
+        from_attributes = True  # Updated to new pydantic v2 attribute
+
+
+class DiverPage(BaseModel):
+    """
+    One page of a diver listing. Pass next_cursor as `after` to get the
+    next page; it is None on the last page.
+    """
+    items: List[DiverOut]
+    next_cursor: Optional[str] = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 from .diver import DiverOut
 
 class GroupBase(BaseModel):
@@ -19,3 +19,9 @@ class GroupOut(GroupBase):
     model_config = {
         "from_attributes": True
     }
+
+class GroupSummary(GroupBase):
+    """Group without its divers, for listings: only how many divers it has per status."""
+    id: int
+    diver_count: int = 0
+    status_counts: Dict[str, int] = {}
@@ -0,0 +1,27 @@
+from pydantic import BaseModel
+from typing import Optional
+
+
+class ReadingOut(BaseModel):
+    timestamp: float
+    bpm: Optional[int] = None
+    depth: Optional[float] = None
+
+    model_config = {
+        "from_attributes": True
+    }
+
+
+class ReadingBucket(BaseModel):
+    """
+    Readings of one diver downsampled to a time bucket. Buckets without any
+    reading are omitted.
+    """
+    start: int  # Unix time of the start of the bucket
+    count: int
+    bpm_min: Optional[int] = None
+    bpm_max: Optional[int] = None
+    bpm_avg: Optional[float] = None
+    depth_min: Optional[float] = None
+    depth_max: Optional[float] = None
+    depth_avg: Optional[float] = None
@@ -1,20 +1,31 @@
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import BackgroundTasks
-import smtplib
-from email.mime.text import MIMEText
 
-from managers.sensor_manager import SensorManager
-from models.sensor import Sensor
 from routes.diver_routes import router as diver_router
 from routes.group_routes import router as group_router
 from routes.contact_routes import router as contact_router
-from database import Base, engine
-
-# Create database tables if they don't exist
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI()
+from routes.live_routes import router as live_router
+from routes.sensor_routes import router as sensor_router
+from database import ensure_schema
+from live.hub import hub
+from live.watcher import watcher
+from metrics import CONTENT_TYPE, REGISTRY, Gauge, RequestMetricsMiddleware
+
+LIVE_CLIENTS = Gauge("aquasafe_live_clients", "Dashboards connected to the live status stream")
+LIVE_CLIENTS.set_function(hub.client_count)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Schema creation is migrate.py's job; startup only checks the version (one PRAGMA)
+    ensure_schema()
+    # Follows the acoustic server's event bus for the live stream and the response cache
+    watcher.start()
+    yield
+    await watcher.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow CORS for React frontend
 app.add_middleware(
@@ -24,13 +35,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-# Routes for sensors (not yet migrated to database, work in progress)
-sensor_manager = SensorManager(None)
-
-@app.get("/sensors", response_model=list[Sensor])
-def get_sensors():
-    return sensor_manager.get_all_sensors()
+app.add_middleware(RequestMetricsMiddleware)  # Latency histogram per route, served at /metrics
 
 @app.get("/")
 def read_root():
@@ -40,10 +45,17 @@ def read_root():
 def get_status():
     return {"status": "Server is running"}
 
+# Prometheus scrape endpoint
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 # Connect divers and groups routes
 app.include_router(diver_router, prefix="/divers")
 app.include_router(group_router, prefix="/groups")
+app.include_router(sensor_router, prefix="/sensors")
 app.include_router(contact_router)
+app.include_router(live_router)
 
 # main block
 if __name__ == "__main__":
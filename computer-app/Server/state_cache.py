@@ -0,0 +1,165 @@
+"""
+Process-wide cache of serialized diver and group responses for the hot
+read endpoints.
+
+Entries hold the response body already serialized to JSON plus an ETag
+(a hash of the body), so a hit costs neither a query nor Pydantic
+serialization, and clients that send If-None-Match get a 304.
+
+Coherence:
+    - API write paths invalidate the entries they affect.
+    - The acoustic server's readings and alerts arrive over the event bus
+      (live/watcher.py), which invalidates the entries of that diver and
+      its group right away, and again once the acoustic server has
+      written the reading behind (settle seconds later).
+    - While the event bus is down, and for a while after it reports
+      missed records, writes from other processes are caught by SQLite's
+      data_version instead. It changes whenever another connection
+      commits: the whole cache is dropped on the next read after such a
+      commit.
+"""
+import hashlib
+import threading
+import time
+from collections import deque
+
+from fastapi import Request, Response
+
+from database import engine
+
+
+def _etag(body):
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+class StateCache:
+    def __init__(self, db_engine):
+        self.engine = db_engine
+        self._entries = {}  # key -> (body, etag)
+        self._lock = threading.Lock()
+        self._connection = None  # Dedicated connection: data_version is tracked per connection
+        self._data_version = None
+        self._generation = 0  # Bumped on every invalidation, so a build that raced a write is not stored
+        self._bus = None  # Event bus subscriber; data_version is only checked while it is not connected
+        self._follow_commits_until = 0.0  # Monotonic time until which data_version is checked anyway
+        self._settling = deque()  # (monotonic deadline, keys) to invalidate again once the database has caught up
+
+        self.hits = 0
+        self.misses = 0
+
+    def _check_data_version(self):
+        """Drops every entry if another connection committed since the last check. Caller holds the lock."""
+        if self._connection is None:
+            self._connection = self.engine.raw_connection()
+        cursor = self._connection.cursor()
+        try:
+            cursor.execute("PRAGMA data_version")
+            version = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+        if version != self._data_version:
+            self._data_version = version
+            self._entries.clear()
+            self._generation += 1
+
+    def _settle(self, now):
+        """Invalidates keys whose pending database write is due. Caller holds the lock."""
+        while self._settling and self._settling[0][0] <= now:
+            for key in self._settling.popleft()[1]:
+                self._entries.pop(key, None)
+            self._generation += 1
+
+    def _lookup(self, key):
+        now = time.monotonic()
+        with self._lock:
+            self._settle(now)
+            if self._bus is None or not self._bus.connected or now < self._follow_commits_until:
+                self._check_data_version()
+            return self._entries.get(key), self._generation
+
+    def _store(self, key, body, generation):
+        entry = (body, _etag(body))
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = entry
+        return entry
+
+    def get(self, key, build):
+        """
+        Returns (body, etag) for a key, calling build() to produce the JSON
+        body (bytes) on a miss. Exceptions from build() (e.g. a 404) are not
+        cached.
+        """
+        entry, generation = self._lookup(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return self._store(key, build(), generation)
+
+    async def get_async(self, key, build):
+        """Same as get(), for an async build() coroutine function."""
+        entry, generation = self._lookup(key) # Only a PRAGMA; cheap enough to run on the event loop
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return self._store(key, await build(), generation)
+
+    @staticmethod
+    def _response(request, body, etag):
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}  # Clients must revalidate, which is cheap
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def respond(self, request: Request, key, build):
+        """Serves a cached entry as a JSON response, or a 304 if the client already has it."""
+        return self._response(request, *self.get(key, build))
+
+    async def respond_async(self, request: Request, key, build):
+        """Same as respond(), for an async build() coroutine function."""
+        return self._response(request, *await self.get_async(key, build))
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            self._generation += 1
+
+    def invalidate_all(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def invalidate_diver(self, diver_id, group_id=None, settle=0.0):
+        """
+        Invalidates a diver and every group and sensor response that embeds it.
+
+        Args:
+            settle (float): Seconds until the change is in the database (the acoustic server writes
+                behind); the same entries are invalidated again then.
+        """
+        keys = (("diver", diver_id), ("groups", False), ("groups", True), ("group", group_id), ("sensors",))
+        self.invalidate(*keys)
+        if settle:
+            with self._lock:
+                self._settling.append((time.monotonic() + settle, keys))
+
+    def follow_event_bus(self, subscriber):
+        """Stops checking data_version on every read while `subscriber` (an EventSubscriber) is connected."""
+        self._bus = subscriber
+
+    def resync(self, settle):
+        """
+        Drops every entry after the event bus missed records, and checks
+        data_version for `settle` seconds, until the acoustic server has
+        written what was missed.
+        """
+        with self._lock:
+            self._follow_commits_until = time.monotonic() + settle
+            self._entries.clear()
+            self._generation += 1
+
+
+state_cache = StateCache(engine)
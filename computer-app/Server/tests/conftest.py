@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """A fresh divers.db with the current schema; the working directory is its folder, as for the servers."""
+    from database import create_schema, create_sqlite_engine
+
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "divers.db")
+    engine = create_sqlite_engine(f"sqlite:///{path}", "default")
+    create_schema(engine)
+    engine.dispose()
+    return path
+
+
+@pytest.fixture
+def client(db_path):
+    """TestClient for the API app, with its async sessions bound to db_path."""
+    from fastapi.testclient import TestClient
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import NullPool
+
+    from dependencies import get_async_db
+    from server import app
+
+    # No pooling: TestClient may serve requests from different event loops
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+
+    async def get_test_db():
+        async with sessions() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = get_test_db
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(get_async_db, None)
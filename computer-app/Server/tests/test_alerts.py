@@ -0,0 +1,61 @@
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+from acoustic.alerts import LOST_AFTER, AlertEngine
+from database import create_sqlite_engine
+from models.alert_rule import AlertRule
+from models.diver import Diver as DiverModel
+
+DIVER = {"id": "ab", "name": "Diver", "age": 30, "weight": 75.0, "contact_info": "-", "bpm": 80,
+         "entry_point": "north", "current_depth": 5.0, "status": "normal", "group_id": None}
+
+
+@pytest.fixture
+def engine(db_path):
+    """An AlertEngine over one diver with warning at 120 and critical at 150 BPM, on a stream clock at 0."""
+    db_engine = create_sqlite_engine(f"sqlite:///{db_path}", "default")
+    with db_engine.begin() as connection:
+        connection.execute(insert(DiverModel), [DIVER])
+        connection.execute(insert(AlertRule), [{"warning_bpm": 120, "critical_bpm": 150}])
+    yield AlertEngine(sessionmaker(bind=db_engine), clock=lambda: 0.0)
+    db_engine.dispose()
+
+
+def drain(engine):
+    alerts = []
+    while not engine.alerts.empty():
+        alerts.append(engine.alerts.get_nowait())
+    return [(alert.kind, alert.previous_status, alert.status) for alert in alerts]
+
+
+def test_status_falls_only_below_the_hysteresis_margin(engine):
+    assert engine.evaluate("ab", 100, 0.0) == "normal"
+    assert engine.evaluate("ab", 125, 10.0) == "warning"
+    assert engine.evaluate("ab", 117, 20.0) == "warning"  # Within 5 BPM of the limit
+    assert engine.evaluate("ab", 114, 30.0) == "normal"
+    assert engine.evaluate("ab", 155, 40.0) == "critical"
+    assert engine.evaluate("ab", 146, 50.0) == "critical"
+    assert engine.evaluate("ab", 144, 60.0) == "warning"
+
+    assert drain(engine) == [("status", "normal", "warning"), ("status", "warning", "normal"),
+                             ("status", "normal", "critical"), ("status", "critical", "warning")]
+
+
+def test_fast_bpm_change_raises_a_warning(engine):
+    engine.evaluate("ab", 80, 0.0)
+    assert engine.evaluate("ab", 110, 1.0) == "warning"
+    assert engine.alerts.get_nowait().reasons == ["bpm changing +30.0/s"]
+
+
+def test_lost_deadline_follows_the_reading_times(engine):
+    engine.evaluate("ab", 80, 100.0)
+    engine.evaluate("ab", 80, 130.0)  # Heard again: the deadline moves
+
+    assert engine.tick(100.0 + LOST_AFTER) == []
+    lost = engine.tick(130.0 + LOST_AFTER)
+    assert [(alert.kind, alert.status) for alert in lost] == [("lost", "critical")]
+    assert engine.tick(1000.0) == []  # Reported once
+
+    assert engine.evaluate("ab", 80, 1000.0) == "normal"
+    assert drain(engine) == [("lost", "normal", "critical"), ("found", "critical", "normal")]
@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy import insert
+
+from database import create_sqlite_engine
+from models.diver import Diver as DiverModel
+from models.group import Group as GroupModel
+
+DIVERS = [
+    {"id": f"d{i:02d}", "name": f"Diver {i}", "age": 30, "weight": 75.0, "contact_info": "-",
+     "bpm": 60 + 10 * i, "entry_point": "north", "current_depth": float(5 * i),
+     "status": "warning" if 60 + 10 * i > 120 else "normal", "group_id": i % 2 + 1}
+    for i in range(10)
+]
+
+
+@pytest.fixture
+def divers(db_path):
+    engine = create_sqlite_engine(f"sqlite:///{db_path}", "default")
+    with engine.begin() as connection:
+        connection.execute(insert(GroupModel), [{"id": 1, "name": "a"}, {"id": 2, "name": "b"}])
+        connection.execute(insert(DiverModel), DIVERS)
+    engine.dispose()
+    return DIVERS
+
+
+def listed_ids(client, **params):
+    response = client.get("/divers/", params=params)
+    assert response.status_code == 200, response.text
+    return [diver["id"] for diver in response.json()["items"]]
+
+
+def test_list_without_filters(client, divers):
+    assert listed_ids(client) == [d["id"] for d in divers]
+
+
+@pytest.mark.parametrize("name, value, keep", [
+    ("after", "d04", lambda d: d["id"] > "d04"),
+    ("status", "warning", lambda d: d["status"] == "warning"),
+    ("group_id", 2, lambda d: d["group_id"] == 2),
+    ("min_bpm", 100, lambda d: d["bpm"] >= 100),
+    ("max_bpm", 100, lambda d: d["bpm"] <= 100),
+    ("min_depth", 20.0, lambda d: d["current_depth"] >= 20.0),
+    ("max_depth", 20.0, lambda d: d["current_depth"] <= 20.0),
+])
+def test_list_with_one_filter(client, divers, name, value, keep):
+    assert listed_ids(client, **{name: value}) == [d["id"] for d in divers if keep(d)]
+
+
+def test_list_pages(client, divers):
+    first = client.get("/divers/", params={"limit": 4}).json()
+    second = client.get("/divers/", params={"limit": 4, "after": first["next_cursor"]}).json()
+    assert [d["id"] for d in first["items"] + second["items"]] == [d["id"] for d in divers[:8]]
+
+
+def test_group_summaries(client, divers):
+    response = client.get("/groups/", params={"summary": "true"})
+    assert response.status_code == 200
+    assert [(g["id"], g["diver_count"]) for g in response.json()] == [(1, 5), (2, 5)]
@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+
+import pytest
+
+from state_cache import state_cache
+
+DIVER = {"id": "ab", "name": "Diver", "age": 30, "weight": 75.0, "contact_info": "-", "bpm": 80,
+         "entry_point": "north", "current_depth": 0.0, "status": "normal", "group_id": 1}
+
+
+@pytest.fixture
+def cache():
+    """The response cache, as while the event bus is connected: only explicit invalidations drop entries."""
+    state_cache.invalidate_all()
+    state_cache.follow_event_bus(SimpleNamespace(connected=True))
+    try:
+        yield state_cache
+    finally:
+        state_cache.follow_event_bus(None)
+        state_cache.invalidate_all()
+
+
+def test_create_diver_invalidates_cached_group(client, cache):
+    assert client.post("/groups/", json={"name": "a"}).status_code == 200
+    assert client.get("/groups/1").json()["divers"] == []
+
+    response = client.post("/divers/", json=DIVER)
+    assert response.status_code == 200, response.text
+    assert [diver["id"] for diver in client.get("/groups/1").json()["divers"]] == ["ab"]
+
+
+def test_create_diver_rejects_taken_slot(client):
+    assert client.post("/divers/", json={**DIVER, "group_id": None, "slot": 7}).status_code == 200
+
+    response = client.post("/divers/", json={**DIVER, "id": "cd", "group_id": None, "slot": 7})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Slot 7 is already assigned to another diver"
@@ -0,0 +1,101 @@
+import asyncio
+import socket
+import time
+
+from acoustic.alerts import Alert
+from events import records
+from events.publisher import EventPublisher
+from events.subscriber import EventSubscriber
+
+
+def payload(frame):
+    size, = records.FRAME.unpack_from(frame)
+    assert size == len(frame) - records.FRAME.size
+    return frame[records.FRAME.size:]
+
+
+def test_reading_round_trip():
+    event = records.decode(payload(records.encode_reading(7, 1700000000.5, "li", 95, "warning")))
+    assert event.to_dict() == {"seq": 7, "timestamp": 1700000000.5, "type": records.READING, "diver_id": "li",
+                               "bpm": 95, "status": "warning", "kind": None, "previous_status": None,
+                               "group_id": None}
+
+
+def test_alert_round_trip():
+    alert = Alert("ab", 3, "lost", "critical", "normal", 120, ["no signal for 60 s"], 1700000000.0)
+    event = records.decode(payload(records.encode_alert(8, alert)))
+    assert (event.seq, event.type, event.diver_id, event.kind, event.status, event.previous_status, event.bpm,
+            event.group_id) == (8, records.ALERT, "ab", "lost", "critical", "normal", 120, 3)
+
+    alert = Alert("ab", None, "found", "normal", "critical", None, [], 1700000000.0)
+    event = records.decode(payload(records.encode_alert(9, alert)))
+    assert event.bpm is None and event.group_id is None  # Sent as NO_BPM and NO_GROUP
+
+
+def free_address():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return f"127.0.0.1:{probe.getsockname()[1]}"
+
+
+async def until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_resume_and_epoch_change():
+    address = free_address()
+
+    async def scenario():
+        received, resyncs = [], []
+
+        async def on_resync():
+            resyncs.append(subscriber.epoch)
+
+        first = EventPublisher(address)
+        assert first.start()
+        subscriber = EventSubscriber(lambda event: received.append((event.seq, event.diver_id)), on_resync,
+                                     address=address)
+        subscriber.start()
+        await until(lambda: subscriber.connected)
+        assert resyncs == [first.epoch]  # Live only: nothing to resume on the first connection
+
+        first.publish_reading("a", 80, "normal")
+        first.publish_reading("b", 81, "normal")
+        await until(lambda: len(received) == 2)
+
+        # Records published while the subscriber is away are replayed from its next sequence number
+        await subscriber.stop()
+        first.publish_reading("c", 82, "normal")
+        first.publish_reading("d", 83, "normal")
+        subscriber.start()
+        await until(lambda: len(received) == 4)
+        assert received == [(1, "a"), (2, "b"), (3, "c"), (4, "d")]
+        assert resyncs == [first.epoch]
+
+        # A restarted publisher has a new epoch: its sequence numbers cannot resume the old run
+        first.close()
+        second = EventPublisher(address)
+        assert second.start()
+        await until(lambda: len(resyncs) == 2)
+        assert resyncs[1] == second.epoch != first.epoch
+        second.publish_reading("e", 84, "normal")
+        await until(lambda: len(received) == 5)
+        assert received[-1] == (1, "e")
+
+        # Epoch 0 means the current run: a new subscriber can replay it from a sequence number
+        second.publish_reading("f", 85, "normal")
+        replayed = []
+        replay = EventSubscriber(lambda event: replayed.append((event.seq, event.diver_id)), address=address,
+                                 from_seq=2)
+        replay.start()
+        await until(lambda: len(replayed) == 1)
+        assert replayed == [(2, "f")]
+
+        await replay.stop()
+        await subscriber.stop()
+        second.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,102 @@
+from acoustic.detector import SymbolDetection, ToneDetection
+from acoustic.framing import ARMED, AWAITING_END, IDLE, RECEIVING, MessageFramer, SymbolFramer
+from acoustic.protocol import CHAR_TO_FREQ, END_FREQ, START_FREQ
+
+QUIET = ToneDetection(None, 0.0, None, 0.0, None, None, 0.0)
+START = QUIET._replace(start_freq=START_FREQ, start_amp=1e4)
+END = QUIET._replace(end_freq=END_FREQ, end_amp=1e4)
+
+
+def char(c):
+    return QUIET._replace(char=c, char_freq=CHAR_TO_FREQ[c], char_amp=1e4)
+
+
+class Recorder:
+    """Drives a framer one window every 0.1 s and keeps what it emits."""
+
+    def __init__(self, framer_class, **options):
+        self.messages = []
+        self.framer = framer_class(lambda message, start, end: self.messages.append((message, start, end)),
+                                   **options)
+        self.now = 0.0
+
+    def feed(self, *windows):
+        for window in windows:
+            self.now = round(self.now + 0.1, 1)
+            self.framer.on_window(window, self.now)
+
+    def send(self, text):
+        """One window per character, each followed by the gap the watch leaves."""
+        for c in text:
+            self.feed(char(c), QUIET)
+
+
+def test_message_between_start_and_end_tones():
+    recorder = Recorder(MessageFramer, digit_wait_time=10.0)
+    recorder.feed(char("x"), QUIET)  # Nothing before a start tone counts
+    assert recorder.framer.state == IDLE
+
+    recorder.feed(START)
+    assert recorder.framer.state == ARMED
+    recorder.send("li")
+    assert recorder.framer.state == RECEIVING
+    recorder.send(",95")
+    assert recorder.framer.state == AWAITING_END
+
+    recorder.feed(END)
+    assert recorder.framer.state == IDLE
+    assert recorder.messages == [("li,95", 0.3, 1.4)]
+
+
+def test_missed_end_tone_is_ended_by_the_next_start_tone():
+    recorder = Recorder(MessageFramer, digit_wait_time=10.0)
+    recorder.feed(START)
+    recorder.send("li,95")
+    recorder.feed(START)  # The END tone was lost
+    recorder.send("ab,120")
+    recorder.framer.finish(recorder.now)
+
+    assert [message for message, _, _ in recorder.messages] == ["li,95", "ab,120"]
+
+
+def test_missed_end_tone_is_not_awaited_longer_than_digit_wait_time():
+    recorder = Recorder(MessageFramer, digit_wait_time=0.5)
+    recorder.feed(START)
+    recorder.send("li,95")
+    recorder.feed(QUIET, QUIET, QUIET)
+    assert recorder.messages == []
+    recorder.feed(QUIET, QUIET)
+
+    assert recorder.messages == [("li,95", 0.1, 1.5)]
+    assert recorder.framer.state == IDLE
+
+
+def test_end_tone_without_characters_resets():
+    recorder = Recorder(MessageFramer)
+    recorder.feed(START, QUIET, END)
+    assert recorder.framer.state == IDLE
+    recorder.send("li,95")
+    assert recorder.messages == []
+
+
+def test_silence_times_out_an_incomplete_message():
+    recorder = Recorder(MessageFramer, max_silent_time=1.0)
+    recorder.feed(START)
+    recorder.send("li")
+    recorder.framer.on_silence(recorder.now + 2.0)
+
+    assert recorder.framer.state == IDLE
+    assert recorder.messages == []
+
+
+def test_symbol_framer_restarts_at_a_sync_before_the_frame_is_complete():
+    recorder = Recorder(SymbolFramer)
+    sync = SymbolDetection(1e4, 0, 0.0, 0.0)
+    quiet = SymbolDetection(0.0, 0, 0.0, 0.0)
+    recorder.feed(sync, quiet, SymbolDetection(0.0, 3, 1e4, 0.0), quiet)
+    assert recorder.framer.state == RECEIVING
+
+    recorder.feed(sync)  # The rest of the frame was lost; this sync starts the next one
+    assert recorder.framer.state == ARMED
+    assert recorder.framer.symbols == [] and recorder.framer.start_time == recorder.now
+    assert recorder.messages == []
@@ -0,0 +1,65 @@
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from metrics import REQUEST_SECONDS, RequestMetricsMiddleware
+
+
+def route_labels(method):
+    return {values[1] for values in REQUEST_SECONDS._children if values[0] == method}
+
+
+def test_route_labels_are_full_templates():
+    divers, groups = APIRouter(), APIRouter()
+
+    @divers.get("/")
+    def list_divers():
+        return []
+
+    @divers.get("/{diver_id}")
+    def get_diver(diver_id: str):
+        return {}
+
+    @divers.post("/web")
+    def create_diver():
+        return {}
+
+    @groups.get("/")
+    def list_groups():
+        return []
+
+    @groups.get("/{group_id}")
+    def get_group(group_id: int):
+        return {}
+
+    app = FastAPI()
+    app.add_middleware(RequestMetricsMiddleware)
+
+    @app.get("/")
+    def root():
+        return {}
+
+    app.include_router(divers, prefix="/divers")
+    app.include_router(groups, prefix="/groups")
+
+    client = TestClient(app)
+    for path in ("/", "/divers/", "/divers/d1", "/divers/d2", "/groups/", "/groups/7", "/nowhere"):
+        client.get(path)
+    client.post("/divers/web")
+
+    assert {"/", "/divers/", "/divers/{diver_id}", "/groups/", "/groups/{group_id}", "unmatched"} <= route_labels("GET")
+    assert "/{diver_id}" not in route_labels("GET") and "/{group_id}" not in route_labels("GET")
+    assert "/divers/web" in route_labels("POST")
+
+
+def test_failing_request_is_recorded_as_500():
+    app = FastAPI()
+    app.add_middleware(RequestMetricsMiddleware)
+
+    @app.get("/boom")
+    def boom():
+        raise RuntimeError("boom")
+
+    response = TestClient(app, raise_server_exceptions=False).get("/boom")
+
+    assert response.status_code == 500
+    assert ("GET", "/boom", "500") in REQUEST_SECONDS._children
@@ -0,0 +1,64 @@
+import pytest
+
+from acoustic import protocol_v2
+from acoustic.detector import SymbolDetection
+from acoustic.framing import SymbolFramer
+
+
+def test_crc8_known_answers():
+    # Standard check input; the value is the bit-by-bit result for polynomial 0x07, initial value 0xFF
+    assert protocol_v2.crc8(b"123456789") == 0xFB
+    assert protocol_v2.crc8((12, 95)) == 0xB1
+
+
+def test_frame_round_trip():
+    symbols = protocol_v2.encode_frame(12, 95)
+    assert symbols == [0x0, 0xC, 0x5, 0xF, 0xB, 0x1]  # Slot, BPM and CRC bytes, high nibble first
+    assert protocol_v2.decode_frame(symbols) == (12, 95)
+
+
+def test_every_single_symbol_error_is_rejected():
+    symbols = protocol_v2.encode_frame(12, 95)
+    for position in range(protocol_v2.FRAME_SYMBOLS):
+        for value in range(protocol_v2.SYMBOLS):
+            if value != symbols[position]:
+                corrupted = symbols[:position] + [value] + symbols[position + 1:]
+                assert protocol_v2.decode_frame(corrupted) is None, (position, value)
+
+
+def test_out_of_range_readings_cannot_be_encoded():
+    with pytest.raises(ValueError):
+        protocol_v2.encode_frame(protocol_v2.MAX_SLOT + 1, 95)
+    with pytest.raises(ValueError):
+        protocol_v2.encode_frame(1, 256)
+
+
+@pytest.mark.parametrize("message, parsed", [
+    ("#12,95", (12, 95)),
+    ("#0,180", (0, 180)),
+    ("#256,95", None),  # Beyond MAX_SLOT
+    ("12,95", None),  # A v1 message
+    ("#ab,95", None),
+    ("#12,", None),
+])
+def test_parse_message(message, parsed):
+    assert protocol_v2.parse_message(message) == parsed
+
+
+def framed(symbols):
+    """Messages a SymbolFramer emits for a sync followed by these symbols."""
+    messages = []
+    framer = SymbolFramer(lambda message, start, end: messages.append(message))
+    quiet = SymbolDetection(0.0, 0, 0.0, 0.0)
+    windows = [SymbolDetection(1e4, 0, 0.0, 0.0), quiet]
+    for symbol in symbols:
+        windows += [SymbolDetection(0.0, symbol, 1e4, 0.0), quiet]
+    for i, window in enumerate(windows):
+        framer.on_window(window, 0.05 * (i + 1))
+    return messages
+
+
+def test_framer_drops_a_corrupted_symbol():
+    symbols = protocol_v2.encode_frame(12, 95)
+    assert framed(symbols) == ["#12,95"]
+    assert framed(symbols[:3] + [symbols[3] ^ 0x4] + symbols[4:]) == []
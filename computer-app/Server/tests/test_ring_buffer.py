@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from acoustic.ring_buffer import AudioRingBuffer, hop_size_for
+
+
+def test_windows_are_contiguous_across_the_wrap():
+    ring = AudioRingBuffer(window_size=4, overlap=0.5, capacity=8)
+    stream = np.arange(1, 31, dtype=np.int16)
+    windows = []
+    for start in range(0, len(stream), 5):  # Chunks that do not line up with the capacity
+        ring.write(stream[start:start + 5])
+        windows += [window.tolist() for window in ring.windows()]
+
+    assert windows == [stream[i:i + 4].tolist() for i in range(0, len(stream) - 3, 2)]
+    assert ring.dropped == 0
+    assert ring.pending().tolist() == stream[28:].tolist()
+
+
+def test_overflow_drops_the_oldest_samples():
+    ring = AudioRingBuffer(window_size=4, overlap=0.5, capacity=8)
+    ring.write(np.arange(6, dtype=np.int16))
+    ring.write(np.arange(6, 11, dtype=np.int16))  # 11 unread samples in a ring of 8
+
+    assert ring.dropped == 3
+    assert ring.pending().tolist() == list(range(3, 11))
+    assert [window.tolist() for window in ring.windows()] == [[3, 4, 5, 6], [5, 6, 7, 8], [7, 8, 9, 10]]
+
+
+def test_oversized_write_counts_each_lost_sample_once():
+    ring = AudioRingBuffer(window_size=4, overlap=0.5, capacity=8)
+    ring.write(np.arange(2, dtype=np.int16))
+    ring.write(np.arange(100, 120, dtype=np.int16))  # Larger than the whole ring
+
+    assert ring.dropped == 2 + 12  # The unread samples and the part of the chunk that did not fit
+    assert ring.pending().tolist() == list(range(112, 120))
+
+
+def test_overlap_must_leave_a_hop():
+    assert hop_size_for(1000, 0.75) == 250
+    with pytest.raises(ValueError):
+        hop_size_for(1000, 1.0)
@@ -25,6 +25,41 @@ export default function SensorDashboard() {
       .catch(error => console.error("Error fetching group with divers:", error));
   }, [groupId]);
 
+  //live updates: the server pushes only the fields that changed, so we don't have to re-fetch the group
+  useEffect(() => {
+    let socket;
+    let retryTimer;
+    let closed = false;
+
+    const connect = () => {
+      socket = new WebSocket(`ws://localhost:5000/ws/groups/${groupId}`);
+      socket.onmessage = (message) => {
+        const event = JSON.parse(message.data);
+        if (event.type === "snapshot") {
+          //keep the full diver details we already have, refresh the live fields
+          setDivers(current => event.divers.map(live => ({ ...current.find(d => d.id === live.id), ...live })));
+        } else if (event.type === "update") {
+          setDivers(current => current.map(d => d.id === event.diver_id ? { ...d, ...event.changes } : d));
+        } else if (event.type === "added") {
+          setDivers(current => [...current.filter(d => d.id !== event.diver.id), event.diver]);
+        } else if (event.type === "removed") {
+          setDivers(current => current.filter(d => d.id !== event.diver_id));
+        }
+      };
+      //reconnect (and get a fresh snapshot) if the connection drops
+      socket.onclose = () => {
+        if (!closed) retryTimer = setTimeout(connect, 1000);
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      socket.close();
+    };
+  }, [groupId]);
+
   //get the users status from server
   //if someone is critical we will like to get his details for the alert box 
   const criticalDiver = divers.find(s => s.status === "critical");
@@ -10,7 +10,8 @@ const Homepage = () => {
   const [groups, setGroups] = useState([]);
 
   useEffect(() => {
-    axios.get("http://localhost:5000/groups")
+    // Summaries only: per-status diver counts instead of every diver of every group
+    axios.get("http://localhost:5000/groups/?summary=true")
       .then(response => setGroups(response.data))
       .catch(error => console.error("Error fetching groups:", error));
   }, []);
@@ -26,7 +27,7 @@ const Homepage = () => {
   };
 
   const handleGroupAdded = (newGroup) => {
-    setGroups(prev => [...prev, newGroup]);
+    setGroups(prev => [...prev, { ...newGroup, diver_count: 0, status_counts: {} }]);
     setShowAddGroup(false);
   };
 
@@ -50,6 +51,13 @@ const Homepage = () => {
               onClick={() => handleGroupClick(group.id)}
             >
               {group.name}
+              <span className="group-summary">
+                {group.diver_count} divers
+                {Object.entries(group.status_counts || {})
+                  .filter(([status]) => status !== "normal")
+                  .map(([status, count]) => ` · ${count} ${status}`)
+                  .join("")}
+              </span>
             </li>
           ))}
         </ul>
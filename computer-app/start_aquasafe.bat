@@ -5,6 +5,9 @@ echo        AquaSafe System Startup
 echo ====================================
 echo.
 
+echo Updating the database schema...
+cd /d "%~dp0Server" && python migrate.py
+
 echo [1/3] Starting React Client...
 start "React Client" cmd /k "cd /d %~dp0diver-distress-client && npm start"
 